@@ -29,6 +29,7 @@ class ModelConfig:
     # StyleGAN2 parameters
     stylegan2_url: str = "https://nvlabs-fi-cdn.nvidia.com/stylegan2-ada-pytorch/pretrained/paper-fig7c-training-set-sweeps/ffhq70k-paper256-ada.pkl"
     stylegan2_local_path: str = "ffhq70k-paper256-ada.pkl"
+    stylegan2_cache_dir: str = ""  # Converted safetensors cache directory; "" disables it
     
     # Stable Diffusion parameters
     sd_model_name: str = "stabilityai/stable-diffusion-xl-base-1.0"
@@ -89,7 +90,8 @@ class ModelConfig:
                 "model_url": self.stylegan2_url,
                 "model_path": self.stylegan2_local_path,
                 "device": device,
-                "img_size": self.img_size
+                "img_size": self.img_size,
+                "cache_dir": self.stylegan2_cache_dir
             }
         elif self.model_type == "stable-diffusion":
             return {
@@ -144,6 +146,23 @@ class TrainingConfig:
     lr: float = 1e-4
     log_interval: int = 1
     checkpoint_interval: int = 10000
+    
+    # Learning rate schedule
+    lr_scheduler: str = "constant"  # One of ["constant", "cosine", "plateau"]
+    warmup_iterations: int = 0  # Linear warmup from 0 to lr
+    min_lr: float = 0.0  # Floor for cosine decay and plateau reductions
+    plateau_patience: int = 5  # Convergence checks without improvement before reducing the LR
+    plateau_factor: float = 0.5  # LR multiplier applied on a plateau
+    
+    # Convergence checks and early stopping
+    convergence_check_interval: int = 100  # Iterations between convergence checks on the smoothed train MSE
+    early_stopping: bool = False  # Whether to stop once the monitored MSE stops improving
+    early_stopping_patience: int = 5000  # Iterations without improvement before stopping
+    early_stopping_min_delta: float = 0.0  # Minimum MSE decrease counted as an improvement
+    ema_alpha: float = 0.01  # Smoothing factor for the moving average of the train MSE
+    val_interval: int = 0  # Iterations between held-out MSE checks; replaces the train MSE checks when > 0
+    val_batches: int = 4  # Number of held-out batches, generated once and cached on the CPU
+    save_best_checkpoint: bool = True  # Write checkpoint_best.pth whenever the monitored MSE improves
 
     def validate(self):
         """Validate configuration parameters."""
@@ -152,6 +171,17 @@ class TrainingConfig:
         assert self.lr > 0, "Learning rate must be positive"
         assert self.log_interval > 0, "Log interval must be positive"
         assert self.checkpoint_interval > 0, "Checkpoint interval must be positive"
+        assert self.lr_scheduler in ["constant", "cosine", "plateau"], f"Unknown LR scheduler: {self.lr_scheduler}"
+        assert self.warmup_iterations >= 0, "Warmup iterations must be non-negative"
+        assert 0 <= self.min_lr <= self.lr, "Minimum LR must be between 0 and lr"
+        assert self.plateau_patience > 0, "Plateau patience must be positive"
+        assert 0 < self.plateau_factor < 1, "Plateau factor must be between 0 and 1"
+        assert self.convergence_check_interval > 0, "Convergence check interval must be positive"
+        assert self.early_stopping_patience > 0, "Early stopping patience must be positive"
+        assert self.early_stopping_min_delta >= 0, "Early stopping min delta must be non-negative"
+        assert 0 < self.ema_alpha <= 1, "EMA alpha must be in (0, 1]"
+        assert self.val_interval >= 0, "Validation interval must be non-negative"
+        assert self.val_batches > 0, "Number of validation batches must be positive"
 
 
 @dataclass
@@ -166,6 +196,20 @@ class DistributedConfig:
         assert self.init_method.startswith(("env://", "tcp://", "file://")), f"Invalid init method: {self.init_method}"
 
 
+@dataclass
+class MemoryConfig:
+    """Configuration for memory instrumentation."""
+    enable_tracking: bool = True  # Whether to record per-stage peak memory
+    host_sample_interval: float = 5.0  # Seconds between background host RSS samples (0 disables)
+    snapshot_dir: Optional[str] = None  # Directory for CUDA memory snapshots dumped on OOM (None disables)
+    snapshot_max_entries: int = 100000  # Allocator events kept for the snapshot history
+
+    def validate(self):
+        """Validate configuration parameters."""
+        assert self.host_sample_interval >= 0, "Host sample interval must be non-negative"
+        assert self.snapshot_max_entries > 0, "Snapshot history size must be positive"
+
+
 @dataclass
 class EvaluateConfig:
     """Configuration for evaluation."""
@@ -173,7 +217,7 @@ class EvaluateConfig:
     num_samples: int = 1000
     batch_size: int = 16
     output_dir: str = "evaluation_results"
-    seed: Optional[int] = None
+    seed: Optional[int] = None  # Also the base of the per-sample Stable Diffusion seeds (0 if None)
     
     # Enable timing logs
     enable_timing_logs: bool = True
@@ -191,6 +235,36 @@ class EvaluateConfig:
     # Downsampling settings
     enable_downsampling: bool = True  # Whether to evaluate downsampling transformations
     downsample_sizes: List[int] = field(default_factory=lambda: [16, 224])  # Sizes for downsampling evaluation
+    
+    # Other image-space negative cases, as transformation specs (see utils/negative_transforms.py),
+    # e.g. "jpeg_75", "blur_1.5", "noise_0.05", "crop_80" or compositions like "jpeg_75+downsample_128"
+    negative_transforms: List[str] = field(default_factory=lambda: [
+        'set_pixels_minus_one',
+        'set_random_pixels_minus_one',
+        'set_mixed_50_50_pixels_minus_one',
+        'set_mixed_75_25_pixels_minus_one',
+        'set_mixed_25_75_pixels_minus_one',
+        'set_mixed_10_90_pixels_minus_one',
+        'set_mixed_5_95_pixels_minus_one',
+        'set_mixed_1_99_pixels_minus_one',
+    ])
+    
+    # Generated-image corpus (Stable Diffusion only): original and pretrained-model images are
+    # read from / written to this directory, keyed by model, prompt and per-sample seed. "" disables it.
+    image_corpus_dir: str = ""
+    
+    # Evaluation state for resuming preempted runs: the original-model results and every completed
+    # negative case are saved under this directory. "" disables it.
+    eval_state_dir: str = ""
+    eval_state_save_every: int = 0  # Also save partial results every N batches of a case (0 disables)
+    
+    # Reference-statistics cache: inception features, logits and moments of the original model's
+    # images, keyed by model, generation settings and seeds (seeded runs only). "" disables it.
+    reference_stats_dir: str = ""
+    
+    # Run Inception in channels_last under fp16 autocast (CUDA) with pinned transfers; features
+    # differ slightly from the fp32 path, so they are cached and fingerprinted separately
+    fast_inception: bool = False
 
     def validate(self):
         """Validate configuration parameters."""
@@ -199,8 +273,16 @@ class EvaluateConfig:
         assert os.path.exists(self.output_dir) or os.access(os.path.dirname(self.output_dir), os.W_OK), \
             f"Output directory {self.output_dir} does not exist and cannot be created"
         assert all(size > 0 for size in self.downsample_sizes), "All downsample sizes must be positive"
+        assert self.eval_state_save_every >= 0, "Evaluation state save interval must be non-negative"
+        assert len(set(self.get_negative_transforms())) == len(self.get_negative_transforms()), \
+            "Negative transformations must be unique"
         assert all(0 < sparsity < 1 for sparsity in self.pruning_sparsity_levels), "Pruning sparsity levels must be between 0 and 1"
         assert all(method in ['magnitude', 'random'] for method in self.pruning_methods), "Invalid pruning method"
+    
+    def get_negative_transforms(self) -> List[str]:
+        """Specs of all image-space negative cases: downsampling sizes first, then negative_transforms."""
+        downsample = [f'downsample_{size}' for size in self.downsample_sizes] if self.enable_downsampling else []
+        return downsample + list(self.negative_transforms)
 
 
 @dataclass
@@ -274,6 +356,7 @@ class Config:
     evaluate: EvaluateConfig = field(default_factory=EvaluateConfig)
     attack: AttackConfig = field(default_factory=AttackConfig)
     distributed: DistributedConfig = field(default_factory=DistributedConfig)
+    memory: MemoryConfig = field(default_factory=MemoryConfig)
     output_dir: str = "results"
     checkpoint_path: Optional[str] = None
     seed: Optional[int] = None
@@ -284,6 +367,7 @@ class Config:
         self.training.validate()
         self.evaluate.validate()
         self.attack.validate()
+        self.memory.validate()
         assert os.path.exists(self.output_dir) or os.access(os.path.dirname(self.output_dir), os.W_OK), \
             f"Output directory {self.output_dir} does not exist and cannot be created"
     
@@ -304,6 +388,8 @@ class Config:
             self.model.stylegan2_url = args.stylegan2_url
         if hasattr(args, 'stylegan2_local_path'):
             self.model.stylegan2_local_path = args.stylegan2_local_path
+        if hasattr(args, 'stylegan2_cache_dir'):
+            self.model.stylegan2_cache_dir = args.stylegan2_cache_dir
             
         # Stable Diffusion configuration
         if hasattr(args, 'sd_model_name'):
@@ -349,6 +435,33 @@ class Config:
                 self.training.log_interval = args.log_interval
             if hasattr(args, 'checkpoint_interval'):
                 self.training.checkpoint_interval = args.checkpoint_interval
+            # Learning rate schedule and early stopping
+            if hasattr(args, 'lr_scheduler'):
+                self.training.lr_scheduler = args.lr_scheduler
+            if hasattr(args, 'warmup_iterations'):
+                self.training.warmup_iterations = args.warmup_iterations
+            if hasattr(args, 'min_lr'):
+                self.training.min_lr = args.min_lr
+            if hasattr(args, 'plateau_patience'):
+                self.training.plateau_patience = args.plateau_patience
+            if hasattr(args, 'plateau_factor'):
+                self.training.plateau_factor = args.plateau_factor
+            if hasattr(args, 'convergence_check_interval'):
+                self.training.convergence_check_interval = args.convergence_check_interval
+            if hasattr(args, 'early_stopping'):
+                self.training.early_stopping = args.early_stopping
+            if hasattr(args, 'early_stopping_patience'):
+                self.training.early_stopping_patience = args.early_stopping_patience
+            if hasattr(args, 'early_stopping_min_delta'):
+                self.training.early_stopping_min_delta = args.early_stopping_min_delta
+            if hasattr(args, 'ema_alpha'):
+                self.training.ema_alpha = args.ema_alpha
+            if hasattr(args, 'val_interval'):
+                self.training.val_interval = args.val_interval
+            if hasattr(args, 'val_batches'):
+                self.training.val_batches = args.val_batches
+            if hasattr(args, 'no_best_checkpoint'):
+                self.training.save_best_checkpoint = not args.no_best_checkpoint
                 
         elif mode == 'evaluate':
             if hasattr(args, 'num_samples'):
@@ -370,6 +483,22 @@ class Config:
                 self.evaluate.pruning_sparsity_levels = args.pruning_sparsity_levels
             if hasattr(args, 'pruning_methods'):
                 self.evaluate.pruning_methods = args.pruning_methods
+            if hasattr(args, 'enable_downsampling'):
+                self.evaluate.enable_downsampling = args.enable_downsampling
+            if hasattr(args, 'downsample_sizes'):
+                self.evaluate.downsample_sizes = args.downsample_sizes
+            if hasattr(args, 'negative_transforms'):
+                self.evaluate.negative_transforms = args.negative_transforms
+            if hasattr(args, 'image_corpus_dir'):
+                self.evaluate.image_corpus_dir = args.image_corpus_dir
+            if hasattr(args, 'eval_state_dir'):
+                self.evaluate.eval_state_dir = args.eval_state_dir
+            if hasattr(args, 'eval_state_save_every'):
+                self.evaluate.eval_state_save_every = args.eval_state_save_every
+            if hasattr(args, 'reference_stats_dir'):
+                self.evaluate.reference_stats_dir = args.reference_stats_dir
+            if hasattr(args, 'fast_inception'):
+                self.evaluate.fast_inception = args.fast_inception
                 
         elif mode == 'attack':
             # Update attack parameters
@@ -410,6 +539,14 @@ class Config:
             if hasattr(args, 'enable_downsampling'):
                 self.attack.enable_downsampling = args.enable_downsampling
         
+        # Memory instrumentation configuration
+        if hasattr(args, 'disable_memory_tracking'):
+            self.memory.enable_tracking = not args.disable_memory_tracking
+        if hasattr(args, 'host_memory_interval'):
+            self.memory.host_sample_interval = args.host_memory_interval
+        if hasattr(args, 'memory_snapshot_dir'):
+            self.memory.snapshot_dir = args.memory_snapshot_dir
+        
         # Common configuration
         if hasattr(args, 'output_dir'):
             self.output_dir = args.output_dir
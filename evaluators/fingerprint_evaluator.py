@@ -1,10 +1,14 @@
 """
 Evaluator for generative model fingerprinting.
 """
+import hashlib
+import json
 import logging
 import os
 import re
-from typing import Dict, Optional, List, Tuple, Any
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Dict, Optional, List, Tuple, Any, Callable
 
 import torch
 import numpy as np
@@ -14,18 +18,28 @@ from config.default_config import Config
 from models.decoder import DecoderSD_L, DecoderSD_M, DecoderSD_S, StyleGAN2Decoder
 from models.base_model import BaseGenerativeModel
 from utils.checkpoint import load_checkpoint
-from utils.metrics import save_metrics_text, calculate_fid, extract_inception_features
+from utils.distributed import shard_range, all_gather_rows, broadcast_object
+from utils.eval_state import create_eval_state
+from utils.image_corpus import corpus_model_id, create_image_corpus, generate_with_corpus
+from utils.memory import create_memory_tracker
+from utils.reference_stats import ReferenceStats, create_reference_stats_store, reference_stats_key
+from utils.result_store import save_results
+from utils.metrics import (
+    extract_inception_outputs,
+    inception_feature_version,
+    StreamingMoments,
+    compute_fid_from_statistics
+)
 from utils.distribution_metrics import (
     InceptionScore,
     calculate_kid,
-    calculate_precision_recall,
+    calculate_prdc,
     calculate_wasserstein,
     calculate_mmd
 )
-from utils.image_transforms import (
-    quantize_model_weights, 
-    downsample_and_upsample
-)
+from utils.image_transforms import quantize_model_weights
+from utils.negative_transforms import TransformBatch, TransformSetup, build_negative_transforms, image_value_range
+from utils.pixel_indices import PixelIndexSet, get_pixel_index_set
 from utils.model_loading import (
     load_pretrained_models,
     STYLEGAN2_MODELS,
@@ -65,6 +79,100 @@ def clean_prompt(prompt: str) -> str:
     return prompt.strip()
 
 
+@dataclass
+class GenerationRecord:
+    """
+    Streaming accumulators of decoder MSEs and inception outputs for one set of generated images.
+    
+    Each batch is folded in as soon as it is generated and the images are then dropped, so
+    device memory does not grow with the number of samples. evaluate_batch fills a record for
+    the original model while computing the threshold, so the negative-sample evaluation reuses
+    it instead of generating the same original images a second time.
+    
+    A record without inception outputs (with_inception=False) only holds MSEs; it is used
+    when the inception outputs are taken from cached reference statistics.
+    """
+    mse: List[np.ndarray] = field(default_factory=list)
+    features: List[np.ndarray] = field(default_factory=list)  # Inception pool features of the images in [0, 1] (float32)
+    fid_moments: StreamingMoments = field(default_factory=StreamingMoments)  # Moments of the features
+    is_logits: List[np.ndarray] = field(default_factory=list)  # Inception class logits, for the Inception Score
+    with_inception: bool = True
+    
+    def _names(self) -> Tuple[str, ...]:
+        return ('mse', 'features', 'is_logits') if self.with_inception else ('mse',)
+    
+    def add_batch(
+        self,
+        mse: np.ndarray,
+        features: Optional[torch.Tensor] = None,
+        is_logits: Optional[torch.Tensor] = None
+    ) -> None:
+        """Record the results of one batch of images; the moments are updated on the features' device."""
+        self.mse.append(mse)
+        if self.with_inception:
+            self.fid_moments.update(features)
+            self.features.append(torch.as_tensor(features).float().cpu().numpy())
+            self.is_logits.append(torch.as_tensor(is_logits).cpu().numpy())
+    
+    def set_inception_outputs(self, features: np.ndarray, is_logits: np.ndarray, mu: np.ndarray, sigma: np.ndarray) -> None:
+        """Fill in the inception outputs of all samples, e.g. from cached reference statistics."""
+        self.features = [features.astype(np.float32)]
+        self.is_logits = [is_logits]
+        self.fid_moments = StreamingMoments.from_statistics(len(features), mu, sigma)
+        self.with_inception = True
+    
+    def concatenated(self, name: str) -> np.ndarray:
+        """Concatenate a recorded quantity over all batches."""
+        return np.concatenate(getattr(self, name), axis=0)
+    
+    def state_dict(self, prefix: str = "") -> Dict[str, np.ndarray]:
+        """Arrays of the recorded results, e.g. for the evaluation state."""
+        state = {f"{prefix}{name}": self.concatenated(name) for name in self._names()}
+        if self.with_inception:
+            state.update({f"{prefix}fid_{name}": value for name, value in self.fid_moments.state_dict().items()})
+        return state
+    
+    def load_state_dict(self, state: Dict[str, np.ndarray], prefix: str = "") -> None:
+        """Restore the recorded results from state_dict()."""
+        for name in self._names():
+            setattr(self, name, [state[f"{prefix}{name}"]])
+        if self.with_inception:
+            self.fid_moments.load_state_dict({
+                name: state[f"{prefix}fid_{name}"] for name in ('count', 'mean', 'm2_triu')
+            })
+    
+    def gathered(self, device: torch.device, world_size: int) -> 'GenerationRecord':
+        """
+        Combine the records of all ranks, each holding a contiguous block of batches.
+        
+        Per-sample quantities are concatenated in rank order, i.e. in sample order, and the
+        feature moments are merged, so every rank ends up with the single-process record.
+        
+        Args:
+            device (torch.device): Device used for the collectives.
+            world_size (int): Total number of processes.
+            
+        Returns:
+            GenerationRecord: Record of all samples.
+        """
+        if world_size <= 1:
+            return self
+        
+        record = GenerationRecord(with_inception=self.with_inception)
+        for name in self._names():
+            local = self.concatenated(name) if getattr(self, name) else None
+            setattr(record, name, [all_gather_rows(local, device, world_size)])
+        if not self.with_inception:
+            return record
+        
+        record.fid_moments = self.fid_moments.gathered(device, world_size)
+        return record
+
+
+def _identity(x: torch.Tensor, batch: Optional[TransformBatch] = None) -> torch.Tensor:
+    return x
+
+
 class FingerprintEvaluator:
     """
     Evaluator for generative model fingerprinting.
@@ -116,6 +224,7 @@ class FingerprintEvaluator:
         self.decoder = None
         
         # Initialize pixel selection parameters
+        self.pixel_set: Optional[PixelIndexSet] = None
         self.image_pixel_indices = None
         self.image_pixel_count = self.config.model.image_pixel_count
         self.image_pixel_set_seed = self.config.model.image_pixel_set_seed
@@ -130,80 +239,100 @@ class FingerprintEvaluator:
             if self.config.model.enable_multi_prompt:
                 logging.info("Multi-prompt evaluation mode is enabled")
         
+        # Per-stage memory instrumentation
+        self.memory_tracker = create_memory_tracker(self.config.memory, self.device, self.rank)
+        
+        # Generated-image corpus; StyleGAN2 generation is cheap and its float output would not
+        # survive the uint8 round trip, so only Stable Diffusion images are cached
+        self.image_corpus = None
+        if self.config.model.model_type == "stable-diffusion":
+            self.image_corpus = create_image_corpus(self.config.evaluate.image_corpus_dir)
+            if self.image_corpus is not None and self.rank == 0:
+                logging.info(f"Using generated-image corpus at {self.image_corpus.root} ({len(self.image_corpus)} images)")
+        
+        # Evaluation state for resuming preempted runs
+        self.eval_state = create_eval_state(
+            self.config.evaluate.eval_state_dir,
+            self.config,
+            rank=self.rank,
+            world_size=self.world_size,
+            save_every=self.config.evaluate.eval_state_save_every
+        )
+        if self.eval_state is not None and self.rank == 0:
+            logging.info(f"Using evaluation state at {self.eval_state.path}")
+        
+        # Cached inception statistics of the original model's images
+        self.reference_stats = create_reference_stats_store(self.config.evaluate.reference_stats_dir, rank=self.rank)
+        if self.reference_stats is not None and self.rank == 0:
+            logging.info(f"Using reference statistics at {self.reference_stats.root}")
+        
         # Initialize quantized models dictionary
         self.quantized_models = {}
         
         # Setup models
-        self.setup_models()
+        with self.memory_tracker.stage("setup_models"):
+            self.setup_models()
         
         # Load pretrained models with custom configuration
-        if self.selected_pretrained_models or self.custom_pretrained_models:
-            # Create combined model dictionary
-            model_dict = {}
+        with self.memory_tracker.stage("load_pretrained_models"):
+            if self.selected_pretrained_models or self.custom_pretrained_models:
+                # Create combined model dictionary
+                model_dict = {}
             
-            # Add selected default models
-            if not self.selected_pretrained_models:
-                # If no models specified, use all default models
-                if self.config.model.model_type == "stylegan2":
-                    model_dict.update(STYLEGAN2_MODELS)
+                # Add selected default models
+                if not self.selected_pretrained_models:
+                    # If no models specified, use all default models
+                    if self.config.model.model_type == "stylegan2":
+                        model_dict.update(STYLEGAN2_MODELS)
+                    else:
+                        model_dict.update(STABLE_DIFFUSION_MODELS)
                 else:
-                    model_dict.update(STABLE_DIFFUSION_MODELS)
-            else:
-                # Add only selected default models
-                default_models = STYLEGAN2_MODELS if self.config.model.model_type == "stylegan2" else STABLE_DIFFUSION_MODELS
-                for model_name in self.selected_pretrained_models:
-                    if model_name in default_models:
-                        model_dict[model_name] = default_models[model_name]
-                    elif self.rank == 0:
-                        logging.warning(f"Requested model '{model_name}' not found in default models")
+                    # Add only selected default models
+                    default_models = STYLEGAN2_MODELS if self.config.model.model_type == "stylegan2" else STABLE_DIFFUSION_MODELS
+                    for model_name in self.selected_pretrained_models:
+                        if model_name in default_models:
+                            model_dict[model_name] = default_models[model_name]
+                        elif self.rank == 0:
+                            logging.warning(f"Requested model '{model_name}' not found in default models")
             
-            # Add custom models
-            model_dict.update(self.custom_pretrained_models)
+                # Add custom models
+                model_dict.update(self.custom_pretrained_models)
             
-            # Load the models
-            self.pretrained_models = load_pretrained_models(
-                device=self.device,
-                rank=self.rank,
-                model_type=self.config.model.model_type,
-                selected_models=model_dict,
-                img_size=self.config.model.img_size,
-                enable_cpu_offload=self.config.model.sd_enable_cpu_offload if self.config.model.model_type == "stable-diffusion" else False,
-                dtype=getattr(torch, self.config.model.sd_dtype) if self.config.model.model_type == "stable-diffusion" else torch.float32
-            )
-        else:
-            # Load all default models
-            self.pretrained_models = load_pretrained_models(
-                device=self.device,
-                rank=self.rank,
-                model_type=self.config.model.model_type,
-                img_size=self.config.model.img_size,
-                enable_cpu_offload=self.config.model.sd_enable_cpu_offload if self.config.model.model_type == "stable-diffusion" else False,
-                dtype=getattr(torch, self.config.model.sd_dtype) if self.config.model.model_type == "stable-diffusion" else torch.float32
-            )
+                # Load the models
+                self.pretrained_models = load_pretrained_models(
+                    device=self.device,
+                    rank=self.rank,
+                    model_type=self.config.model.model_type,
+                    selected_models=model_dict,
+                    img_size=self.config.model.img_size,
+                    enable_cpu_offload=self.config.model.sd_enable_cpu_offload if self.config.model.model_type == "stable-diffusion" else False,
+                    dtype=getattr(torch, self.config.model.sd_dtype) if self.config.model.model_type == "stable-diffusion" else torch.float32,
+                    stylegan2_cache_dir=self.config.model.stylegan2_cache_dir
+                )
+            else:
+                # Load all default models
+                self.pretrained_models = load_pretrained_models(
+                    device=self.device,
+                    rank=self.rank,
+                    model_type=self.config.model.model_type,
+                    img_size=self.config.model.img_size,
+                    enable_cpu_offload=self.config.model.sd_enable_cpu_offload if self.config.model.model_type == "stable-diffusion" else False,
+                    dtype=getattr(torch, self.config.model.sd_dtype) if self.config.model.model_type == "stable-diffusion" else torch.float32,
+                    stylegan2_cache_dir=self.config.model.stylegan2_cache_dir
+                )
     
     def _generate_pixel_indices(self) -> None:
         """
-        Generate random pixel indices for image-based approach.
+        Select the fingerprinted pixel set for image-based approach.
         """
-        # Set seed for reproducibility
-        torch.manual_seed(self.image_pixel_set_seed)
-        
-        # Calculate total number of pixels
-        img_size = self.config.model.img_size
-        channels = 3  # RGB image
-        total_pixels = channels * img_size * img_size
-        
-        # Generate random indices (without replacement) on CPU first
-        if self.image_pixel_count > total_pixels:
-            if self.rank == 0:
-                logging.warning(f"Requested {self.image_pixel_count} pixels exceeds total pixels {total_pixels}. Using all pixels.")
-            self.image_pixel_count = total_pixels
-            self.image_pixel_indices = torch.arange(total_pixels)
-        else:
-            self.image_pixel_indices = torch.randperm(total_pixels)[:self.image_pixel_count]
-        
-        # Move to device after generation
-        self.image_pixel_indices = self.image_pixel_indices.to(self.device)
+        self.pixel_set = get_pixel_index_set(
+            self.config.model.img_size,
+            self.image_pixel_count,
+            self.image_pixel_set_seed,
+            device=self.device
+        )
+        self.image_pixel_count = self.pixel_set.count
+        self.image_pixel_indices = self.pixel_set.indices
         
         if self.rank == 0:
             logging.info(f"Generated {len(self.image_pixel_indices)} pixel indices with seed {self.image_pixel_set_seed}")
@@ -219,15 +348,7 @@ class FingerprintEvaluator:
         Returns:
             torch.Tensor: Batch of flattened pixel values at selected indices
         """
-        batch_size = images.shape[0]
-        
-        # Flatten the spatial dimensions using a view operation
-        flattened = images.view(batch_size, -1)
-        
-        # Get values at selected indices: [batch_size, pixel_count]
-        image_partial = flattened.index_select(1, self.image_pixel_indices)
-        
-        return image_partial
+        return self.pixel_set.extract(images)
     
     def setup_models(self):
         """
@@ -397,72 +518,101 @@ class FingerprintEvaluator:
             num_samples = self.config.evaluate.num_samples
             num_batches = (num_samples + batch_size - 1) // batch_size  # Ceiling division
             
+            # Each rank generates a contiguous block of batches; batch boundaries are the same
+            # as in a single-process run, and results are gathered before thresholding
+            batch_start, batch_end = shard_range(num_batches, self.rank, self.world_size)
+            if self.rank == 0 and self.world_size > 1:
+                logging.info(f"Sharding {num_batches} batches across {self.world_size} ranks")
+            
             # Generate latents or prepare generation based on model type
+            prompt_batches = None
             if self.config.model.model_type == "stylegan2":
                 all_z_original = torch.randn(num_samples, self.generative_model.z_dim, device=self.device)
                 all_z_negative = torch.randn(num_samples, self.generative_model.z_dim, device=self.device)
+                if self.world_size > 1:
+                    # Ranks must agree on the latents even without a fixed seed
+                    torch.distributed.broadcast(all_z_original, src=0)
+                    torch.distributed.broadcast(all_z_negative, src=0)
                 gen_kwargs = {"noise_mode": "const"}
             else:  # stable-diffusion
                 all_z_original = None  # Not used for SD
                 all_z_negative = None  # Not used for SD
                 gen_kwargs = self.config.model.get_generation_kwargs()
+                prompt_batches = self._sample_prompt_batches(num_samples, batch_size)
+                if self.rank == 0:  # Log sample prompts from first batch
+                    logging.info(f"Sample prompts for evaluation: {prompt_batches[0][:3]}")
             
-            # Process batches for original model
-            mse_per_sample = []  # Changed from mse_values to mse_per_sample
+            # Inception Score model shared by the original and negative evaluations
+            inception_score_calc = InceptionScore(device=self.device)
             
-            with torch.no_grad():
-                for i in range(num_batches):
-                    start_idx = i * batch_size
-                    end_idx = min((i + 1) * batch_size, num_samples)
-                    current_batch_size = end_idx - start_idx
-                    
-                    # For Stable Diffusion, update prompts if multi-prompt mode is enabled
-                    if self.config.model.model_type == "stable-diffusion":
-                        prompts = self._sample_prompts(current_batch_size)
-                        gen_kwargs["prompt"] = prompts
-                        if self.rank == 0 and i == 0:  # Log sample prompts from first batch
-                            logging.info(f"Sample prompts for evaluation: {prompts[:3]}")
-                    
-                    # For Stable Diffusion, update prompts if multi-prompt mode is enabled
-                    if self.config.model.model_type == "stable-diffusion":
-                        prompts = self._sample_prompts(current_batch_size)
-                        gen_kwargs["prompt"] = prompts
-                        if self.rank == 0 and i == 0:  # Log sample prompts from first batch
-                            logging.info(f"Sample prompts for evaluation: {prompts[:3]}")
-                    
+            # Original-model results, generated once and reused for the negative evaluations
+            has_original = self.eval_state is not None and broadcast_object(self.eval_state.has_original(), self.world_size)
+            if has_original:
+                original_memo = GenerationRecord()
+                original_memo.load_state_dict(self.eval_state.load_original())
+                if self.rank == 0:
+                    logging.info("Loaded original-model results from the evaluation state")
+            else:
+                def generate_original(start_idx: int, end_idx: int) -> torch.Tensor:
                     # Generate images based on model type
                     if self.config.model.model_type == "stylegan2":
-                        z = all_z_original[start_idx:end_idx]
-                        x = self.generative_model.generate_images(
-                            batch_size=current_batch_size,
-                            device=self.device,
-                            z=z,  # Pass the latent vectors explicitly
-                            **gen_kwargs
-                        )
-                    else:  # stable-diffusion
-                        x = self.generative_model.generate_images(
-                            batch_size=current_batch_size,
+                        return self.generative_model.generate_images(
+                            batch_size=end_idx - start_idx,
                             device=self.device,
+                            z=all_z_original[start_idx:end_idx],  # Pass the latent vectors explicitly
                             **gen_kwargs
                         )
-                    
-                    # Extract features (real pixel values)
-                    features = self.extract_image_partial(x)
-                    true_values = features
-                    
-                    # Predict values
-                    pred_values = self.decoder(x)
-                    
-                    # Calculate metrics - now calculating MSE per sample
-                    mse = torch.mean(torch.pow(pred_values - true_values, 2), dim=1).cpu().numpy()
-                    mse_per_sample.extend(mse.tolist())  # extend list with individual sample MSEs
-                    
-                    # Progress reporting
-                    if self.rank == 0 and num_batches > 10 and (i+1) % max(1, num_batches//10) == 0:
-                        logging.info(f"Processed {i+1}/{num_batches} batches")
+                    # stable-diffusion, seeded per sample with this batch's prompts
+                    return generate_with_corpus(
+                        self.generative_model,
+                        seeds=self._sample_seeds(start_idx, end_idx),
+                        corpus=self.image_corpus,
+                        device=self.device,
+                        **dict(gen_kwargs, prompt=prompt_batches[start_idx // batch_size])
+                    )
+                
+                # Inception outputs of the original images may be cached from an earlier run
+                reference_key, reference_settings = self._reference_stats_key(prompt_batches)
+                reference_stats = None
+                if reference_key is not None and broadcast_object(self.reference_stats.contains(reference_key), self.world_size):
+                    reference_stats = self.reference_stats.load(reference_key)
+                    if reference_stats is None:
+                        raise RuntimeError(f"Could not read reference statistics {reference_key} in {self.reference_stats.root}")
+                    if self.rank == 0:
+                        logging.info(f"Loaded inception statistics of the original images: {reference_key}")
+                
+                with torch.no_grad(), self.memory_tracker.stage("original_generation"):
+                    # Per-sample MSEs plus everything the negative-sample evaluation needs
+                    original_memo = self._generate_records(
+                        "original", {"original": _identity}, generate_original,
+                        (batch_start, batch_end), inception_score_calc,
+                        with_inception=reference_stats is None
+                    )["original"]
+                    original_memo = original_memo.gathered(self.device, self.world_size)
+                
+                if reference_stats is not None:
+                    original_memo.set_inception_outputs(
+                        reference_stats.features, reference_stats.logits, reference_stats.mu, reference_stats.sigma
+                    )
+                elif reference_key is not None and self.rank == 0:  # Only rank 0 writes the cache
+                    mu, sigma = original_memo.fid_moments.statistics()
+                    self.reference_stats.save(reference_key, ReferenceStats(
+                        features=original_memo.concatenated('features'),
+                        mu=mu,
+                        sigma=sigma,
+                        logits=original_memo.concatenated('is_logits')
+                    ), reference_settings)
+                
+                if self.eval_state is not None:
+                    self.eval_state.save_original(original_memo.state_dict())
+                    self.eval_state.clear_partial("original")
             
-            # Convert to numpy array for calculations
-            mse_per_sample = np.array(mse_per_sample)
+            # The negative samples reuse the prompts of the last batch
+            if prompt_batches is not None:
+                gen_kwargs["prompt"] = prompt_batches[-1]
+            
+            # Per-sample MSEs of the original model
+            mse_per_sample = original_memo.concatenated('mse')
             
             # Combine results - now taking mean and std of per-sample MSEs
             mse_all = np.mean(mse_per_sample)
@@ -482,13 +632,25 @@ class FingerprintEvaluator:
             }
             
             # Evaluate negative samples
-            negative_results = self._evaluate_negative_samples(all_z_original, all_z_negative, threshold, gen_kwargs)
+            negative_results = self._evaluate_negative_samples(
+                original_memo, all_z_negative, threshold, gen_kwargs, inception_score_calc,
+                batch_range=(batch_start, batch_end)
+            )
             if negative_results:
                 metrics['negative_results'] = negative_results
             
-            # Save metrics
+            # Save metrics, one case per row with per-sample arrays kept as arrays
             if self.rank == 0:
-                save_metrics_text(metrics, self.config.output_dir)
+                cases = {
+                    'original': {
+                        'mse_mean': mse_all,
+                        'mse_std': mse_std,
+                        'mse_values': mse_per_sample,
+                        'threshold_95tpr': threshold
+                    }
+                }
+                cases.update(negative_results)
+                save_results(self.config.output_dir, "evaluation", cases, config=self.config)
             
             return metrics
                 
@@ -496,24 +658,31 @@ class FingerprintEvaluator:
             if self.rank == 0:
                 logging.error(f"Error in batch evaluation: {str(e)}")
                 logging.error(str(e), exc_info=True)
+                if self.eval_state is not None:
+                    logging.error(f"Completed results are kept in {self.eval_state.path}; rerun to resume")
             return {}
     
     def _evaluate_negative_samples(
         self,
-        original_z: Optional[torch.Tensor],
+        original_memo: GenerationRecord,
         negative_z: Optional[torch.Tensor],
         threshold: float,
-        gen_kwargs: Dict[str, Any]
+        gen_kwargs: Dict[str, Any],
+        inception_score_calc: InceptionScore,
+        batch_range: Optional[Tuple[int, int]] = None
     ) -> Dict[str, Dict[str, float]]:
         """
         Evaluate negative samples by comparing against pretrained models and transformations.
         Computes FPR at 95% TPR threshold for each negative case.
         
         Args:
-            original_z (Optional[torch.Tensor]): Original model latent vectors for FID comparison (StyleGAN2 only)
+            original_memo (GenerationRecord): Memoized original-model results from evaluate_batch
             negative_z (Optional[torch.Tensor]): Negative model latent vectors for evaluation (StyleGAN2 only)
             threshold (float): MSE threshold at 95% TPR from original model
             gen_kwargs (Dict[str, Any]): Generation kwargs for the model
+            inception_score_calc (InceptionScore): Inception Score calculator
+            batch_range (Optional[Tuple[int, int]]): Batches generated by this rank; results of
+                all ranks are gathered before computing metrics. Defaults to all batches.
             
         Returns:
             dict: Dictionary mapping negative sample types to their metrics
@@ -522,296 +691,417 @@ class FingerprintEvaluator:
         batch_size = self.config.evaluate.batch_size
         num_samples = self.config.evaluate.num_samples
         num_batches = (num_samples + batch_size - 1) // batch_size
+        batch_start, batch_end = batch_range if batch_range is not None else (0, num_batches)
         
-        # Initialize Inception Score calculator
-        inception_score_calc = InceptionScore(device=self.device)
-        
-        # Define the evaluations to run
-        evaluations_to_run = []
+        # Model-space cases each need their own generations
+        model_evaluations = []
         
         # Add pretrained model evaluations - use all available models
-        for model_name in self.pretrained_models.keys():
-            evaluations_to_run.append((model_name, None))
+        # (transformed models share the original model's name, so only these use the image corpus)
+        for model_name, model in self.pretrained_models.items():
+            model_evaluations.append((model_name, model, True))
         
-        # Add transformations based on model type
+        # Only add quantization for StyleGAN2 models
         if self.config.model.model_type == "stylegan2":
-            # Only add quantization for StyleGAN2 models
-            if self.quantized_models:
-                if 'int8' in self.quantized_models:
-                    evaluations_to_run.append((None, 'quantization_int8'))
-                if 'int4' in self.quantized_models:
-                    evaluations_to_run.append((None, 'quantization_int4'))
+            for precision in ['int8', 'int4']:
+                if precision in self.quantized_models:
+                    model_evaluations.append((f'quantization_{precision}', self.quantized_models[precision], False))
         
         # Add pruning evaluations
-        if self.pruned_models:
-            for model_key in self.pruned_models.keys():
-                evaluations_to_run.append((None, model_key))
-        
-        # Add downsample evaluations for both sizes
-        evaluations_to_run.append((None, 'downsample_16'))
-        evaluations_to_run.append((None, 'downsample_224'))
-        
-        # Add pixel manipulation evaluation
-        evaluations_to_run.append((None, 'set_pixels_minus_one'))
-        
-        # Add pixel manipulation evaluations
-        evaluations_to_run.append((None, 'set_random_pixels_minus_one'))
-        evaluations_to_run.append((None, 'set_mixed_50_50_pixels_minus_one'))
-        evaluations_to_run.append((None, 'set_mixed_75_25_pixels_minus_one'))
-        evaluations_to_run.append((None, 'set_mixed_25_75_pixels_minus_one'))
-        evaluations_to_run.append((None, 'set_mixed_10_90_pixels_minus_one'))
-        evaluations_to_run.append((None, 'set_mixed_5_95_pixels_minus_one'))
-        evaluations_to_run.append((None, 'set_mixed_1_99_pixels_minus_one'))
-        
-        total_evals = len(evaluations_to_run)
+        for model_key, model in self.pruned_models.items():
+            model_evaluations.append((model_key, model, False))
+        
+        # Image-space transformations share a single generation of the original model
+        image_transforms = self._build_image_transforms()
+        
+        total_evals = len(model_evaluations) + len(image_transforms)
         if self.rank == 0:
             logging.info(f"Running {total_evals} evaluations with extended distribution metrics...")
         
-        # Generate original images for distribution comparison
-        original_images = []
-        original_features = []
-        with torch.no_grad():
-            for i in range(num_batches):
-                start_idx = i * batch_size
-                end_idx = min((i + 1) * batch_size, num_samples)
-                current_batch_size = end_idx - start_idx
-                
-                if self.config.model.model_type == "stylegan2":
-                    z = original_z[start_idx:end_idx]
-                    x = self.generative_model.generate_images(
-                        batch_size=current_batch_size,
-                        device=self.device,
-                        z=z,
-                        **gen_kwargs
-                    )
-                else:  # stable-diffusion
-                    x = self.generative_model.generate_images(
-                        batch_size=current_batch_size,
-                        device=self.device,
-                        **gen_kwargs
-                    )
-                
-                original_images.append(x)
-                # Extract inception features for distribution metrics
-                features = extract_inception_features(x, batch_size=batch_size, device=self.device)
-                original_features.append(features)
-        
-        # Concatenate all original images and features
-        original_images = torch.cat(original_images, dim=0)
-        original_features = np.concatenate(original_features, axis=0)
-        
-        # Calculate Inception Score for original distribution
-        is_mean, is_std = inception_score_calc.calculate_score(
-            (original_images + 1) / 2,  # Convert to [0, 1] range
-            batch_size=batch_size
-        )
-        
+        # Reuse the original-model features memoized by evaluate_batch; only rank 0 computes metrics
+        original_features, original_fid_statistics = None, None
         if self.rank == 0:
+            original_features = original_memo.concatenated('features')
+            original_fid_statistics = original_memo.fid_moments.statistics()
+            
+            # Calculate Inception Score for original distribution
+            is_mean, is_std = InceptionScore.score_from_logits(original_memo.concatenated('is_logits'))
             logging.info(f"Original distribution Inception Score: {is_mean:.4f} ± {is_std:.4f}")
         
+        # Cases completed by an interrupted run are loaded instead of evaluated again
+        completed_cases = set()
+        if self.eval_state is not None:
+            completed_cases = set(broadcast_object(self.eval_state.completed_cases(), self.world_size))
+            for key in completed_cases & ({key for key, _, _ in model_evaluations} | set(image_transforms)):
+                negative_results[key] = self.eval_state.load_case(key)
+                if self.rank == 0:
+                    logging.info(f"Loaded completed case from the evaluation state: {key}")
+        
+        completed = 0
+        
         # Generate negative case images and compute all metrics
         with torch.no_grad():
-            for idx, (model_name, transformation) in enumerate(evaluations_to_run):
-                key = model_name if model_name else transformation
+            for key, model, use_corpus in model_evaluations:
+                if key in completed_cases:
+                    completed += 1
+                    continue
+                
                 if self.rank == 0:
                     logging.info(f"Starting evaluation for: {key}")
                 
-                mse_per_sample = []
-                negative_images = []
-                negative_features = []
+                with self.memory_tracker.stage(f"negative:{key}"):
+                    generate_batch = partial(
+                        self._generate_negative_batch, model, negative_z, gen_kwargs=gen_kwargs, use_corpus=use_corpus
+                    )
+                    record = self._generate_records(
+                        key, {key: _identity}, generate_batch, (batch_start, batch_end), inception_score_calc
+                    )[key]
+                    
+                    negative_results[key] = self._negative_result(
+                        key, record.gathered(self.device, self.world_size),
+                        original_features, original_fid_statistics, threshold
+                    )
+                    if self.eval_state is not None:
+                        self.eval_state.save_case(key, negative_results[key])
+                        self.eval_state.clear_partial(key)
                 
-                # Process in batches
-                for i in range(num_batches):
-                    start_idx = i * batch_size
-                    end_idx = min((i + 1) * batch_size, num_samples)
-                    current_batch_size = end_idx - start_idx
+                # Progress reporting
+                completed += 1
+                if self.rank == 0 and completed % max(1, total_evals//5) == 0:
+                    logging.info(f"Completed {completed}/{total_evals} evaluations")
+            
+            completed += len(completed_cases & set(image_transforms))
+            pending_transforms = {key: t for key, t in image_transforms.items() if key not in completed_cases}
+            if pending_transforms:
+                if self.rank == 0:
+                    logging.info(f"Starting evaluation for image transformations: {list(pending_transforms.keys())}")
+                
+                with self.memory_tracker.stage("negative:image_transforms"):
+                    # Generate each negative batch once and fan it out to every transformation
+                    generate_batch = partial(
+                        self._generate_negative_batch, self.generative_model, negative_z, gen_kwargs=gen_kwargs, use_corpus=True
+                    )
+                    records = self._generate_records(
+                        "image_transforms", pending_transforms, generate_batch, (batch_start, batch_end), inception_score_calc
+                    )
                     
-                    # Generate negative sample images
-                    if model_name is not None:
-                        model = self.pretrained_models[model_name]
-                        if self.config.model.model_type == "stylegan2":
-                            z = negative_z[start_idx:end_idx]
-                            x = model.generate_images(
-                                batch_size=current_batch_size,
-                                device=self.device,
-                                z=z,
-                                **gen_kwargs
-                            )
-                        else:
-                            x = model.generate_images(
-                                batch_size=current_batch_size,
-                                device=self.device,
-                                **gen_kwargs
-                            )
-                    else:
-                        if self.config.model.model_type == "stylegan2":
-                            z = negative_z[start_idx:end_idx]
-                            x = self.generative_model.generate_images(
-                                batch_size=current_batch_size,
-                                device=self.device,
-                                z=z,
-                                **gen_kwargs
-                            )
-                        else:
-                            x = self.generative_model.generate_images(
-                                batch_size=current_batch_size,
-                                device=self.device,
-                                **gen_kwargs
-                            )
+                    for key, record in records.items():
+                        negative_results[key] = self._negative_result(
+                            key, record.gathered(self.device, self.world_size),
+                            original_features, original_fid_statistics, threshold
+                        )
+                        if self.eval_state is not None:
+                            self.eval_state.save_case(key, negative_results[key])
                         
-                        if transformation and transformation.startswith('quantization'):
-                            precision = transformation.split('_')[-1]
-                            if precision in self.quantized_models:
-                                model = self.quantized_models[precision]
-                                if self.config.model.model_type == "stylegan2":
-                                    x = model.generate_images(
-                                        batch_size=current_batch_size,
-                                        device=self.device,
-                                        z=z,
-                                        **gen_kwargs
-                                    )
-                                else:
-                                    x = model.generate_images(
-                                        batch_size=current_batch_size,
-                                        device=self.device,
-                                        **gen_kwargs
-                                    )
-                            else:
-                                if self.rank == 0 and i == 0:
-                                    logging.warning(f"Quantized model for precision {precision} not found")
-                        elif transformation and transformation.startswith('pruned_'):
-                            if transformation in self.pruned_models:
-                                model = self.pruned_models[transformation]
-                                if self.config.model.model_type == "stylegan2":
-                                    x = model.generate_images(
-                                        batch_size=current_batch_size,
-                                        device=self.device,
-                                        z=z,
-                                        **gen_kwargs
-                                    )
-                                else:
-                                    x = model.generate_images(
-                                        batch_size=current_batch_size,
-                                        device=self.device,
-                                        **gen_kwargs
-                                    )
-                            else:
-                                if self.rank == 0 and i == 0:
-                                    logging.warning(f"Pruned model {transformation} not found")
-                        elif transformation.startswith('downsample'):
-                            downsample_size = int(transformation.split('_')[1])
-                            x = downsample_and_upsample(x, downsample_size=downsample_size)
-                        elif transformation == 'set_pixels_minus_one':
-                            x = self._set_pixels_to_value(x, value=-1.0)
-                        elif transformation == 'set_random_pixels_minus_one':
-                            # Use a different random seed (e.g. original seed + 1000)
-                            random_seed = self.image_pixel_set_seed + 1000
-                            random_indices = self._generate_random_pixel_indices(random_seed)
-                            x = self._set_pixels_to_value(x, value=-1.0, pixel_indices=random_indices)
-                        elif transformation == 'set_mixed_50_50_pixels_minus_one':
-                            mixed_indices = self._mix_pixel_indices(0.5, self.image_pixel_set_seed + 2000)
-                            x = self._set_pixels_to_value(x, value=-1.0, pixel_indices=mixed_indices)
-                        elif transformation == 'set_mixed_75_25_pixels_minus_one':
-                            mixed_indices = self._mix_pixel_indices(0.75, self.image_pixel_set_seed + 3000)
-                            x = self._set_pixels_to_value(x, value=-1.0, pixel_indices=mixed_indices)
-                        elif transformation == 'set_mixed_25_75_pixels_minus_one':
-                            mixed_indices = self._mix_pixel_indices(0.25, self.image_pixel_set_seed + 4000)
-                            x = self._set_pixels_to_value(x, value=-1.0, pixel_indices=mixed_indices)
-                        elif transformation == 'set_mixed_10_90_pixels_minus_one':
-                            mixed_indices = self._mix_pixel_indices(0.10, self.image_pixel_set_seed + 5000)
-                            x = self._set_pixels_to_value(x, value=-1.0, pixel_indices=mixed_indices)
-                        elif transformation == 'set_mixed_5_95_pixels_minus_one':
-                            mixed_indices = self._mix_pixel_indices(0.05, self.image_pixel_set_seed + 6000)
-                            x = self._set_pixels_to_value(x, value=-1.0, pixel_indices=mixed_indices)
-                        elif transformation == 'set_mixed_1_99_pixels_minus_one':
-                            mixed_indices = self._mix_pixel_indices(0.01, self.image_pixel_set_seed + 7000)
-                            x = self._set_pixels_to_value(x, value=-1.0, pixel_indices=mixed_indices)
-                    
-                    # Store images and extract features
-                    negative_images.append(x)
-                    features = extract_inception_features(x, batch_size=batch_size, device=self.device)
-                    negative_features.append(features)
+                        # Progress reporting
+                        completed += 1
+                        if self.rank == 0 and completed % max(1, total_evals//5) == 0:
+                            logging.info(f"Completed {completed}/{total_evals} evaluations")
                     
-                    # Calculate MSE (existing code)
-                    features = self.extract_image_partial(x)
-                    true_values = features
-                    pred_values = self.decoder(x)
-                    mse = torch.mean(torch.pow(pred_values - true_values, 2), dim=1).cpu().numpy()
-                    mse_per_sample.extend(mse.tolist())
-                
-                # Combine all negative images and features
-                negative_images = torch.cat(negative_images, dim=0)
-                negative_features = np.concatenate(negative_features, axis=0)
-                
-                # Calculate all distribution metrics
-                fid_score = calculate_fid(
-                    (original_images + 1) / 2,
-                    (negative_images + 1) / 2,
-                    batch_size=batch_size,
-                    device=self.device
-                )
-                
-                kid_score = calculate_kid(original_features, negative_features)
-                
-                is_mean, is_std = inception_score_calc.calculate_score(
-                    (negative_images + 1) / 2,
-                    batch_size=batch_size
-                )
-                
-                precision, recall = calculate_precision_recall(
-                    original_features,
-                    negative_features
-                )
-                
-                wasserstein_dist = calculate_wasserstein(
-                    original_features,
-                    negative_features
-                )
-                
-                mmd_score = calculate_mmd(
-                    original_features,
-                    negative_features
-                )
-                
-                # Calculate standard metrics (existing code)
-                mse_per_sample = np.array(mse_per_sample)
-                mse_all = np.mean(mse_per_sample)
-                mse_std = np.std(mse_per_sample)
-                fpr = np.mean(mse_per_sample <= threshold)
-                
-                # Store all metrics
-                negative_results[key] = {
-                    'mse_mean': mse_all,
-                    'mse_std': mse_std,
-                    'mse_values': mse_per_sample,
-                    'fpr_at_95tpr': fpr,
-                    'fid_score': fid_score,
-                    'kid_score': kid_score,
-                    'inception_score_mean': is_mean,
-                    'inception_score_std': is_std,
-                    'precision': precision,
-                    'recall': recall,
-                    'wasserstein': wasserstein_dist,
-                    'mmd': mmd_score
-                }
-                
+                    if self.eval_state is not None:
+                        self.eval_state.clear_partial("image_transforms")
+        
+        # Report cases in their usual order, however many were loaded from the evaluation state
+        order = [key for key, _, _ in model_evaluations] + list(image_transforms)
+        return {key: negative_results[key] for key in order if key in negative_results}
+    
+    def _build_image_transforms(self) -> Dict[str, Callable[[torch.Tensor, Optional[TransformBatch]], torch.Tensor]]:
+        """
+        Build the image-space negative transformations configured in evaluate.get_negative_transforms().
+        
+        Pixel sets are taken from the shared pixel set, which caches them per seed.
+        
+        Returns:
+            Dict[str, Callable]: Mapping from case name to a function of an image batch.
+        """
+        setup = TransformSetup(
+            pixel_set=self.pixel_set,
+            seed=self.config.evaluate.seed if self.config.evaluate.seed is not None else 0,
+            value_range=image_value_range(self.config.model.model_type)
+        )
+        return build_negative_transforms(self.config.evaluate.get_negative_transforms(), setup)
+    
+    def _generate_records(
+        self,
+        group: str,
+        transforms: Dict[str, Callable[[torch.Tensor], torch.Tensor]],
+        generate_batch: Callable[[int, int], torch.Tensor],
+        batch_range: Tuple[int, int],
+        inception_score_calc: InceptionScore,
+        with_inception: bool = True
+    ) -> Dict[str, GenerationRecord]:
+        """
+        Generate this rank's batches and record every transformation of each batch.
+        
+        With an evaluation state, partial results are saved every eval_state_save_every
+        batches and an interrupted group resumes after the last saved batch.
+        
+        Args:
+            group (str): Name of the generation, used for its partial results.
+            transforms (Dict[str, Callable]): Mapping from record name to a function of an image batch;
+                transformations of the same batch share a TransformBatch (e.g. its resampling pyramid).
+            generate_batch (Callable[[int, int], torch.Tensor]): Generates the samples [start_idx, end_idx).
+            batch_range (Tuple[int, int]): Batches generated by this rank.
+            inception_score_calc (InceptionScore): Inception Score calculator.
+            with_inception (bool): Whether to record inception outputs, or only decoder MSEs.
+            
+        Returns:
+            Dict[str, GenerationRecord]: This rank's record of every transformation (not yet gathered).
+        """
+        batch_size = self.config.evaluate.batch_size
+        num_samples = self.config.evaluate.num_samples
+        batch_start, batch_end = batch_range
+        records = {
+            key: GenerationRecord(with_inception=with_inception, fid_moments=StreamingMoments(device=self.device))
+            for key in transforms
+        }
+        
+        # Resume from this rank's partial results, if they cover every requested record
+        first_batch = batch_start
+        partial_state = self.eval_state.load_partial(group, batch_range) if self.eval_state is not None else None
+        if partial_state is not None:
+            next_batch, arrays = partial_state
+            if all(f"{key}.{name}" in arrays for key, record in records.items() for name in record._names()):
+                for key, record in records.items():
+                    record.load_state_dict(arrays, prefix=f"{key}.")
+                first_batch = next_batch
                 if self.rank == 0:
-                    logging.info(
-                        f"Results for {key}:\n"
-                        f"- FPR at 95% TPR: {fpr:.4f}\n"
-                        f"- FID Score: {fid_score:.4f}\n"
-                        f"- KID Score: {kid_score:.4f}\n"
-                        f"- Inception Score: {is_mean:.4f} ± {is_std:.4f}\n"
-                        f"- Precision/Recall: {precision:.4f}/{recall:.4f}\n"
-                        f"- Wasserstein: {wasserstein_dist:.4f}\n"
-                        f"- MMD: {mmd_score:.4f}"
-                    )
-                
-                # Progress reporting
-                if self.rank == 0 and (idx+1) % max(1, total_evals//5) == 0:
-                    logging.info(f"Completed {idx+1}/{total_evals} evaluations")
+                    logging.info(f"Resuming {group} at batch {next_batch - batch_start + 1}/{batch_end - batch_start}")
+        
+        for i in range(first_batch, batch_end):
+            start_idx = i * batch_size
+            end_idx = min((i + 1) * batch_size, num_samples)
+            x = generate_batch(start_idx, end_idx)
+            batch = TransformBatch(x, start_idx)
+            for key, transform in transforms.items():
+                self._record_batch(records[key], transform(x, batch), inception_score_calc)
+            del x, batch
+            
+            done = i - batch_start + 1
+            if self.eval_state is not None and i + 1 < batch_end and self.eval_state.should_save_partial(done):
+                arrays = {}
+                for key, record in records.items():
+                    arrays.update(record.state_dict(prefix=f"{key}."))
+                self.eval_state.save_partial(group, batch_range, i + 1, arrays)
+            
+            # Progress reporting
+            local_batches = batch_end - batch_start
+            if self.rank == 0 and local_batches > 10 and done % max(1, local_batches//10) == 0:
+                logging.info(f"Processed {done}/{local_batches} batches")
+        
+        return records
+    
+    def _reference_stats_key(
+        self,
+        prompt_batches: Optional[List[List[str]]] = None
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Key of the original model's inception statistics in the reference-statistics cache.
+        
+        The original images are only reproducible with a fixed evaluation seed, so unseeded
+        runs do not use the cache.
+        
+        Args:
+            prompt_batches (Optional[List[List[str]]]): Prompts of each batch in multi-prompt mode.
+                The prompt datasets are subsampled without a fixed seed, so the key hashes the
+                prompts actually used rather than the dataset settings.
+            
+        Returns:
+            tuple: (key, settings), or (None, None) if the cache does not apply.
+        """
+        seed = self.config.evaluate.seed
+        if self.reference_stats is None or seed is None:
+            return None, None
+        
+        model_config = self.config.model
+        num_samples = self.config.evaluate.num_samples
+        generation = {'model_type': model_config.model_type, 'img_size': model_config.img_size}
+        if model_config.model_type == "stylegan2":
+            # Latents are drawn in one call from the seeded RNG of the device
+            model_id = model_config.stylegan2_url
+            generation.update(noise_mode="const", latent_device=self.device.type)
+        else:
+            model_id = corpus_model_id(self.generative_model)
+            generation.update(model_config.get_generation_kwargs())
+            if model_config.enable_multi_prompt:
+                # Prompts are sampled per batch from the evaluation prompt set
+                generation.pop('prompt')
+                generation['prompts_sha256'] = hashlib.sha256(
+                    json.dumps(prompt_batches).encode('utf-8')
+                ).hexdigest()
+        return reference_stats_key(
+            model_id, generation, (seed, seed + num_samples),
+            extractor=inception_feature_version(self.config.evaluate.fast_inception)
+        )
+    
+    def _generate_negative_batch(
+        self,
+        model: BaseGenerativeModel,
+        negative_z: Optional[torch.Tensor],
+        start_idx: int,
+        end_idx: int,
+        gen_kwargs: Dict[str, Any],
+        use_corpus: bool = False
+    ) -> torch.Tensor:
+        """
+        Generate one batch of negative sample images.
+        
+        Args:
+            model (BaseGenerativeModel): Model to generate with.
+            negative_z (Optional[torch.Tensor]): Negative latent vectors (StyleGAN2 only).
+            start_idx (int): First sample index of the batch.
+            end_idx (int): End sample index of the batch (exclusive).
+            gen_kwargs (Dict[str, Any]): Generation kwargs for the model.
+            use_corpus (bool): Whether the model's images may be read from / written to the image corpus.
+            
+        Returns:
+            torch.Tensor: Generated images.
+        """
+        if self.config.model.model_type == "stylegan2":
+            return model.generate_images(
+                batch_size=end_idx - start_idx,
+                device=self.device,
+                z=negative_z[start_idx:end_idx],
+                **gen_kwargs
+            )
+        # Negative seeds follow the original ones, as negative_z is drawn after original_z;
+        # all negative models share them, so their images are paired sample by sample
+        return generate_with_corpus(
+            model,
+            seeds=self._sample_seeds(start_idx, end_idx, offset=self.config.evaluate.num_samples),
+            corpus=self.image_corpus if use_corpus else None,
+            device=self.device,
+            **gen_kwargs
+        )
+    
+    def _sample_seeds(self, start_idx: int, end_idx: int, offset: int = 0) -> List[int]:
+        """
+        Per-sample generation seeds (Stable Diffusion), derived from evaluate.seed.
+        
+        Args:
+            start_idx (int): First sample index.
+            end_idx (int): End sample index (exclusive).
+            offset (int): Offset added to the sample indices.
+            
+        Returns:
+            List[int]: One seed per sample.
+        """
+        base_seed = self.config.evaluate.seed if self.config.evaluate.seed is not None else 0
+        return [base_seed + offset + i for i in range(start_idx, end_idx)]
+    
+    def _record_batch(self, record: GenerationRecord, x: torch.Tensor, inception_score_calc: InceptionScore) -> None:
+        """
+        Compute decoder MSEs and inception outputs for a batch of images and add them to a record.
+        
+        Args:
+            record (GenerationRecord): Record to add the batch to.
+            x (torch.Tensor): Images as generated (StyleGAN2 in [-1, 1], Stable Diffusion in [0, 1]).
+            inception_score_calc (InceptionScore): Inception Score calculator.
+        """
+        batch_size = self.config.evaluate.batch_size
+        
+        # Extract features (real pixel values) and predict them
+        true_values = self.extract_image_partial(x)
+        pred_values = self.decoder(x)
+        mse = torch.mean(torch.pow(pred_values - true_values, 2), dim=1).cpu().numpy()
+        
+        if not record.with_inception:
+            record.add_batch(mse=mse)
+            return
+        
+        # One Inception pass over images in [0, 1] yields the features of all distribution
+        # metrics and the IS logits; only StyleGAN2 generates images in [-1, 1]
+        inception_input = (x + 1) / 2 if self.config.model.model_type == "stylegan2" else x
+        features, logits = extract_inception_outputs(
+            inception_input, batch_size=batch_size, device=self.device, fast=self.config.evaluate.fast_inception,
+            as_tensor=True
+        )
+        record.add_batch(mse=mse, features=features, is_logits=logits)
+    
+    def _negative_result(
+        self,
+        key: str,
+        record: GenerationRecord,
+        original_features: np.ndarray,
+        original_fid_statistics: Tuple[np.ndarray, np.ndarray],
+        threshold: float
+    ) -> Dict[str, Any]:
+        """
+        Compute detection and distribution metrics of one negative case.
+        
+        The gathered record is identical on every rank, so rank 0 computes the metrics and
+        shares them with the other ranks.
+        
+        Args:
+            key (str): Name of the negative case.
+            record (GenerationRecord): Recorded results of the negative case, gathered over all ranks.
+            original_features (Optional[np.ndarray]): Inception features of the original images (rank 0 only).
+            original_fid_statistics (Optional[Tuple[np.ndarray, np.ndarray]]): Mean and covariance of the
+                inception features of the original images in [0, 1] (rank 0 only).
+            threshold (float): MSE threshold at 95% TPR from original model.
+            
+        Returns:
+            Dict[str, Any]: Metrics of the negative case.
+        """
+        result = None
+        if self.rank == 0:
+            result = self._compute_negative_result(key, record, original_features, original_fid_statistics, threshold)
+        return broadcast_object(result, self.world_size)
+    
+    def _compute_negative_result(
+        self,
+        key: str,
+        record: GenerationRecord,
+        original_features: np.ndarray,
+        original_fid_statistics: Tuple[np.ndarray, np.ndarray],
+        threshold: float
+    ) -> Dict[str, Any]:
+        """Metrics of one negative case, computed on this rank (see _negative_result)."""
+        negative_features = record.concatenated('features')
+        
+        # Calculate all distribution metrics
+        fid_score = compute_fid_from_statistics(*original_fid_statistics, *record.fid_moments.statistics())
+        kid_score, kid_std = calculate_kid(original_features, negative_features, device=self.device)
+        is_mean, is_std = InceptionScore.score_from_logits(record.concatenated('is_logits'))
+        prdc = calculate_prdc(original_features, negative_features, device=self.device)
+        wasserstein_dist = calculate_wasserstein(original_features, negative_features, device=self.device)
+        mmd_score = calculate_mmd(original_features, negative_features, device=self.device)
+        
+        # Calculate standard metrics
+        mse_per_sample = record.concatenated('mse')
+        mse_all = np.mean(mse_per_sample)
+        mse_std = np.std(mse_per_sample)
+        fpr = np.mean(mse_per_sample <= threshold)
+        
+        logging.info(
+            f"Results for {key}:\n"
+            f"- FPR at 95% TPR: {fpr:.4f}\n"
+            f"- FID Score: {fid_score:.4f}\n"
+            f"- KID Score: {kid_score:.4f} ± {kid_std:.4f}\n"
+            f"- Inception Score: {is_mean:.4f} ± {is_std:.4f}\n"
+            f"- Precision/Recall: {prdc['precision']:.4f}/{prdc['recall']:.4f}\n"
+            f"- Density/Coverage: {prdc['density']:.4f}/{prdc['coverage']:.4f}\n"
+            f"- Wasserstein: {wasserstein_dist:.4f}\n"
+            f"- MMD: {mmd_score:.4f}"
+        )
         
-        return negative_results
+        return {
+            'mse_mean': mse_all,
+            'mse_std': mse_std,
+            'mse_values': mse_per_sample,
+            'fpr_at_95tpr': fpr,
+            'fid_score': fid_score,
+            'kid_score': kid_score,
+            'kid_std': kid_std,
+            'inception_score_mean': is_mean,
+            'inception_score_std': is_std,
+            'precision': prdc['precision'],
+            'recall': prdc['recall'],
+            'density': prdc['density'],
+            'coverage': prdc['coverage'],
+            'wasserstein': wasserstein_dist,
+            'mmd': mmd_score
+        }
     
     def evaluate(self):
         """
@@ -868,6 +1158,15 @@ class FingerprintEvaluator:
             
             logging.info("-" * 200)
         
+        # Report per-stage memory usage
+        if self.rank == 0:
+            self.memory_tracker.log_summary()
+        self.memory_tracker.save_summary(self.config.output_dir)
+        self.memory_tracker.close()
+        
+        if self.image_corpus is not None:
+            self.image_corpus.close()
+        
         return metrics
 
     def _load_prompt_dataset(self) -> None:
@@ -976,6 +1275,8 @@ class FingerprintEvaluator:
             logging.info(f"Loading evaluation prompts from Parti-Prompts dataset for category: {self.config.model.parti_prompts_category}")
         
         try:
+            from datasets import load_dataset
+            
             # Load the Parti-Prompts dataset
             dataset = load_dataset("nateraw/parti-prompts", split="train", trust_remote_code=True)
             
@@ -1037,100 +1338,27 @@ class FingerprintEvaluator:
             return [self.config.model.sd_prompt] * batch_size
         
         return random.sample(self.prompts, min(batch_size, len(self.prompts)))
-
-    # Add helper method for pixel manipulation
-    def _set_pixels_to_value(self, images: torch.Tensor, value: float = -1.0, pixel_indices: Optional[torch.Tensor] = None) -> torch.Tensor:
-        """
-        Set the selected pixel indices to a specific value.
-        
-        Args:
-            images (torch.Tensor): Input images tensor [B, C, H, W]
-            value (float): Value to set the selected pixels to
-            pixel_indices (Optional[torch.Tensor]): Custom pixel indices to set. If None, uses self.image_pixel_indices
-            
-        Returns:
-            torch.Tensor: Modified images with selected pixels set to value
-        """
-        batch_size = images.shape[0]
-        modified_images = images.clone()
-        
-        # Use provided indices or default to self.image_pixel_indices
-        indices_to_use = pixel_indices if pixel_indices is not None else self.image_pixel_indices
-        
-        # Reshape images to [batch_size, channels*height*width]
-        flattened = modified_images.view(batch_size, -1)
-        
-        # Set selected indices to value
-        flattened[:, indices_to_use] = value
-        
-        # Reshape back to original shape
-        return flattened.view_as(images)
-
-    def _generate_random_pixel_indices(self, seed: int) -> torch.Tensor:
-        """
-        Generate random pixel indices with a specific seed.
-        
-        Args:
-            seed (int): Random seed for pixel selection
-            
-        Returns:
-            torch.Tensor: Random pixel indices
+    
+    def _sample_prompt_batches(self, num_samples: int, batch_size: int) -> List[List[str]]:
         """
-        # Set seed for reproducibility
-        torch.manual_seed(seed)
-        
-        # Calculate total number of pixels
-        img_size = self.config.model.img_size
-        channels = 3  # RGB image
-        total_pixels = channels * img_size * img_size
+        Sample the prompts of every evaluation batch up front.
         
-        # Generate random indices (without replacement)
-        if self.image_pixel_count > total_pixels:
-            indices = torch.arange(total_pixels)
-        else:
-            indices = torch.randperm(total_pixels)[:self.image_pixel_count]
-        
-        return indices.to(self.device)
-
-    # Add helper method for mixing pixel indices
-    def _mix_pixel_indices(self, original_ratio: float, random_seed: int) -> torch.Tensor:
-        """
-        Mix original pixel indices with random ones at specified ratio.
+        The prompts are drawn in batch order, as a single process would, and taken from
+        rank 0 so that all ranks use the same prompts for the batches they generate.
         
         Args:
-            original_ratio (float): Ratio of original pixels to keep (0.0 to 1.0)
-            random_seed (int): Random seed for generating new pixel indices
+            num_samples (int): Total number of samples.
+            batch_size (int): Batch size.
             
         Returns:
-            torch.Tensor: Mixed pixel indices
+            List[List[str]]: Prompts of each batch.
         """
-        total_pixels = len(self.image_pixel_indices)
-        num_original = int(total_pixels * original_ratio)
-        num_random = total_pixels - num_original
-        
-        # Get original indices
-        original_indices = self.image_pixel_indices[:num_original]
-        
-        # Generate random indices ensuring no overlap with original indices
-        if num_random > 0:
-            torch.manual_seed(random_seed)
-            
-            # Calculate total available pixels
-            img_size = self.config.model.img_size
-            channels = 3
-            total_available = channels * img_size * img_size
-            
-            # Create mask of available indices (excluding original indices)
-            available_mask = torch.ones(total_available, dtype=torch.bool, device=self.device)
-            available_mask[self.image_pixel_indices] = False
-            available_indices = torch.nonzero(available_mask).squeeze()
-            
-            # Sample random indices from available ones
-            random_indices = available_indices[torch.randperm(len(available_indices))[:num_random]]
-            
-            # Combine original and random indices
-            mixed_indices = torch.cat([original_indices, random_indices])
-        else:
-            mixed_indices = original_indices
-        
-        return mixed_indices
\ No newline at end of file
+        prompt_batches = [
+            self._sample_prompts(min(batch_size, num_samples - start_idx))
+            for start_idx in range(0, num_samples, batch_size)
+        ]
+        if self.world_size > 1:
+            shared = [prompt_batches]
+            torch.distributed.broadcast_object_list(shared, src=0)
+            prompt_batches = shared[0]
+        return prompt_batches
\ No newline at end of file
@@ -1,8 +1,31 @@
 """
 Models module for StyleGAN Fingerprinting.
+
+Submodules are imported lazily on first attribute access, so importing the package
+does not pull in the StyleGAN2 (dnnlib/legacy) or Stable Diffusion (diffusers) stacks.
 """
+import importlib
+
+_LAZY_ATTRIBUTES = {
+    "DecoderSD_L": ".decoder",
+    "DecoderSD_M": ".decoder",
+    "DecoderSD_S": ".decoder",
+    "StyleGAN2Decoder": ".decoder",
+    "load_stylegan2_model": ".model_utils",
+    "clone_model": ".model_utils",
+}
+
+__all__ = ["DecoderSD_L", "DecoderSD_M", "DecoderSD_S", "StyleGAN2Decoder", "load_stylegan2_model", "clone_model"]
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-from .decoder import DecoderSD_L, DecoderSD_M, DecoderSD_S, StyleGAN2Decoder
-from .model_utils import load_stylegan2_model, clone_model
 
-__all__ = ["DecoderSD_L", "DecoderSD_M", "DecoderSD_S", "StyleGAN2Decoder", "load_stylegan2_model", "clone_model"] 
\ No newline at end of file
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 import torch
-from typing import Optional, Union, Dict, Any
+from typing import Optional, Union, Dict, Any, List, Sequence
 
 class BaseGenerativeModel(ABC):
     """Abstract base class for generative models."""
@@ -17,7 +17,10 @@ class BaseGenerativeModel(ABC):
         Args:
             batch_size (int): Number of images to generate
             device (torch.device): Device to generate on
-            **kwargs: Additional model-specific arguments
+            **kwargs: Additional model-specific arguments. Implementations accept
+                seeds (Sequence[int]): one seed per sample; each sample's randomness is then
+                drawn from its own generator, so a batch matches the same samples
+                generated one at a time.
             
         Returns:
             torch.Tensor: Generated images [B, C, H, W]
@@ -38,4 +41,18 @@ class BaseGenerativeModel(ABC):
     @abstractmethod
     def image_size(self) -> int:
         """Get the output image size"""
-        pass 
\ No newline at end of file
+        pass
+
+
+def make_sample_generators(seeds: Sequence[int]) -> List[torch.Generator]:
+    """Create one CPU generator per sample seed.
+    
+    CPU generators make the drawn noise independent of the device the model runs on.
+    
+    Args:
+        seeds (Sequence[int]): Per-sample seeds
+        
+    Returns:
+        List[torch.Generator]: Seeded generators
+    """
+    return [torch.Generator(device='cpu').manual_seed(int(seed)) for seed in seeds] 
\ No newline at end of file
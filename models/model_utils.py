@@ -5,15 +5,31 @@ import copy
 import logging
 import os
 import pickle
+import sys
+from typing import Optional
 
 import torch
 import torch.nn as nn
 
-# Import StyleGAN2 dependencies - adjust this based on your environment
-import sys
-sys.path.append("./stylegan2-ada-pytorch")
-import dnnlib
-import legacy
+from models import stylegan2_cache
+
+# Location of the StyleGAN2-ADA sources - adjust this based on your environment
+STYLEGAN2_REPO_PATH = "./stylegan2-ada-pytorch"
+
+
+def _import_stylegan2_modules():
+    """
+    Import the StyleGAN2-ADA dnnlib and legacy modules on first use, so that
+    runs which never touch StyleGAN2 do not need (or pay for) them.
+    
+    Returns:
+        tuple: The (dnnlib, legacy) modules.
+    """
+    if STYLEGAN2_REPO_PATH not in sys.path:
+        sys.path.append(STYLEGAN2_REPO_PATH)
+    import dnnlib
+    import legacy
+    return dnnlib, legacy
 
 
 def save_finetuned_model(model, path, filename):
@@ -43,6 +59,8 @@ def load_finetuned_model(path):
     Returns:
         nn.Module: Loaded model.
     """
+    # Unpickling StyleGAN2 networks needs the StyleGAN2-ADA modules on the path
+    _import_stylegan2_modules()
     with open(path, 'rb') as f:
         model = pickle.load(f)
     return model
@@ -65,14 +83,23 @@ def clone_model(model):
     return cloned_model
 
 
-def load_stylegan2_model(url: str, local_path: str, device: torch.device) -> nn.Module:
+def load_stylegan2_model(
+    url: str,
+    local_path: str,
+    device: torch.device,
+    cache_dir: Optional[str] = None
+) -> nn.Module:
     """
     Load a pre-trained StyleGAN2 model from a URL or local path.
     
+    The first load of a pickle converts its generator into a safetensors cache entry
+    keyed by the pickle's hash; later loads rebuild the generator from that entry.
+    
     Args:
         url (str): URL to download the model from if not found locally.
         local_path (str): Local path to save the downloaded model or load existing model.
         device (torch.device): Device to load the model onto.
+        cache_dir (str, optional): Directory of the converted cache. None or "" disables it.
         
     Returns:
         nn.Module: StyleGAN2 generator model.
@@ -81,7 +108,27 @@ def load_stylegan2_model(url: str, local_path: str, device: torch.device) -> nn.
         logging.info(f"Downloading StyleGAN2 model to {local_path}...")
         torch.hub.download_url_to_file(url, local_path)
         logging.info("Download complete.")
+    dnnlib, legacy = _import_stylegan2_modules()
+    
+    use_cache = bool(cache_dir) and stylegan2_cache.cache_available()
+    if use_cache:
+        sha256 = stylegan2_cache.file_sha256(local_path, cache_dir)
+        try:
+            model = stylegan2_cache.load_from_cache(cache_dir, sha256, device)
+            if model is not None:
+                logging.info(f"Loaded StyleGAN2 model {local_path} from cache {cache_dir}")
+                return model
+        except Exception as e:
+            logging.warning(f"Failed to load StyleGAN2 cache entry for {local_path}, reloading pickle: {str(e)}")
+    
     with dnnlib.util.open_url(local_path) as f:
         # Load the pickle and extract the generator 'G_ema'
         model = legacy.load_network_pkl(f)['G_ema'].to(device)
+    
+    if use_cache:
+        try:
+            if stylegan2_cache.save_to_cache(model, cache_dir, sha256):
+                logging.info(f"Converted StyleGAN2 model {local_path} into cache {cache_dir}")
+        except Exception as e:
+            logging.warning(f"Failed to write StyleGAN2 cache entry for {local_path}: {str(e)}")
     return model 
\ No newline at end of file
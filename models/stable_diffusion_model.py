@@ -1,8 +1,6 @@
 import torch
 from typing import Optional, Dict, Any
-from diffusers import DiffusionPipeline, DPMSolverMultistepScheduler
-from diffusers.models import AutoencoderKL
-from .base_model import BaseGenerativeModel
+from .base_model import BaseGenerativeModel, make_sample_generators
 import numpy as np
 from utils.image_transforms import prune_model_weights
 
@@ -26,6 +24,9 @@ class StableDiffusionModel(BaseGenerativeModel):
             dtype (torch.dtype): Model dtype
             enable_cpu_offload (bool): Whether to enable CPU offloading
         """
+        # diffusers is only needed for Stable Diffusion runs, so import it here
+        from diffusers import DiffusionPipeline
+        
         self._device = device
         self._img_size = img_size
         self._model_name = model_name
@@ -74,6 +75,8 @@ class StableDiffusionModel(BaseGenerativeModel):
                 prompt (str or List[str]): Text prompt or list of prompts
                 num_inference_steps (int): Number of denoising steps
                 guidance_scale (float): Classifier-free guidance scale
+                seeds (Sequence[int]): Per-sample seeds; each sample's initial latents are drawn
+                    from its own generator instead of the global RNG
                 
         Returns:
             torch.Tensor: Generated images [B, C, H, W] in range [0, 1]
@@ -82,6 +85,14 @@ class StableDiffusionModel(BaseGenerativeModel):
         prompt = kwargs.get("prompt", "A photorealistic advertisement poster for a Japanese cafe named 'NOVA CAFE', with the name written clearly in both English and Japanese on a street sign, a storefront banner, and a coffee cup. The scene is set at night with neon lighting, rain-slick streets reflecting the glow, and people walking by in motion blur. Cinematic tone, Leica photo quality, ultra-detailed textures.")
         num_inference_steps = kwargs.get("num_inference_steps", 50)
         guidance_scale = kwargs.get("guidance_scale", 7.5)
+        seeds = kwargs.get("seeds")
+        
+        # One generator per sample makes every image independent of its batch
+        generator = None
+        if seeds is not None:
+            if len(seeds) != batch_size:
+                raise ValueError(f"Expected {batch_size} seeds, got {len(seeds)}")
+            generator = make_sample_generators(seeds)
         
         # Handle prompt input - ensure it's a list of strings with correct batch size
         if isinstance(prompt, str):
@@ -102,7 +113,8 @@ class StableDiffusionModel(BaseGenerativeModel):
                     num_inference_steps=num_inference_steps,
                     guidance_scale=guidance_scale,
                     height=self._img_size,
-                    width=self._img_size
+                    width=self._img_size,
+                    generator=generator
                 )
             except Exception as e:
                 print(f"Error during generation: {e}")
@@ -0,0 +1,197 @@
+"""
+Converted cache for StyleGAN2-ADA network pickles.
+
+The first load of a .pkl stores the generator's architecture spec (class source and
+constructor arguments) as JSON and its weights as safetensors, keyed by the pickle's
+SHA-256. Later loads rebuild the generator from the spec and memory-map the weights
+instead of unpickling the network again.
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import torch
+import torch.nn as nn
+
+try:
+    from safetensors.torch import load_file, save_file
+except ImportError:  # safetensors is optional; loading falls back to the pickle
+    load_file = save_file = None
+
+
+SPEC_FILENAME = "spec.json"
+WEIGHTS_FILENAME = "weights.safetensors"
+HASH_INDEX_FILENAME = "pkl_hashes.json"
+CACHE_VERSION = 1
+
+
+def cache_available() -> bool:
+    """Whether the safetensors backend needed by the cache is installed."""
+    return save_file is not None
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]) -> None:
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def file_sha256(path: str, cache_dir: str) -> str:
+    """
+    SHA-256 of a file, memoized in the cache directory by absolute path, size and mtime.
+
+    Args:
+        path (str): File to hash.
+        cache_dir (str): Cache directory holding the hash index.
+
+    Returns:
+        str: Hex digest.
+    """
+    abs_path = os.path.abspath(path)
+    stat = os.stat(abs_path)
+    index_path = os.path.join(cache_dir, HASH_INDEX_FILENAME)
+
+    index = {}
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+
+    entry = index.get(abs_path)
+    if entry and entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+        return entry['sha256']
+
+    digest = hashlib.sha256()
+    with open(abs_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    sha256 = digest.hexdigest()
+
+    index[abs_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_json_atomic(index_path, index)
+    return sha256
+
+
+def _entry_dir(cache_dir: str, sha256: str) -> str:
+    return os.path.join(cache_dir, sha256)
+
+
+def save_to_cache(model: nn.Module, cache_dir: str, sha256: str) -> bool:
+    """
+    Store a StyleGAN2-ADA network as an architecture spec plus safetensors weights.
+
+    Args:
+        model (nn.Module): Network unpickled by legacy.load_network_pkl (a persistent class).
+        cache_dir (str): Cache directory.
+        sha256 (str): SHA-256 of the source pickle.
+
+    Returns:
+        bool: True if the entry was written.
+    """
+    if not cache_available():
+        return False
+    if not hasattr(model, '_orig_module_src') or not hasattr(model, 'init_kwargs'):
+        logging.warning("StyleGAN2 network is not a persistent class; skipping safetensors cache")
+        return False
+
+    spec = {
+        'version': CACHE_VERSION,
+        'class_name': model._orig_class_name,
+        'module_src': model._orig_module_src,
+        'init_args': list(model.init_args),
+        'init_kwargs': dict(model.init_kwargs),
+        'training': model.training,
+        'requires_grad': any(p.requires_grad for p in model.parameters()),
+    }
+    try:
+        spec_json = json.dumps(spec)
+    except TypeError as e:
+        logging.warning(f"StyleGAN2 constructor arguments are not serializable; skipping cache: {str(e)}")
+        return False
+
+    entry_dir = _entry_dir(cache_dir, sha256)
+    os.makedirs(entry_dir, exist_ok=True)
+
+    # Clone so that tensors sharing storage are written independently
+    state = {k: v.detach().cpu().contiguous().clone() for k, v in model.state_dict().items()}
+    weights_path = os.path.join(entry_dir, WEIGHTS_FILENAME)
+    tmp_weights_path = f"{weights_path}.tmp{os.getpid()}"
+    save_file(state, tmp_weights_path)
+    os.replace(tmp_weights_path, weights_path)
+
+    # The spec is written last; its presence marks a complete entry
+    spec_path = os.path.join(entry_dir, SPEC_FILENAME)
+    tmp_spec_path = f"{spec_path}.tmp{os.getpid()}"
+    with open(tmp_spec_path, 'w') as f:
+        f.write(spec_json)
+    os.replace(tmp_spec_path, spec_path)
+    return True
+
+
+def _construct(spec: Dict[str, Any], device: Optional[torch.device]) -> nn.Module:
+    from torch_utils import persistence
+
+    module = persistence._src_to_module(spec['module_src'])
+    network_class = getattr(module, spec['class_name'])
+    if device is None:
+        return network_class(*spec['init_args'], **spec['init_kwargs'])
+    with torch.device(device):
+        return network_class(*spec['init_args'], **spec['init_kwargs'])
+
+
+def load_from_cache(cache_dir: str, sha256: str, device: torch.device) -> Optional[nn.Module]:
+    """
+    Rebuild a cached StyleGAN2-ADA network.
+
+    The network is constructed on the meta device (skipping random initialization) and the
+    memory-mapped safetensors weights are assigned directly; if that is not possible it is
+    constructed on the CPU and the weights are copied in.
+
+    Args:
+        cache_dir (str): Cache directory.
+        sha256 (str): SHA-256 of the source pickle.
+        device (torch.device): Device to load the network onto.
+
+    Returns:
+        Optional[nn.Module]: The network, or None on a cache miss.
+    """
+    if not cache_available():
+        return None
+    entry_dir = _entry_dir(cache_dir, sha256)
+    spec_path = os.path.join(entry_dir, SPEC_FILENAME)
+    weights_path = os.path.join(entry_dir, WEIGHTS_FILENAME)
+    if not (os.path.exists(spec_path) and os.path.exists(weights_path)):
+        return None
+
+    with open(spec_path, 'r') as f:
+        spec = json.load(f)
+    if spec.get('version') != CACHE_VERSION:
+        return None
+
+    state = load_file(weights_path, device=str(device))
+
+    model = None
+    try:
+        model = _construct(spec, torch.device('meta'))
+        model.load_state_dict(state, strict=True, assign=True)
+        tensors = list(model.parameters()) + list(model.buffers())
+        if any(t.is_meta for t in tensors):
+            model = None
+    except Exception as e:
+        logging.debug(f"Meta-device construction failed, constructing on CPU: {str(e)}")
+        model = None
+
+    if model is None:
+        model = _construct(spec, None)
+        model.load_state_dict(state, strict=True)
+        model = model.to(device)
+
+    model.train(spec['training'])
+    model.requires_grad_(spec['requires_grad'])
+    return model
@@ -1,7 +1,7 @@
 import torch
 import torch.nn as nn
-from typing import Optional
-from .base_model import BaseGenerativeModel
+from typing import Optional, Sequence
+from .base_model import BaseGenerativeModel, make_sample_generators
 from models.model_utils import load_stylegan2_model
 from utils.image_transforms import prune_model_weights
 
@@ -13,7 +13,8 @@ class StyleGAN2Model(BaseGenerativeModel, nn.Module):
         model_url: str,
         model_path: str,
         device: torch.device,
-        img_size: int = 768
+        img_size: int = 768,
+        cache_dir: Optional[str] = None
     ):
         """Initialize StyleGAN2 model.
         
@@ -22,13 +23,15 @@ class StyleGAN2Model(BaseGenerativeModel, nn.Module):
             model_path (str): Local path to save/load model
             device (torch.device): Device to load model on
             img_size (int): Output image size
+            cache_dir (Optional[str]): Converted safetensors cache directory (None or "" disables it)
         """
         super(StyleGAN2Model, self).__init__()
         self._device = device
         self._img_size = img_size
         self.model_url = model_url
         self.model_path = model_path
-        self.model = load_stylegan2_model(model_url, model_path, device)
+        self.cache_dir = cache_dir
+        self.model = load_stylegan2_model(model_url, model_path, device, cache_dir=cache_dir)
         self.model.eval()
         
     def forward(self, z: torch.Tensor, **kwargs) -> torch.Tensor:
@@ -48,6 +51,7 @@ class StyleGAN2Model(BaseGenerativeModel, nn.Module):
         batch_size: int,
         device: Optional[torch.device] = None,
         z: Optional[torch.Tensor] = None,
+        seeds: Optional[Sequence[int]] = None,
         **kwargs
     ) -> torch.Tensor:
         """Generate images using StyleGAN2.
@@ -56,6 +60,8 @@ class StyleGAN2Model(BaseGenerativeModel, nn.Module):
             batch_size (int): Number of images to generate
             device (torch.device, optional): Device override
             z (Optional[torch.Tensor]): Optional latent vectors
+            seeds (Optional[Sequence[int]]): Optional per-sample seeds used to draw the latent
+                vectors when z is not given
             **kwargs: Additional arguments passed to synthesis
             
         Returns:
@@ -64,7 +70,14 @@ class StyleGAN2Model(BaseGenerativeModel, nn.Module):
         device = device or self._device
         
         # Generate or use provided latent vectors
-        if z is None:
+        if z is None and seeds is not None:
+            if len(seeds) != batch_size:
+                raise ValueError(f"Expected {batch_size} seeds, got {len(seeds)}")
+            z = torch.cat([
+                torch.randn(1, self.z_dim, generator=generator)
+                for generator in make_sample_generators(seeds)
+            ]).to(device)
+        elif z is None:
             z = torch.randn(batch_size, self.z_dim, device=device)
         
         with torch.no_grad():
@@ -151,7 +164,8 @@ class StyleGAN2Model(BaseGenerativeModel, nn.Module):
             model_url=self.model_url,
             model_path=self.model_path,
             device=self._device,
-            img_size=self._img_size
+            img_size=self._img_size,
+            cache_dir=self.cache_dir
         )
         
         # Use the utility function to prune weights
@@ -1,4 +1,17 @@
 """
 Scripts for training and evaluation.
+
+Entry point modules are imported lazily, so importing the package does not load the
+dependencies of every script.
 """
-from . import train, evaluate, attack 
\ No newline at end of file
+import importlib
+
+__all__ = ["train", "evaluate", "attack"]
+
+
+def __getattr__(name):
+    if name in __all__:
+        module = importlib.import_module(f".{name}", __name__)
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -9,13 +9,10 @@ import argparse
 import logging
 import os
 import sys
-import lpips
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import numpy as np
-from torchvision import models
-from torchmetrics.image import StructuralSimilarityIndexMeasure, PeakSignalNoiseRatio
 from dataclasses import dataclass
 
 # Add the parent directory (project root) to the Python path
@@ -31,6 +28,9 @@ from utils.image_transforms import quantize_model_weights, downsample_and_upsamp
 from utils.model_loading import load_pretrained_models
 from utils.metrics import calculate_fid
 from utils.checkpoint import load_checkpoint
+from utils.memory import MemoryTracker, create_memory_tracker
+from utils.pixel_indices import get_pixel_index_set
+from utils.result_store import save_results
 
 
 class NaiveClassifier(nn.Module):
@@ -38,6 +38,7 @@ class NaiveClassifier(nn.Module):
     def __init__(self, img_size=256):
         super().__init__()
         # Load pretrained ResNet-18 but modify for our use case
+        from torchvision import models
         self.resnet = models.resnet18(pretrained=True)
         # Modify first conv layer to accept 3 channels and maintain size
         self.resnet.conv1 = nn.Conv2d(3, 64, kernel_size=7, stride=1, padding=3, bias=False)
@@ -82,16 +83,14 @@ class Yu2019Classifier(nn.Module):
 
 class DecoderWrapper:
     """Wrapper for the AuthPrint decoder to provide binary prediction interface."""
-    def __init__(self, decoder, threshold, image_pixel_indices):
+    def __init__(self, decoder, threshold, pixel_set):
         self.decoder = decoder
         self.threshold = threshold
-        self.image_pixel_indices = image_pixel_indices
+        self.pixel_set = pixel_set
     
     def extract_features(self, x):
         """Extract features using the same method as the evaluator."""
-        batch_size = x.shape[0]
-        flattened = x.view(batch_size, -1)
-        return flattened[:, self.image_pixel_indices]
+        return self.pixel_set.extract(x)
     
     def predict(self, x):
         """Return True if image is detected as original, False if undetected.
@@ -108,6 +107,10 @@ class DecoderWrapper:
 class ImageQualityMetrics:
     """Wrapper for various image quality metrics."""
     def __init__(self, device):
+        # Metric backends are only needed once an attack is evaluated
+        import lpips
+        from torchmetrics.image import StructuralSimilarityIndexMeasure, PeakSignalNoiseRatio
+        
         self.device = device
         # Initialize LPIPS
         self.lpips_fn = lpips.LPIPS(net='alex').to(device)
@@ -134,13 +137,15 @@ class UnifiedAttack:
         original_model,
         device=None,
         rank=0,
-        config=None
+        config=None,
+        memory_tracker=None
     ):
         self.attack_type = attack_type
         self.original_model = original_model
         self.device = device
         self.rank = rank
         self.config = config
+        self.memory_tracker = memory_tracker or MemoryTracker(device, rank, enabled=False)
         
         # Initialize quality metrics for evaluation
         self.quality_metrics = ImageQualityMetrics(self.device)
@@ -618,7 +623,8 @@ class UnifiedAttack:
         for model_name, model in pretrained_models.items():
             if self.rank == 0:
                 logging.info(f"\nAttacking pretrained model: {model_name}")
-            all_results[model_name] = self.attack_negative_case(model, num_samples)
+            with self.memory_tracker.stage(f"attack:{model_name}"):
+                all_results[model_name] = self.attack_negative_case(model, num_samples)
         
         # Attack quantized models if enabled
         if self.config.attack.enable_quantization:
@@ -626,7 +632,8 @@ class UnifiedAttack:
                 case_name = f"quantization_{precision}"
                 if self.rank == 0:
                     logging.info(f"\nAttacking quantized model: {precision}")
-                all_results[case_name] = self.attack_negative_case(model, num_samples, case_name)
+                with self.memory_tracker.stage(f"attack:{case_name}"):
+                    all_results[case_name] = self.attack_negative_case(model, num_samples, case_name)
         
         # Attack downsample cases if enabled
         if self.config.attack.enable_downsampling:
@@ -634,7 +641,8 @@ class UnifiedAttack:
                 case_name = f"downsample_{size}"
                 if self.rank == 0:
                     logging.info(f"\nAttacking downsample case: {size}")
-                all_results[case_name] = self.attack_negative_case(self.original_model, num_samples, case_name)
+                with self.memory_tracker.stage(f"attack:{case_name}"):
+                    all_results[case_name] = self.attack_negative_case(self.original_model, num_samples, case_name)
         
         return all_results
 
@@ -655,6 +663,8 @@ def parse_args():
     parser.add_argument("--stylegan2_local_path", type=str,
                         default="ffhq70k-paper256-ada.pkl",
                         help="Local path to store/load the StyleGAN2 model")
+    parser.add_argument("--stylegan2_cache_dir", type=str, default="",
+                        help="Directory to cache converted StyleGAN2 networks in as safetensors (empty disables it)")
     parser.add_argument("--checkpoint_path", type=str,
                         help="Path to decoder checkpoint (required for authprint attack)")
     parser.add_argument("--img_size", type=int, default=256,
@@ -700,6 +710,14 @@ def parse_args():
     parser.add_argument("--step_size_sweep_values", type=str, default=None,
                         help="Comma-separated list of step sizes to try (e.g. '0.0001,0.0002,0.0005'). If not provided, uses default values.")
     
+    # Memory instrumentation
+    parser.add_argument("--disable_memory_tracking", action="store_true",
+                        help="Disable per-stage peak memory tracking")
+    parser.add_argument("--host_memory_interval", type=float, default=5.0,
+                        help="Seconds between background host RSS samples (0 disables host sampling)")
+    parser.add_argument("--memory_snapshot_dir", type=str, default=None,
+                        help="Directory to write CUDA memory snapshots to on out-of-memory errors")
+    
     # Output configuration
     parser.add_argument("--output_dir", type=str, default="unified_attack_results",
                         help="Directory to save attack results")
@@ -786,6 +804,9 @@ def main():
     
     # No need to handle step size sweep arguments here as they are already handled in update_from_args()
     
+    # Per-stage memory instrumentation
+    memory_tracker = create_memory_tracker(config.memory, device, rank)
+    
     # Create output directory and setup logging
     if rank == 0:
         os.makedirs(config.output_dir, exist_ok=True)
@@ -805,15 +826,19 @@ def main():
         if rank == 0:
             logging.info("Loading models...")
         
-        # Load original StyleGAN2 model
-        original_model = load_stylegan2_model(
-            config.model.stylegan2_url,
-            config.model.stylegan2_local_path,
-            device
-        )
-        
-        # Load pretrained models
-        pretrained_models = load_pretrained_models(device, rank)
+        with memory_tracker.stage("load_models"):
+            # Load original StyleGAN2 model
+            original_model = load_stylegan2_model(
+                config.model.stylegan2_url,
+                config.model.stylegan2_local_path,
+                device,
+                cache_dir=config.model.stylegan2_cache_dir
+            )
+            
+            # Load pretrained models
+            pretrained_models = load_pretrained_models(
+                device, rank, stylegan2_cache_dir=config.model.stylegan2_cache_dir
+            )
         
         # Setup quantized models
         quantized_models = {}
@@ -880,9 +905,13 @@ def main():
             )
             
             # Generate pixel indices (same as in evaluator)
-            torch.manual_seed(config.model.image_pixel_set_seed)
-            total_pixels = config.model.img_size * config.model.img_size * 3
-            image_pixel_indices = torch.randperm(total_pixels)[:config.model.image_pixel_count].to(device)
+            pixel_set = get_pixel_index_set(
+                config.model.img_size,
+                config.model.image_pixel_count,
+                config.model.image_pixel_set_seed,
+                device=device
+            )
+            image_pixel_indices = pixel_set.indices
             
             if rank == 0:
                 logging.info(f"Generated {len(image_pixel_indices)} pixel indices with seed {config.model.image_pixel_set_seed}")
@@ -891,7 +920,7 @@ def main():
             decoder_wrapper = DecoderWrapper(
                 decoder=decoder,
                 threshold=config.attack.detection_threshold,
-                image_pixel_indices=image_pixel_indices
+                pixel_set=pixel_set
             )
         
         # Create unified attacker
@@ -900,7 +929,8 @@ def main():
             original_model=original_model,
             device=device,
             rank=rank,
-            config=config  # Pass full config object
+            config=config,  # Pass full config object
+            memory_tracker=memory_tracker
         )
         
         # Setup attack components
@@ -922,10 +952,13 @@ def main():
                 case_results['step_size_sweep_enabled'] = True
                 case_results['step_size_sweep_values'] = config.attack.step_size_sweep_values
         
-        # Print results table
+        # Print and save results
         if rank == 0:
             table = format_results_table(all_results, args.attack_type)
             logging.info(table)
+            save_results(config.output_dir, "attack", all_results, config=config)
+            memory_tracker.log_summary()
+        memory_tracker.save_summary(config.output_dir)
     
     except Exception as e:
         if rank == 0:
@@ -933,6 +966,8 @@ def main():
             logging.error("Attack error:", exc_info=True)
         raise
     finally:
+        memory_tracker.close()
+        
         # Clean up distributed environment
         cleanup_distributed()
 
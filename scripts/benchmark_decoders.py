@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+"""
+Benchmark decoder capacity against throughput.
+
+For each decoder (SD S/M/L and the StyleGAN2 decoder), image size and batch size this
+reports the parameter count, forward and training-step FLOPs, forward and training-step
+latency, and peak memory (CUDA allocations on GPUs, the process RSS high-water mark on the
+CPU). Results are written to a CSV file keyed by (model_type, decoder_size, img_size,
+output_dim) so they can be joined with FPR results.
+"""
+import argparse
+import csv
+import logging
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+import torch
+import torch.nn as nn
+
+# Add the parent directory (project root) to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models.decoder import DecoderSD_L, DecoderSD_M, DecoderSD_S, StyleGAN2Decoder
+from utils.logging_utils import setup_logging
+from utils.memory import HostMemorySampler
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+try:
+    from torch.utils.flop_counter import FlopCounterMode
+except ImportError:  # FLOP counting needs torch >= 2.1
+    FlopCounterMode = None
+
+
+DECODERS = {
+    "S": ("stable-diffusion", DecoderSD_S),
+    "M": ("stable-diffusion", DecoderSD_M),
+    "L": ("stable-diffusion", DecoderSD_L),
+    "stylegan2": ("stylegan2", StyleGAN2Decoder),
+}
+
+CSV_FIELDS = [
+    "model_type", "decoder_size", "decoder", "device", "img_size", "output_dim", "batch_size",
+    "params", "fwd_gflops_per_image", "train_gflops_per_image",
+    "fwd_ms", "train_step_ms", "fwd_images_per_s", "train_images_per_s",
+    "peak_fwd_mb", "peak_train_mb", "status"
+]
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark decoder parameters, FLOPs, latency and memory")
+
+    parser.add_argument("--decoders", type=str, nargs='+', default=["S", "M", "L", "stylegan2"],
+                        choices=list(DECODERS.keys()),
+                        help="Decoders to benchmark (SD decoder sizes and/or stylegan2)")
+    parser.add_argument("--img_sizes", type=int, nargs='+', default=[256, 768, 1024],
+                        help="Input image sizes")
+    parser.add_argument("--output_dim", type=int, default=32,
+                        help="Decoder output dimension (image_pixel_count)")
+    parser.add_argument("--batch_sizes", type=int, nargs='+', default=[2, 8, 16],
+                        help="Batch sizes to time")
+    parser.add_argument("--devices", type=str, nargs='+', default=None,
+                        help="Devices to benchmark on (default: cpu, plus cuda when available)")
+    parser.add_argument("--warmup", type=int, default=2,
+                        help="Untimed warmup repetitions per measurement")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="Timed repetitions per measurement (the median is reported)")
+    parser.add_argument("--skip_training_step", action="store_true",
+                        help="Only time the forward pass")
+    parser.add_argument("--output_dir", type=str, default="decoder_benchmark",
+                        help="Directory to save the results CSV")
+
+    return parser.parse_args()
+
+
+def build_decoder(decoder_size: str, img_size: int, output_dim: int, device: torch.device) -> nn.Module:
+    """Instantiate a decoder directly on the target device."""
+    _, decoder_class = DECODERS[decoder_size]
+    with torch.device(device):
+        return decoder_class(image_size=img_size, channels=3, output_dim=output_dim)
+
+
+def count_flops(decoder_size: str, img_size: int, output_dim: int) -> Dict[str, Optional[float]]:
+    """
+    Count forward and training-step FLOPs per image on the meta device (no memory or compute).
+
+    Returns:
+        Dict[str, Optional[float]]: GFLOPs per image for the forward pass and forward+backward.
+    """
+    if FlopCounterMode is None:
+        return {"fwd": None, "train": None}
+
+    # Two images keep BatchNorm valid in training mode; FLOPs scale linearly with batch size
+    batch_size = 2
+    decoder = build_decoder(decoder_size, img_size, output_dim, torch.device("meta"))
+    x = torch.empty(batch_size, 3, img_size, img_size, device="meta")
+    target = torch.empty(batch_size, output_dim, device="meta")
+
+    with FlopCounterMode(display=False) as counter:
+        with torch.no_grad():
+            decoder(x)
+    fwd_flops = counter.get_total_flops()
+
+    with FlopCounterMode(display=False) as counter:
+        loss = torch.mean(torch.pow(decoder(x) - target, 2))
+        loss.backward()
+    train_flops = counter.get_total_flops()
+
+    return {"fwd": fwd_flops / batch_size / 1e9, "train": train_flops / batch_size / 1e9}
+
+
+def _synchronize(device: torch.device) -> None:
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+# Seconds between RSS samples while a CPU measurement runs
+HOST_SAMPLE_INTERVAL = 0.005
+
+
+def _reset_peak(device: torch.device) -> Optional[HostMemorySampler]:
+    """Start peak memory tracking; on the CPU this starts an RSS sampler, which is returned."""
+    if device.type == "cuda":
+        torch.cuda.empty_cache()
+        torch.cuda.reset_peak_memory_stats(device)
+        return None
+    sampler = HostMemorySampler(interval=HOST_SAMPLE_INTERVAL)
+    sampler.start()
+    return sampler
+
+
+def _max_rss_mb() -> Optional[float]:
+    # High-water mark over the process lifetime; kilobytes on Linux, bytes on macOS
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+def _peak_mb(device: torch.device, sampler: Optional[HostMemorySampler] = None) -> Optional[float]:
+    """Peak memory since _reset_peak: CUDA allocations, or the process RSS on the CPU."""
+    if device.type == "cuda":
+        return torch.cuda.max_memory_allocated(device) / (1024 * 1024)
+    if sampler is not None and sampler.available:
+        sampler.stop()
+        return sampler.peak_mb()
+    # Without psutil only the lifetime high-water mark is available
+    return _max_rss_mb()
+
+
+def time_fn(fn, device: torch.device, warmup: int, repeats: int) -> float:
+    """
+    Time a callable and return the median latency in milliseconds.
+    """
+    for _ in range(warmup):
+        fn()
+    _synchronize(device)
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        _synchronize(device)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def benchmark_batch(
+    decoder: nn.Module,
+    optimizer: Optional[torch.optim.Optimizer],
+    img_size: int,
+    output_dim: int,
+    batch_size: int,
+    device: torch.device,
+    warmup: int,
+    repeats: int
+) -> Dict[str, Optional[float]]:
+    """
+    Measure forward and training-step latency and peak memory for one batch size.
+    """
+    x = torch.rand(batch_size, 3, img_size, img_size, device=device) * 2 - 1
+    target = torch.rand(batch_size, output_dim, device=device) * 2 - 1
+
+    def forward():
+        with torch.no_grad():
+            decoder(x)
+
+    def train_step():
+        loss = torch.mean(torch.pow(decoder(x) - target, 2))
+        optimizer.zero_grad(set_to_none=True)
+        loss.backward()
+        optimizer.step()
+
+    results = {}
+    decoder.eval()
+    sampler = _reset_peak(device)
+    results["fwd_ms"] = time_fn(forward, device, warmup, repeats)
+    results["peak_fwd_mb"] = _peak_mb(device, sampler)
+
+    results["train_step_ms"] = None
+    results["peak_train_mb"] = None
+    # BatchNorm cannot run in training mode on a single image with 1x1 feature maps
+    has_batchnorm = any(isinstance(m, nn.modules.batchnorm._BatchNorm) for m in decoder.modules())
+    if optimizer is not None and not (batch_size == 1 and has_batchnorm):
+        decoder.train()
+        sampler = _reset_peak(device)
+        results["train_step_ms"] = time_fn(train_step, device, warmup, repeats)
+        results["peak_train_mb"] = _peak_mb(device, sampler)
+
+    return results
+
+
+def _is_oom(e: Exception) -> bool:
+    if isinstance(e, torch.cuda.OutOfMemoryError):
+        return True
+    message = str(e).lower()
+    return isinstance(e, RuntimeError) and ("out of memory" in message or "not enough memory" in message)
+
+
+def _format(value: Optional[float], fmt: str) -> str:
+    return format(value, fmt) if value is not None else "N/A"
+
+
+def run_benchmark(args, devices: List[torch.device]) -> List[Dict]:
+    """Run all benchmark configurations and return one row per measurement."""
+    rows = []
+    for decoder_size in args.decoders:
+        model_type, decoder_class = DECODERS[decoder_size]
+        for img_size in args.img_sizes:
+            flops = count_flops(decoder_size, img_size, args.output_dim)
+
+            for device in devices:
+                base_row = {
+                    "model_type": model_type,
+                    "decoder_size": decoder_size if model_type == "stable-diffusion" else "",
+                    "decoder": decoder_class.__name__,
+                    "device": str(device),
+                    "img_size": img_size,
+                    "output_dim": args.output_dim,
+                    "fwd_gflops_per_image": flops["fwd"],
+                    "train_gflops_per_image": flops["train"],
+                }
+
+                try:
+                    decoder = build_decoder(decoder_size, img_size, args.output_dim, device)
+                    optimizer = None if args.skip_training_step else torch.optim.Adam(decoder.parameters(), lr=1e-4)
+                except Exception as e:
+                    if not _is_oom(e):
+                        raise
+                    logging.warning(f"{decoder_class.__name__} at {img_size}px does not fit on {device}")
+                    rows.append({**base_row, "status": "oom"})
+                    continue
+
+                base_row["params"] = sum(p.numel() for p in decoder.parameters())
+
+                for batch_size in args.batch_sizes:
+                    row = {**base_row, "batch_size": batch_size}
+                    try:
+                        row.update(benchmark_batch(
+                            decoder, optimizer, img_size, args.output_dim, batch_size,
+                            device, args.warmup, args.repeats
+                        ))
+                        row["fwd_images_per_s"] = batch_size / (row["fwd_ms"] / 1000)
+                        if row["train_step_ms"] is not None:
+                            row["train_images_per_s"] = batch_size / (row["train_step_ms"] / 1000)
+                        row["status"] = "ok"
+                    except Exception as e:
+                        if not _is_oom(e):
+                            raise
+                        row["status"] = "oom"
+                        rows.append(row)
+                        logging.warning(
+                            f"{decoder_class.__name__} at {img_size}px ran out of memory on {device} "
+                            f"with batch size {batch_size}; skipping larger batches"
+                        )
+                        break
+
+                    rows.append(row)
+                    logging.info(
+                        f"{decoder_class.__name__:<18} {str(device):<8} {img_size:>5}px bs={batch_size:<4} "
+                        f"params={row['params'] / 1e6:.1f}M "
+                        f"fwd={_format(row['fwd_ms'], '.2f')}ms "
+                        f"train={_format(row['train_step_ms'], '.2f')}ms "
+                        f"peak_train_mb={_format(row['peak_train_mb'], '.0f')}"
+                    )
+
+                del decoder, optimizer
+                if device.type == "cuda":
+                    torch.cuda.empty_cache()
+
+    return rows
+
+
+def save_results(rows: List[Dict], output_dir: str) -> str:
+    """Write benchmark rows to decoder_benchmark.csv."""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, "decoder_benchmark.csv")
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: ("" if row.get(key) is None else row.get(key)) for key in CSV_FIELDS})
+    return path
+
+
+def log_results_table(rows: List[Dict]) -> None:
+    """Log a summary table of the benchmark results."""
+    lines = [
+        "\nDecoder Benchmark Results:",
+        "-" * 140,
+        f"{'Decoder':<18}{'Device':<10}{'Size':>6}{'Batch':>7}{'Params (M)':>12}{'Fwd GFLOP/img':>15}"
+        f"{'Fwd ms':>10}{'Train ms':>10}{'Train img/s':>13}{'Peak Fwd MB':>13}{'Peak Train MB':>15}{'Status':>8}",
+        "-" * 140,
+    ]
+    for row in rows:
+        params = row.get("params")
+        lines.append(
+            f"{row['decoder']:<18}{row['device']:<10}{row['img_size']:>6}{row.get('batch_size', ''):>7}"
+            f"{_format(params / 1e6 if params is not None else None, '.1f'):>12}"
+            f"{_format(row.get('fwd_gflops_per_image'), '.2f'):>15}"
+            f"{_format(row.get('fwd_ms'), '.2f'):>10}{_format(row.get('train_step_ms'), '.2f'):>10}"
+            f"{_format(row.get('train_images_per_s'), '.1f'):>13}"
+            f"{_format(row.get('peak_fwd_mb'), '.0f'):>13}{_format(row.get('peak_train_mb'), '.0f'):>15}"
+            f"{row['status']:>8}"
+        )
+    lines.append("-" * 140)
+    logging.info("\n".join(lines))
+
+
+def main():
+    """Main entry point for the decoder benchmark."""
+    args = parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    setup_logging(args.output_dir, 0, log_filename="benchmark_decoders.log")
+
+    if args.devices:
+        devices = [torch.device(d) for d in args.devices]
+    else:
+        devices = [torch.device("cpu")]
+        if torch.cuda.is_available():
+            devices.append(torch.device("cuda", 0))
+
+    if FlopCounterMode is None:
+        logging.warning("torch.utils.flop_counter is unavailable; FLOPs will not be reported")
+    logging.info(f"Benchmarking decoders {args.decoders} at sizes {args.img_sizes} on {[str(d) for d in devices]}")
+
+    rows = run_benchmark(args, devices)
+    log_results_table(rows)
+    path = save_results(rows, args.output_dir)
+    logging.info(f"Results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
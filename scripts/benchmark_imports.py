@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""
+Benchmark the import time of every entry point with `python -X importtime`.
+
+Each script is started with --help, so only its module-level imports run. The report
+lists the total import time, the slowest top-level packages and which heavy optional
+backends (diffusers, dnnlib, lpips, ...) were loaded.
+"""
+import argparse
+import csv
+import logging
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+# Add the parent directory (project root) to the Python path
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from utils.logging_utils import setup_logging
+
+
+ENTRY_POINTS = [
+    "train.py",
+    "evaluate.py",
+    "attack.py",
+    "pgd_attack_authprint.py",
+    "compute_fid_sd.py",
+    "pixel_manipulation_experiment.py",
+    "visualize_pipeline.py",
+    "visualize_sd_comparisons.py",
+    "visualize_sd_samples.py",
+    "visualize_stylegan2_comparisons.py",
+    "benchmark_decoders.py",
+]
+
+# Backends that should only be imported when the corresponding feature is used
+HEAVY_MODULES = [
+    "diffusers", "transformers", "datasets", "lpips", "torchmetrics",
+    "scipy", "dnnlib", "legacy", "torchvision", "matplotlib", "seaborn",
+]
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark entry point import times with python -X importtime")
+
+    parser.add_argument("--scripts", type=str, nargs='+', default=ENTRY_POINTS,
+                        help="Entry point scripts (relative to scripts/) to benchmark")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="Runs per script; the fastest run is reported")
+    parser.add_argument("--top", type=int, default=8,
+                        help="Number of slowest top-level imports to report per script")
+    parser.add_argument("--output_dir", type=str, default="import_benchmark",
+                        help="Directory to save the results CSV and raw importtime logs")
+
+    return parser.parse_args()
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """
+    Parse `-X importtime` output.
+
+    Returns:
+        List[Tuple[str, int, int, int]]: (module, self_us, cumulative_us, depth) per imported module.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue
+        # Nesting is encoded as two spaces per level after the separator's own space
+        name = parts[2]
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), self_us, cumulative_us, depth))
+    return entries
+
+
+def benchmark_script(script: str, repeats: int) -> Dict:
+    """
+    Run one entry point under -X importtime and collect its statistics.
+    """
+    path = os.path.join(PROJECT_ROOT, "scripts", script)
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", path, "--help"],
+            cwd=PROJECT_ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        wall_s = time.perf_counter() - start
+        if best is None or wall_s < best["wall_s"]:
+            best = {"wall_s": wall_s, "returncode": proc.returncode, "stderr": proc.stderr}
+
+    entries = parse_importtime(best["stderr"])
+    top_level = [e for e in entries if e[3] == 0]
+    loaded = {e[0] for e in entries}
+    heavy_loaded = [m for m in HEAVY_MODULES if m in loaded]
+
+    error = ""
+    if best["returncode"] != 0:
+        error_lines = [line for line in best["stderr"].splitlines() if not line.startswith("import time:")]
+        error = error_lines[-1] if error_lines else f"exit code {best['returncode']}"
+
+    return {
+        "script": script,
+        "status": "ok" if best["returncode"] == 0 else "error",
+        "wall_s": best["wall_s"],
+        "import_s": sum(e[2] for e in top_level) / 1e6,
+        "num_modules": len(entries),
+        "heavy_modules": heavy_loaded,
+        "slowest": sorted(top_level, key=lambda e: e[2], reverse=True),
+        "error": error,
+        "raw": best["stderr"],
+    }
+
+
+def main():
+    """Main entry point for the import benchmark."""
+    args = parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    setup_logging(args.output_dir, 0, log_filename="benchmark_imports.log")
+
+    results = []
+    for script in args.scripts:
+        result = benchmark_script(script, args.repeats)
+        results.append(result)
+
+        with open(os.path.join(args.output_dir, f"importtime_{os.path.splitext(script)[0]}.log"), "w") as f:
+            f.write(result["raw"])
+
+        slowest = ", ".join(f"{name} {cumulative / 1000:.0f}ms" for name, _, cumulative, _ in result["slowest"][:args.top])
+        logging.info(
+            f"{script}: {result['import_s']:.2f}s imports ({result['num_modules']} modules), "
+            f"{result['wall_s']:.2f}s wall, status={result['status']}\n"
+            f"  heavy backends: {', '.join(result['heavy_modules']) or 'none'}\n"
+            f"  slowest: {slowest}"
+            + (f"\n  error: {result['error']}" if result["error"] else "")
+        )
+
+    # Summary table
+    lines = [
+        "\nImport Time Summary:",
+        "-" * 110,
+        f"{'Script':<40}{'Imports s':>10}{'Wall s':>10}{'Modules':>9}  {'Heavy backends loaded'}",
+        "-" * 110,
+    ]
+    for r in results:
+        lines.append(
+            f"{r['script']:<40}{r['import_s']:>10.2f}{r['wall_s']:>10.2f}{r['num_modules']:>9}  "
+            f"{', '.join(r['heavy_modules']) or '-'}{'' if r['status'] == 'ok' else ' (error)'}"
+        )
+    lines.append("-" * 110)
+    logging.info("\n".join(lines))
+
+    path = os.path.join(args.output_dir, "import_times.csv")
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["script", "status", "import_s", "wall_s", "num_modules", "heavy_modules", "error"])
+        for r in results:
+            writer.writerow([
+                r["script"], r["status"], f"{r['import_s']:.4f}", f"{r['wall_s']:.4f}",
+                r["num_modules"], " ".join(r["heavy_modules"]), r["error"]
+            ])
+    logging.info(f"Results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""
+Benchmark Inception feature extraction throughput.
+
+Compares the fp32 path (extract_inception_outputs) against the fast path
+(extract_inception_outputs_fast: uint8/fp16 inputs, fused resize and normalization,
+channels_last under fp16 autocast, pinned transfers) for several image sizes, batch sizes,
+input dtypes and input locations (host or device memory). For each configuration this
+reports images per second, the speedup over the fp32 path with the same images and the
+relative deviation of the fast features from the fp32 ones. Results are written to a CSV file.
+"""
+import argparse
+import csv
+import logging
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+
+# Add the parent directory (project root) to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.logging_utils import setup_logging
+from utils.metrics import extract_inception_outputs, extract_inception_outputs_fast
+
+
+INPUT_DTYPES = {
+    "uint8": torch.uint8,
+    "float16": torch.float16,
+    "float32": torch.float32,
+}
+
+CSV_FIELDS = [
+    "path", "device", "source", "input_dtype", "img_size", "batch_size", "num_images",
+    "seconds", "images_per_s", "speedup", "feature_rel_error", "logit_max_abs_error"
+]
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark Inception feature extraction throughput")
+
+    parser.add_argument("--num_images", type=int, default=512,
+                        help="Number of images per measurement")
+    parser.add_argument("--img_sizes", type=int, nargs='+', default=[256, 512],
+                        help="Input image sizes")
+    parser.add_argument("--batch_sizes", type=int, nargs='+', default=[50, 128],
+                        help="Inception batch sizes")
+    parser.add_argument("--input_dtypes", type=str, nargs='+', default=["uint8", "float16"],
+                        choices=list(INPUT_DTYPES.keys()),
+                        help="Input dtypes of the fast path")
+    parser.add_argument("--sources", type=str, nargs='+', default=["host", "device"],
+                        choices=["host", "device"],
+                        help="Where the input images live")
+    parser.add_argument("--device", type=str, default=None,
+                        help="Device to run Inception on (default: cuda when available, else cpu)")
+    parser.add_argument("--warmup", type=int, default=1,
+                        help="Untimed warmup repetitions per measurement")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="Timed repetitions per measurement (the median is reported)")
+    parser.add_argument("--output_dir", type=str, default="inception_benchmark",
+                        help="Directory to save the results CSV")
+
+    return parser.parse_args()
+
+
+def _synchronize(device: torch.device) -> None:
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def time_fn(fn, device: torch.device, warmup: int, repeats: int):
+    """
+    Time a callable and return the median latency in seconds and the last result.
+    """
+    for _ in range(warmup):
+        fn()
+    _synchronize(device)
+
+    timings = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        _synchronize(device)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def make_images(num_images: int, img_size: int, seed: int = 0) -> torch.Tensor:
+    """Random uint8 images on the host; every input dtype is derived from them."""
+    generator = torch.Generator()
+    generator.manual_seed(seed)
+    return torch.randint(0, 256, (num_images, 3, img_size, img_size), dtype=torch.uint8, generator=generator)
+
+
+def _as_input(images: torch.Tensor, dtype: torch.dtype) -> torch.Tensor:
+    return images if dtype == torch.uint8 else images.to(dtype) / 255
+
+
+def _format(value: Optional[float], fmt: str) -> str:
+    return format(value, fmt) if value is not None else "N/A"
+
+
+def run_benchmark(args, device: torch.device) -> List[Dict]:
+    """Run all benchmark configurations and return one row per measurement."""
+    rows = []
+    for img_size in args.img_sizes:
+        images = make_images(args.num_images, img_size)
+        for source in args.sources:
+            if source == "device" and device.type == "cpu":
+                continue
+            location = device if source == "device" else torch.device("cpu")
+            for batch_size in args.batch_sizes:
+                base_row = {
+                    "device": str(device),
+                    "source": source,
+                    "img_size": img_size,
+                    "batch_size": batch_size,
+                    "num_images": args.num_images,
+                }
+
+                # fp32 path on float images in [0, 1]
+                reference_images = _as_input(images, torch.float32).to(location)
+                seconds, (reference_features, reference_logits) = time_fn(
+                    lambda: extract_inception_outputs(reference_images, batch_size=batch_size, device=device),
+                    device, args.warmup, args.repeats
+                )
+                del reference_images
+                reference_rate = args.num_images / seconds
+                rows.append({**base_row, "path": "fp32", "input_dtype": "float32", "seconds": seconds,
+                             "images_per_s": reference_rate, "speedup": 1.0})
+
+                for dtype_name in args.input_dtypes:
+                    fast_images = _as_input(images, INPUT_DTYPES[dtype_name]).to(location)
+                    seconds, (features, logits) = time_fn(
+                        lambda: extract_inception_outputs_fast(fast_images, batch_size=batch_size, device=device),
+                        device, args.warmup, args.repeats
+                    )
+                    del fast_images
+                    feature_error = (np.linalg.norm(features - reference_features)
+                                     / max(np.linalg.norm(reference_features), 1e-12))
+                    rows.append({
+                        **base_row,
+                        "path": "fast",
+                        "input_dtype": dtype_name,
+                        "seconds": seconds,
+                        "images_per_s": args.num_images / seconds,
+                        "speedup": (args.num_images / seconds) / reference_rate,
+                        "feature_rel_error": float(feature_error),
+                        "logit_max_abs_error": float(np.abs(logits - reference_logits).max()),
+                    })
+
+                for row in rows[-(1 + len(args.input_dtypes)):]:
+                    logging.info(
+                        f"{row['path']:<5} {row['input_dtype']:<8} {source:<6} {img_size:>5}px bs={batch_size:<4} "
+                        f"{row['images_per_s']:.1f} img/s speedup={row['speedup']:.2f}x "
+                        f"feature_rel_error={_format(row.get('feature_rel_error'), '.2e')}"
+                    )
+
+    return rows
+
+
+def save_results(rows: List[Dict], output_dir: str) -> str:
+    """Write benchmark rows to inception_benchmark.csv."""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, "inception_benchmark.csv")
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: ("" if row.get(key) is None else row.get(key)) for key in CSV_FIELDS})
+    return path
+
+
+def log_results_table(rows: List[Dict]) -> None:
+    """Log a summary table of the benchmark results."""
+    lines = [
+        "\nInception Benchmark Results:",
+        "-" * 110,
+        f"{'Path':<6}{'Input':<9}{'Source':<8}{'Device':<10}{'Size':>6}{'Batch':>7}"
+        f"{'Seconds':>10}{'Img/s':>10}{'Speedup':>10}{'Feat Rel Err':>14}{'Logit Err':>12}",
+        "-" * 110,
+    ]
+    for row in rows:
+        lines.append(
+            f"{row['path']:<6}{row['input_dtype']:<9}{row['source']:<8}{row['device']:<10}"
+            f"{row['img_size']:>6}{row['batch_size']:>7}"
+            f"{row['seconds']:>10.2f}{row['images_per_s']:>10.1f}{row['speedup']:>9.2f}x"
+            f"{_format(row.get('feature_rel_error'), '.2e'):>14}{_format(row.get('logit_max_abs_error'), '.3f'):>12}"
+        )
+    lines.append("-" * 110)
+    logging.info("\n".join(lines))
+
+
+def main():
+    """Main entry point for the Inception benchmark."""
+    args = parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    setup_logging(args.output_dir, 0, log_filename="benchmark_inception.log")
+
+    device = torch.device(args.device or ("cuda" if torch.cuda.is_available() else "cpu"))
+    if device.type != "cuda":
+        logging.warning("Autocast and pinned transfers only apply on CUDA; the fast path mostly saves preprocessing on the CPU")
+    logging.info(f"Benchmarking Inception feature extraction on {device} at sizes {args.img_sizes}")
+
+    rows = run_benchmark(args, device)
+    log_results_table(rows)
+    path = save_results(rows, args.output_dir)
+    logging.info(f"Results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,25 +8,27 @@ import logging
 import os
 import sys
 from pathlib import Path
-from typing import Dict, List, Tuple, Generator
+from typing import Dict, List, Optional, Tuple, Generator
 
 import torch
 import torch.distributed as dist
 import numpy as np
-import torchvision
 import time
 from datetime import datetime
-import psutil
 import torch.cuda
 
 # Add the parent directory (project root) to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from models.stable_diffusion_model import StableDiffusionModel
-from utils.metrics import calculate_fid, extract_inception_features, compute_fid_from_features
-from utils.distributed import setup_distributed, cleanup_distributed
+from utils.metrics import StreamingMoments, compute_fid_from_statistics, extract_inception_outputs, inception_feature_version
+from utils.distributed import all_gather_rows, broadcast_object, setup_distributed, cleanup_distributed
+from utils.image_corpus import ImageCorpus, create_image_corpus, generate_with_corpus
 from utils.logging_utils import setup_logging
 from utils.model_loading import STABLE_DIFFUSION_MODELS
+from utils.memory import MemoryTracker
+from utils.reference_stats import ReferenceStats, create_reference_stats_store, reference_stats_key
+from utils.result_store import save_results
 
 
 def parse_args():
@@ -70,46 +72,40 @@ def parse_args():
     parser.add_argument("--save_images", action="store_true",
                         help="Save generated images for inspection")
     
-    return parser.parse_args()
-
-
-def get_memory_usage():
-    """Get current memory usage of CPU and GPU."""
-    # CPU Memory
-    cpu_memory = psutil.Process().memory_info().rss / 1024 / 1024  # MB
+    # Generated-image corpus
+    parser.add_argument("--image_corpus_dir", type=str, default=None,
+                        help="Directory of the generated-image corpus; images are then seeded per sample "
+                             "and reused across comparisons and runs")
+    parser.add_argument("--seed", type=int, default=42,
+                        help="Base per-sample seed used with the image corpus and the reference-statistics cache")
+    
+    # Reference-statistics cache
+    parser.add_argument("--reference_stats_dir", type=str, default=None,
+                        help="Directory caching the reference model's inception statistics across runs; "
+                             "images are then seeded per sample")
     
-    # GPU Memory
-    gpu_memory = []
-    if torch.cuda.is_available():
-        for i in range(torch.cuda.device_count()):
-            allocated = torch.cuda.memory_allocated(i) / 1024 / 1024  # MB
-            reserved = torch.cuda.memory_reserved(i) / 1024 / 1024   # MB
-            gpu_memory.append({
-                'id': i,
-                'allocated': allocated,
-                'reserved': reserved,
-                'total': torch.cuda.get_device_properties(i).total_memory / 1024 / 1024
-            })
-    else:
-        gpu_memory = "CUDA not available"
+    # Inception pipeline
+    parser.add_argument("--fast_inception", action="store_true",
+                        help="Run Inception in channels_last under fp16 autocast with pinned transfers (CUDA)")
     
-    return cpu_memory, gpu_memory
+    # Memory instrumentation
+    parser.add_argument("--disable_memory_tracking", action="store_true",
+                        help="Disable per-stage peak memory tracking")
+    parser.add_argument("--host_memory_interval", type=float, default=5.0,
+                        help="Seconds between background host RSS samples (0 disables host sampling)")
+    parser.add_argument("--memory_snapshot_dir", type=str, default=None,
+                        help="Directory to write CUDA memory snapshots to on out-of-memory errors")
+    
+    return parser.parse_args()
 
 
-def log_progress(rank: int, message: str, level: str = "info"):
-    """Log progress with timestamp and memory usage."""
+def log_progress(rank: int, message: str, level: str = "info", memory_tracker: MemoryTracker = None):
+    """Log progress with timestamp, and current memory usage if a tracker is given."""
     if rank == 0:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cpu_mem, gpu_mem = get_memory_usage()
-        
-        mem_info = f"CPU Memory: {cpu_mem:.2f}MB"
-        if isinstance(gpu_mem, list):
-            for gpu in gpu_mem:
-                mem_info += f", GPU{gpu['id']}: {gpu['allocated']:.0f}MB allocated/{gpu['reserved']:.0f}MB reserved/{gpu['total']:.0f}MB total"
-        else:
-            mem_info += f", {gpu_mem}"
-        
-        log_msg = f"[{timestamp}] {message}\n{mem_info}"
+        log_msg = f"[{timestamp}] {message}"
+        if memory_tracker is not None:
+            log_msg += f"\n{memory_tracker.format_current()}"
         
         if level == "info":
             logging.info(log_msg)
@@ -127,94 +123,296 @@ def generate_images_distributed(
     batch_size: int,
     rank: int,
     world_size: int,
-    chunk_size: int,
+    memory_tracker: MemoryTracker = None,
+    seeds: Optional[List[int]] = None,
+    corpus: Optional[ImageCorpus] = None,
     **kwargs
 ) -> Generator[torch.Tensor, None, None]:
-    """Generate images in a distributed manner across GPUs.
+    """Generate this rank's share of images in a distributed manner across GPUs, batch by batch.
     
     Args:
         model: SD model to generate images with
-        num_images: Total number of images to generate
+        num_images: Total number of images to generate across all ranks
         batch_size: Batch size per GPU
         rank: Current process rank
         world_size: Total number of processes
-        chunk_size: Number of images to generate per chunk
+        memory_tracker: Optional tracker used to report memory once all batches are generated
+        seeds: Optional per-sample seeds of all num_images images; this rank generates its share
+        corpus: Optional image corpus to read images from and write them to (requires seeds)
         **kwargs: Additional arguments for image generation
         
     Yields:
-        torch.Tensor: Generated images [N, C, H, W] for each chunk
+        torch.Tensor: Generated images [B, C, H, W] for each batch
     """
     # Calculate number of images per GPU
     images_per_gpu = num_images // world_size
     if rank < num_images % world_size:
         images_per_gpu += 1
     
-    total_chunks = (images_per_gpu + chunk_size - 1) // chunk_size
+    # Each rank owns a contiguous block of the per-sample seeds
+    if seeds is not None:
+        rank_start = rank * (num_images // world_size) + min(rank, num_images % world_size)
+        seeds = seeds[rank_start:rank_start + images_per_gpu]
     
-    # Process in chunks
-    for chunk_idx in range(total_chunks):
-        chunk_start = chunk_idx * chunk_size
-        chunk_end = min(chunk_start + chunk_size, images_per_gpu)
-        chunk_images = []
-        
-        log_progress(rank, f"Starting chunk {chunk_idx + 1}/{total_chunks} (images {chunk_start}-{chunk_end})")
-        chunk_start_time = time.time()
+    start_time = time.time()
+    for i in range(0, images_per_gpu, batch_size):
+        batch_start_time = time.time()
+        current_batch_size = min(batch_size, images_per_gpu - i)
         
-        # Generate images for this chunk
-        for i in range(chunk_start, chunk_end, batch_size):
-            batch_start_time = time.time()
-            current_batch_size = min(batch_size, chunk_end - i)
-            
-            log_progress(rank, f"Generating batch of {current_batch_size} images in chunk {chunk_idx + 1}")
-            
+        if seeds is not None:
+            batch = generate_with_corpus(
+                model,
+                seeds=seeds[i:i + current_batch_size],
+                corpus=corpus,
+                **kwargs
+            )
+        else:
             batch = model.generate_images(
                 batch_size=current_batch_size,
                 **kwargs
             )
-            chunk_images.append(batch)
-            
-            batch_time = time.time() - batch_start_time
-            if rank == 0:
-                total_progress = (chunk_start + i + current_batch_size) * world_size
-                log_progress(rank, 
-                    f"Progress: {total_progress}/{num_images} images "
-                    f"(Batch time: {batch_time:.2f}s, "
-                    f"Images/sec: {current_batch_size/batch_time:.2f})"
-                )
         
-        # Concatenate and yield chunk images
-        chunk_images = torch.cat(chunk_images, dim=0)
-        chunk_time = time.time() - chunk_start_time
-        log_progress(rank, 
-            f"Completed chunk {chunk_idx + 1}/{total_chunks} "
-            f"(Time: {chunk_time:.2f}s, "
-            f"Images/sec: {len(chunk_images)/chunk_time:.2f})"
+        batch_time = time.time() - batch_start_time
+        if rank == 0:
+            total_progress = (i + current_batch_size) * world_size
+            log_progress(rank, 
+                f"Progress: {min(total_progress, num_images)}/{num_images} images "
+                f"(Batch time: {batch_time:.2f}s, "
+                f"Images/sec: {current_batch_size/batch_time:.2f})"
+            )
+        
+        yield batch
+        del batch
+    
+    total_time = time.time() - start_time
+    log_progress(rank, 
+        f"Generated {images_per_gpu} images on this rank "
+        f"(Time: {total_time:.2f}s, "
+        f"Images/sec: {images_per_gpu/max(total_time, 1e-9):.2f})",
+        memory_tracker=memory_tracker
+    )
+
+
+def extract_features_streaming(
+    batches: Generator[torch.Tensor, None, None],
+    batch_size: int,
+    device: torch.device,
+    save_dir: Optional[Path] = None,
+    save_prefix: str = "",
+    moments: Optional[StreamingMoments] = None,
+    keep_outputs: bool = True,
+    fast_inception: bool = False
+) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """Extract inception features and logits batch by batch, so no more than one batch of images is held at once.
+    
+    Args:
+        batches: Generated image batches in range [0, 1]
+        batch_size: Batch size for the inception network
+        device: Device to run the inception network on
+        save_dir: Optional directory to save the images to
+        save_prefix: File name prefix of saved images
+        moments: Optional accumulator the features of each batch are folded into
+        keep_outputs: Return the features and logits; only the moments are kept otherwise
+        fast_inception: Use the fp16 autocast, channels_last inception pipeline
+        
+    Returns:
+        tuple: (features, logits) of all images, [N, 2048] and [N, 1000], or (None, None)
+    """
+    features, logits = [], []
+    num_images = 0
+    for batch in batches:
+        if save_dir is not None:
+            import torchvision
+            save_dir.mkdir(parents=True, exist_ok=True)
+            for i, img in enumerate(batch):
+                torchvision.utils.save_image(img, save_dir / f"{save_prefix}img{num_images + i:05d}.png")
+        
+        # The moments are updated on the device; only kept outputs are copied to the host
+        batch_features, batch_logits = extract_inception_outputs(
+            batch, batch_size=batch_size, device=device, return_logits=keep_outputs, fast=fast_inception,
+            as_tensor=True
         )
+        if moments is not None:
+            moments.update(batch_features)
+        if keep_outputs:
+            features.append(batch_features.cpu().numpy())
+            logits.append(batch_logits.cpu().numpy())
+        num_images += len(batch)
+        del batch
+    
+    if not keep_outputs:
+        return None, None
+    if not features:  # This rank has no images in the chunk
+        return np.empty((0, 2048), dtype=np.float32), np.empty((0, 1000), dtype=np.float32)
+    return np.concatenate(features, axis=0), np.concatenate(logits, axis=0)
+
+
+def chunk_sizes(args, world_size: int) -> List[int]:
+    """Number of images generated in each chunk."""
+    total_chunks = (args.num_images // world_size + args.chunk_size - 1) // args.chunk_size
+    return [min(args.chunk_size, args.num_images - chunk_idx * args.chunk_size) for chunk_idx in range(total_chunks)]
+
+
+def generate_model_features(
+    model: StableDiffusionModel,
+    model_name: str,
+    args,
+    rank: int,
+    world_size: int,
+    device: torch.device,
+    memory_tracker: MemoryTracker,
+    corpus: Optional[ImageCorpus] = None,
+    seeded: bool = False,
+    keep_outputs: bool = True
+) -> Tuple[StreamingMoments, Optional[np.ndarray], Optional[np.ndarray]]:
+    """Generate a model's images chunk by chunk and accumulate their inception outputs.
+    
+    Args:
+        model: SD model to generate images with
+        model_name: Name of the model, used for logging and saved images
+        args: Script arguments
+        rank: Current process rank
+        world_size: Total number of processes
+        device: Device to run the inception network on
+        memory_tracker: Per-stage memory tracker
+        corpus: Optional image corpus to read images from and write them to
+        seeded: Seed every image with its own per-sample seed (required by the corpus and
+            the reference-statistics cache)
+        keep_outputs: Also return the features and logits; otherwise only the O(dims^2)
+            feature moments are kept
+        
+    Returns:
+        tuple: (moments, features, logits) of the images of all ranks, in sample order;
+            features and logits are None unless keep_outputs is set
+    """
+    moments = StreamingMoments(device=device)
+    features_list, logits_list = [], []
+    for chunk_idx, chunk_num_images in enumerate(chunk_sizes(args, world_size)):
+        chunk_start_time = time.time()
+        log_progress(rank, f"Generating {model_name} images for chunk {chunk_idx + 1}")
         
-        yield chunk_images
+        # All models use the same per-sample seeds, so images of a chunk can be read back from
+        # the corpus by later runs
+        chunk_seeds = None
+        if seeded:
+            chunk_base = args.seed + chunk_idx * args.chunk_size
+            chunk_seeds = list(range(chunk_base, chunk_base + chunk_num_images))
         
-        # Clear memory
-        del chunk_images
-        torch.cuda.empty_cache()
-        log_progress(rank, f"Cleared memory after chunk {chunk_idx + 1}")
+        with memory_tracker.stage(f"generate:{model_name}"):
+            features, logits = extract_features_streaming(
+                generate_images_distributed(
+                    model=model,
+                    num_images=chunk_num_images,
+                    batch_size=args.batch_size,
+                    rank=rank,
+                    world_size=world_size,
+                    memory_tracker=memory_tracker,
+                    seeds=chunk_seeds,
+                    corpus=corpus,
+                    prompt=args.prompt,
+                    num_inference_steps=args.num_inference_steps,
+                    guidance_scale=args.guidance_scale
+                ),
+                batch_size=args.batch_size,
+                device=device,
+                # Save images if requested
+                save_dir=Path(args.output_dir) / "images" / model_name if args.save_images and rank == 0 else None,
+                save_prefix=f"chunk{chunk_idx}_",
+                moments=moments,
+                keep_outputs=keep_outputs,
+                fast_inception=args.fast_inception
+            )
+        
+        if keep_outputs:
+            # Ranks hold contiguous blocks of the chunk; gathering in rank order keeps sample order
+            features_list.append(all_gather_rows(features, device, world_size))
+            logits_list.append(all_gather_rows(logits, device, world_size))
+        
+        chunk_time = time.time() - chunk_start_time
+        log_progress(rank, 
+            f"Processed chunk {chunk_idx + 1}:\n"
+            f"- Processing Time: {chunk_time:.2f}s\n"
+            f"- Accumulated moments of {moments.count} images on this rank",
+            memory_tracker=memory_tracker
+        )
+    
+    moments = moments.gathered(device, world_size)
+    if not keep_outputs:
+        return moments, None, None
+    return moments, np.concatenate(features_list, axis=0), np.concatenate(logits_list, axis=0)
+
+
+def load_model(model_name: str, args, device: torch.device, memory_tracker: MemoryTracker) -> StableDiffusionModel:
+    """Load one of the SD models to compare."""
+    with memory_tracker.stage(f"load:{model_name}"):
+        return StableDiffusionModel(
+            model_name=STABLE_DIFFUSION_MODELS[model_name],
+            device=device,
+            img_size=args.img_size,
+            dtype=getattr(torch, args.dtype),
+            enable_cpu_offload=args.enable_cpu_offload
+        )
 
 
-def compute_fid_scores(args, rank: int, world_size: int, device: torch.device) -> Dict[str, float]:
+def compute_fid_scores(
+    args,
+    rank: int,
+    world_size: int,
+    device: torch.device,
+    memory_tracker: MemoryTracker
+) -> Dict[str, float]:
     """Compute FID scores between reference model and comparison models."""
     log_progress(rank, "Starting FID computation")
     start_time = time.time()
     
-    # Initialize models
-    log_progress(rank, "Initializing models...")
+    # Optional generated-image corpus shared across comparisons and runs
+    corpus = create_image_corpus(args.image_corpus_dir)
+    if corpus is not None:
+        log_progress(rank, f"Using generated-image corpus at {corpus.root} ({len(corpus)} images)")
     
-    # Initialize reference model
-    ref_model = StableDiffusionModel(
-        model_name=STABLE_DIFFUSION_MODELS[args.reference_model],
-        device=device,
-        img_size=args.img_size,
-        dtype=getattr(torch, args.dtype),
-        enable_cpu_offload=args.enable_cpu_offload
-    )
+    # Optional cache of the reference model's statistics; cached statistics have to describe
+    # reproducible images, so images are seeded per sample whenever the cache or corpus is used
+    ref_store = create_reference_stats_store(args.reference_stats_dir, rank=rank)
+    seeded = corpus is not None or ref_store is not None
+    
+    ref_stats = None
+    ref_key, ref_settings = None, None
+    if ref_store is not None:
+        ref_key, ref_settings = reference_stats_key(
+            STABLE_DIFFUSION_MODELS[args.reference_model],
+            {
+                'prompt': args.prompt,
+                'img_size': args.img_size,
+                'num_inference_steps': args.num_inference_steps,
+                'guidance_scale': args.guidance_scale,
+                'dtype': args.dtype,
+            },
+            (args.seed, args.seed + sum(chunk_sizes(args, world_size))),
+            extractor=inception_feature_version(args.fast_inception)
+        )
+        if broadcast_object(ref_store.contains(ref_key), world_size):
+            ref_stats = ref_store.load(ref_key)
+            if ref_stats is None:
+                raise RuntimeError(f"Could not read reference statistics {ref_key} in {ref_store.root}")
+            log_progress(rank, f"Loaded {args.reference_model} statistics from {ref_store.root} ({ref_stats.num_samples} images)")
+    
+    # Reference features are computed once and shared by all comparisons
+    if ref_stats is None:
+        log_progress(rank, f"Computing {args.reference_model} statistics...")
+        ref_model = load_model(args.reference_model, args, device, memory_tracker)
+        # Features are only kept when they are cached for later runs
+        ref_moments, ref_features, ref_logits = generate_model_features(
+            ref_model, args.reference_model, args, rank, world_size, device, memory_tracker,
+            corpus=corpus, seeded=seeded, keep_outputs=ref_store is not None
+        )
+        mu, sigma = ref_moments.statistics()
+        ref_stats = ReferenceStats(features=ref_features, mu=mu, sigma=sigma, logits=ref_logits)
+        if ref_store is not None:
+            ref_store.save(ref_key, ref_stats, ref_settings)
+        
+        # Clean up reference model
+        del ref_model, ref_moments, ref_features, ref_logits
+        torch.cuda.empty_cache()
     
     # Compute FID scores for each comparison model
     fid_scores = {}
@@ -222,120 +420,33 @@ def compute_fid_scores(args, rank: int, world_size: int, device: torch.device) -
         model_start_time = time.time()
         log_progress(rank, f"\nStarting comparison {model_idx + 1}/{len(args.comparison_models)}: {args.reference_model} vs {model_name}")
         
-        # Initialize comparison model
-        comp_model = StableDiffusionModel(
-            model_name=STABLE_DIFFUSION_MODELS[model_name],
-            device=device,
-            img_size=args.img_size,
-            dtype=getattr(torch, args.dtype),
-            enable_cpu_offload=args.enable_cpu_offload
+        comp_model = load_model(model_name, args, device, memory_tracker)
+        comp_moments, _, _ = generate_model_features(
+            comp_model, model_name, args, rank, world_size, device, memory_tracker,
+            corpus=corpus, seeded=seeded, keep_outputs=False
         )
         
-        # Initialize feature accumulators
-        total_chunks = (args.num_images // world_size + args.chunk_size - 1) // args.chunk_size
-        ref_features_list = []
-        comp_features_list = []
-        
-        # Process chunks one at a time
-        for chunk_idx in range(total_chunks):
-            chunk_start_time = time.time()
-            log_progress(rank, f"Processing chunk {chunk_idx + 1}/{total_chunks}")
-            
-            # Generate reference model images for this chunk
-            log_progress(rank, f"Generating {args.reference_model} images for chunk {chunk_idx + 1}")
-            ref_chunk = next(generate_images_distributed(
-                model=ref_model,
-                num_images=min(args.chunk_size, args.num_images - chunk_idx * args.chunk_size),
-                batch_size=args.batch_size,
-                rank=rank,
-                world_size=world_size,
-                chunk_size=args.chunk_size,
-                prompt=args.prompt,
-                num_inference_steps=args.num_inference_steps,
-                guidance_scale=args.guidance_scale
-            ))
-            
-            # Save reference images if requested
-            if args.save_images and rank == 0:
-                save_dir = Path(args.output_dir) / "images" / args.reference_model
-                save_dir.mkdir(parents=True, exist_ok=True)
-                for i, img in enumerate(ref_chunk):
-                    img_path = save_dir / f"chunk{chunk_idx}_img{i:05d}.png"
-                    torchvision.utils.save_image(img, img_path)
-            
-            # Extract features for reference images
-            ref_features = extract_inception_features(ref_chunk, batch_size=args.batch_size, device=device)
-            ref_features_list.append(ref_features)
-            
-            # Clear reference images from memory
-            del ref_chunk
-            torch.cuda.empty_cache()
-            
-            # Generate comparison model images for this chunk
-            log_progress(rank, f"Generating {model_name} images for chunk {chunk_idx + 1}")
-            comp_chunk = next(generate_images_distributed(
-                model=comp_model,
-                num_images=min(args.chunk_size, args.num_images - chunk_idx * args.chunk_size),
-                batch_size=args.batch_size,
-                rank=rank,
-                world_size=world_size,
-                chunk_size=args.chunk_size,
-                prompt=args.prompt,
-                num_inference_steps=args.num_inference_steps,
-                guidance_scale=args.guidance_scale
-            ))
-            
-            # Save comparison images if requested
-            if args.save_images and rank == 0:
-                save_dir = Path(args.output_dir) / "images" / model_name
-                save_dir.mkdir(parents=True, exist_ok=True)
-                for i, img in enumerate(comp_chunk):
-                    img_path = save_dir / f"chunk{chunk_idx}_img{i:05d}.png"
-                    torchvision.utils.save_image(img, img_path)
-            
-            # Extract features for comparison images
-            comp_features = extract_inception_features(comp_chunk, batch_size=args.batch_size, device=device)
-            comp_features_list.append(comp_features)
-            
-            # Clear comparison images from memory
-            del comp_chunk
-            torch.cuda.empty_cache()
-            
-            chunk_time = time.time() - chunk_start_time
-            log_progress(rank, 
-                f"Processed chunk {chunk_idx + 1}:\n"
-                f"- Processing Time: {chunk_time:.2f}s\n"
-                f"- Accumulated features from {len(ref_features_list)} chunks"
-            )
-        
-        # Compute final FID score using all accumulated features
+        # Compute final FID score against the reference statistics
         log_progress(rank, "Computing final FID score...")
-        
-        # Concatenate all features
-        ref_all_features = np.concatenate(ref_features_list, axis=0)
-        comp_all_features = np.concatenate(comp_features_list, axis=0)
-        
-        # Compute final FID
-        final_fid = compute_fid_from_features(ref_all_features, comp_all_features)
+        final_fid = compute_fid_from_statistics(ref_stats.mu, ref_stats.sigma, *comp_moments.statistics())
         
         model_time = time.time() - model_start_time
         log_progress(rank, 
             f"\nFinal Results for {model_name}:\n"
             f"- FID Score: {final_fid:.4f}\n"
-            f"- Total Images: {len(ref_all_features)}\n"
+            f"- Total Images: {comp_moments.count}\n"
             f"- Total Processing Time: {model_time:.2f}s"
         )
         
         fid_scores[model_name] = final_fid
         
         # Clean up comparison model and features
-        del comp_model, ref_features_list, comp_features_list, ref_all_features, comp_all_features
+        del comp_model, comp_moments
         torch.cuda.empty_cache()
-        log_progress(rank, f"Completed comparison with {model_name}")
+        log_progress(rank, f"Completed comparison with {model_name}", memory_tracker=memory_tracker)
     
-    # Clean up reference model
-    del ref_model
-    torch.cuda.empty_cache()
+    if corpus is not None:
+        corpus.close()
     
     total_time = time.time() - start_time
     log_progress(rank, f"\nCompleted all FID computations in {total_time:.2f}s")
@@ -350,6 +461,15 @@ def main():
     # Setup distributed processing
     local_rank, rank, world_size, device = setup_distributed()
     
+    # Per-stage memory instrumentation
+    memory_tracker = MemoryTracker(
+        device=device,
+        rank=rank,
+        enabled=not args.disable_memory_tracking,
+        host_sample_interval=args.host_memory_interval,
+        snapshot_dir=args.memory_snapshot_dir
+    )
+    
     # Create output directory and setup logging
     if rank == 0:
         os.makedirs(args.output_dir, exist_ok=True)
@@ -367,24 +487,26 @@ def main():
     
     try:
         # Compute FID scores
-        fid_scores = compute_fid_scores(args, rank, world_size, device)
+        fid_scores = compute_fid_scores(args, rank, world_size, device, memory_tracker)
         
         # Save results
         if rank == 0:
-            results_file = Path(args.output_dir) / "fid_scores.txt"
-            with open(results_file, "w") as f:
-                f.write(f"FID Scores (Reference: {args.reference_model})\n")
-                f.write(f"Computation completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write("-" * 50 + "\n")
-                for model_name, score in fid_scores.items():
-                    f.write(f"{model_name}: {score:.4f}\n")
+            cases = {
+                model_name: {'reference_model': args.reference_model, 'fid_score': score}
+                for model_name, score in fid_scores.items()
+            }
+            save_results(args.output_dir, "fid", cases, config=args)
             
-            log_progress(rank, f"\nResults saved to {results_file}")
+            log_progress(rank, f"\nResults saved to {args.output_dir}")
+            memory_tracker.log_summary()
+        memory_tracker.save_summary(args.output_dir)
     
     except Exception as e:
         log_progress(rank, f"Error during FID computation: {str(e)}", level="error")
         raise
     finally:
+        memory_tracker.close()
+        
         # Clean up distributed environment
         cleanup_distributed()
         if rank == 0:
@@ -69,6 +69,8 @@ def parse_args():
     parser.add_argument("--stylegan2_local_path", type=str,
                         default="ffhq70k-paper256-ada.pkl",
                         help="Local path to store/load the StyleGAN2 model")
+    parser.add_argument("--stylegan2_cache_dir", type=str, default="",
+                        help="Directory to cache converted StyleGAN2 networks in as safetensors (empty disables it)")
     
     # Common configuration
     parser.add_argument("--checkpoint_path", type=str,
@@ -95,6 +97,8 @@ def parse_args():
                         help="Number of samples to evaluate")
     parser.add_argument("--batch_size", type=int, default=16, 
                         help="Batch size for evaluation")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Fixed random seed for evaluation (also the base of per-sample Stable Diffusion seeds)")
     
     # Model transformation configuration
     parser.add_argument("--enable_quantization", action="store_true", default=True,
@@ -112,6 +116,44 @@ def parse_args():
                         default=['magnitude', 'random'],
                         choices=['magnitude', 'random'],
                         help="List of pruning methods to evaluate")
+    parser.add_argument("--enable_downsampling", action="store_true", default=True,
+                        help="Enable evaluation of downsampling transformations")
+    parser.add_argument("--no_downsampling", action="store_false", dest="enable_downsampling",
+                        help="Disable evaluation of downsampling transformations")
+    parser.add_argument("--downsample_sizes", type=int, nargs='+', default=[16, 224],
+                        help="Sizes for downsampling evaluation")
+    parser.add_argument("--negative_transforms", type=str, nargs='*',
+                        default=['set_pixels_minus_one', 'set_random_pixels_minus_one',
+                                 'set_mixed_50_50_pixels_minus_one', 'set_mixed_75_25_pixels_minus_one',
+                                 'set_mixed_25_75_pixels_minus_one', 'set_mixed_10_90_pixels_minus_one',
+                                 'set_mixed_5_95_pixels_minus_one', 'set_mixed_1_99_pixels_minus_one'],
+                        help="Other image-space negative cases as transformation specs, e.g. jpeg_75, blur_1.5, "
+                             "noise_0.05, crop_80, or compositions like jpeg_75+downsample_128")
+    
+    # Generated-image corpus
+    parser.add_argument("--image_corpus_dir", type=str, default="",
+                        help="Directory of the generated-image corpus shared across runs (Stable Diffusion only; empty disables it)")
+    
+    # Resumable evaluation
+    parser.add_argument("--eval_state_dir", type=str, default="",
+                        help="Directory to save evaluation state to; a rerun with the same settings skips completed cases (empty disables it)")
+    parser.add_argument("--eval_state_save_every", type=int, default=0,
+                        help="Also save partial results every N batches of a case (0 saves completed cases only)")
+    
+    # Reference-statistics cache
+    parser.add_argument("--reference_stats_dir", type=str, default="",
+                        help="Directory caching the original model's inception statistics across runs; "
+                             "requires a fixed --seed (empty disables it)")
+    parser.add_argument("--fast_inception", action="store_true",
+                        help="Run Inception in channels_last under fp16 autocast with pinned transfers (CUDA)")
+    
+    # Memory instrumentation
+    parser.add_argument("--disable_memory_tracking", action="store_true",
+                        help="Disable per-stage peak memory tracking")
+    parser.add_argument("--host_memory_interval", type=float, default=5.0,
+                        help="Seconds between background host RSS samples (0 disables host sampling)")
+    parser.add_argument("--memory_snapshot_dir", type=str, default=None,
+                        help="Directory to write CUDA memory snapshots to on out-of-memory errors")
     
     # Output configuration
     parser.add_argument("--output_dir", type=str, default="evaluation_results", 
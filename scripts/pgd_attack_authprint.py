@@ -6,13 +6,10 @@ import argparse
 import logging
 import os
 import sys
-import lpips
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import numpy as np
-from torchvision import models
-from torchmetrics.image import StructuralSimilarityIndexMeasure, PeakSignalNoiseRatio
 from dataclasses import dataclass
 
 # Add the parent directory (project root) to the Python path
@@ -27,6 +24,9 @@ from utils.image_transforms import quantize_model_weights, downsample_and_upsamp
 from utils.model_loading import load_pretrained_models
 from utils.metrics import calculate_fid, InceptionV3
 from utils.checkpoint import load_checkpoint
+from utils.memory import create_memory_tracker
+from utils.pixel_indices import get_pixel_index_set
+from utils.result_store import save_results
 
 
 class ClassifierModel(nn.Module):
@@ -34,6 +34,7 @@ class ClassifierModel(nn.Module):
     def __init__(self):
         super().__init__()
         # Load pretrained ResNet-18 but modify for our use case
+        from torchvision import models
         self.resnet = models.resnet18(pretrained=True)
         # Modify first conv layer to accept 3 channels and maintain size
         self.resnet.conv1 = nn.Conv2d(3, 64, kernel_size=7, stride=1, padding=3, bias=False)
@@ -52,6 +53,10 @@ class ClassifierModel(nn.Module):
 class ImageQualityMetrics:
     """Wrapper for various image quality metrics."""
     def __init__(self, device):
+        # Metric backends are only needed once an attack is evaluated
+        import lpips
+        from torchmetrics.image import StructuralSimilarityIndexMeasure, PeakSignalNoiseRatio
+        
         self.device = device
         # Initialize LPIPS
         self.lpips_fn = lpips.LPIPS(net='alex').to(device)
@@ -71,16 +76,14 @@ class ImageQualityMetrics:
 
 class DecoderWrapper:
     """Wrapper for the decoder to provide binary prediction interface."""
-    def __init__(self, decoder, threshold, image_pixel_indices):
+    def __init__(self, decoder, threshold, pixel_set):
         self.decoder = decoder
         self.threshold = threshold
-        self.image_pixel_indices = image_pixel_indices
+        self.pixel_set = pixel_set
     
     def extract_features(self, x):
         """Extract features using the same method as the evaluator."""
-        batch_size = x.shape[0]
-        flattened = x.view(batch_size, -1)
-        return flattened[:, self.image_pixel_indices]
+        return self.pixel_set.extract(x)
     
     def predict(self, x):
         """Return True if image is detected as original, False if undetected.
@@ -384,6 +387,8 @@ def parse_args():
     parser.add_argument("--stylegan2_local_path", type=str,
                         default="ffhq70k-paper256-ada.pkl",
                         help="Local path to store/load the StyleGAN2 model")
+    parser.add_argument("--stylegan2_cache_dir", type=str, default="",
+                        help="Directory to cache converted StyleGAN2 networks in as safetensors (empty disables it)")
     parser.add_argument("--checkpoint_path", type=str, required=True,
                         help="Path to decoder checkpoint to attack")
     parser.add_argument("--img_size", type=int, default=256,
@@ -401,7 +406,7 @@ def parse_args():
     parser.add_argument("--epsilon", type=float, default=0.1,
                         help="Maximum perturbation size")
     parser.add_argument("--detection_threshold", type=float, default=0.002883,
-                        help="MSE threshold for detection (95% TPR threshold)")
+                        help="MSE threshold for detection (95%% TPR threshold)")
     
     # Classifier training parameters
     parser.add_argument("--classifier_iterations", type=int, default=10000,
@@ -417,6 +422,14 @@ def parse_args():
     parser.add_argument("--momentum", type=float, default=0.9,
                         help="Momentum coefficient for PGD attack")
     
+    # Memory instrumentation
+    parser.add_argument("--disable_memory_tracking", action="store_true",
+                        help="Disable per-stage peak memory tracking")
+    parser.add_argument("--host_memory_interval", type=float, default=5.0,
+                        help="Seconds between background host RSS samples (0 disables host sampling)")
+    parser.add_argument("--memory_snapshot_dir", type=str, default=None,
+                        help="Directory to write CUDA memory snapshots to on out-of-memory errors")
+    
     # Output configuration
     parser.add_argument("--output_dir", type=str, default="pgd_attack_authprint_results",
                         help="Directory to save attack results")
@@ -465,6 +478,9 @@ def main():
     config = get_default_config()
     config.update_from_args(args, mode='pgd_attack_authprint')
     
+    # Per-stage memory instrumentation
+    memory_tracker = create_memory_tracker(config.memory, device, rank)
+    
     # Create output directory and setup logging
     if rank == 0:
         os.makedirs(config.output_dir, exist_ok=True)
@@ -479,15 +495,19 @@ def main():
         if rank == 0:
             logging.info("Loading models...")
         
-        # Load original StyleGAN2 model
-        original_model = load_stylegan2_model(
-            config.model.stylegan2_url,
-            config.model.stylegan2_local_path,
-            device
-        )
-        
-        # Load pretrained models
-        pretrained_models = load_pretrained_models(device, rank)
+        with memory_tracker.stage("load_models"):
+            # Load original StyleGAN2 model
+            original_model = load_stylegan2_model(
+                config.model.stylegan2_url,
+                config.model.stylegan2_local_path,
+                device,
+                cache_dir=config.model.stylegan2_cache_dir
+            )
+            
+            # Load pretrained models
+            pretrained_models = load_pretrained_models(
+                device, rank, stylegan2_cache_dir=config.model.stylegan2_cache_dir
+            )
         
         # Setup quantized models
         quantized_models = {}
@@ -552,9 +572,13 @@ def main():
         )
         
         # Generate pixel indices (same as in evaluator)
-        torch.manual_seed(config.model.image_pixel_set_seed)
-        total_pixels = config.model.img_size * config.model.img_size * 3
-        image_pixel_indices = torch.randperm(total_pixels)[:config.model.image_pixel_count].to(device)
+        pixel_set = get_pixel_index_set(
+            config.model.img_size,
+            config.model.image_pixel_count,
+            config.model.image_pixel_set_seed,
+            device=device
+        )
+        image_pixel_indices = pixel_set.indices
         
         if rank == 0:
             logging.info(f"Generated {len(image_pixel_indices)} pixel indices with seed {config.model.image_pixel_set_seed}")
@@ -564,7 +588,7 @@ def main():
         decoder_wrapper = DecoderWrapper(
             decoder=decoder,
             threshold=config.pgd_attack_authprint.detection_threshold,
-            image_pixel_indices=image_pixel_indices
+            pixel_set=pixel_set
         )
         
         # Create attacker
@@ -581,16 +605,20 @@ def main():
         if rank == 0:
             logging.info("Starting attacks on all negative cases...")
         
-        all_results = attacker.attack_all_cases(
-            pretrained_models=pretrained_models,
-            quantized_models=quantized_models,
-            num_samples=config.pgd_attack_authprint.num_samples
-        )
+        with memory_tracker.stage("attack_all_cases"):
+            all_results = attacker.attack_all_cases(
+                pretrained_models=pretrained_models,
+                quantized_models=quantized_models,
+                num_samples=config.pgd_attack_authprint.num_samples
+            )
         
-        # Print results table
+        # Print and save results
         if rank == 0:
             table = format_results_table(all_results)
             logging.info(table)
+            save_results(config.output_dir, "pgd_attack", all_results, config=config)
+            memory_tracker.log_summary()
+        memory_tracker.save_summary(config.output_dir)
     
     except Exception as e:
         if rank == 0:
@@ -598,6 +626,8 @@ def main():
             logging.error("Attack error:", exc_info=True)
         raise
     finally:
+        memory_tracker.close()
+        
         # Clean up distributed environment
         cleanup_distributed()
 
@@ -7,7 +7,6 @@ import logging
 import os
 import sys
 from typing import List, Dict, Tuple
-import json
 import numpy as np
 import torch
 from tqdm import tqdm
@@ -18,6 +17,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from utils.distributed import setup_distributed, cleanup_distributed
 from utils.logging_utils import setup_logging
 from utils.checkpoint import load_checkpoint
+from utils.memory import MemoryTracker
+from utils.result_store import save_results
 from models.decoder import DecoderSD_L, DecoderSD_M, DecoderSD_S, StyleGAN2Decoder
 from models.stylegan2_model import StyleGAN2Model
 from models.stable_diffusion_model import StableDiffusionModel
@@ -83,6 +84,14 @@ def parse_args():
     parser.add_argument("--base", type=int, default=2,
                        help="Base for exponential increase in pixel count (default: 2 for 1,2,4,8,...)")
     
+    # Memory instrumentation
+    parser.add_argument("--disable_memory_tracking", action="store_true",
+                       help="Disable per-stage peak memory tracking")
+    parser.add_argument("--host_memory_interval", type=float, default=5.0,
+                       help="Seconds between background host RSS samples (0 disables host sampling)")
+    parser.add_argument("--memory_snapshot_dir", type=str, default=None,
+                       help="Directory to write CUDA memory snapshots to on out-of-memory errors")
+    
     # Output configuration
     parser.add_argument("--output_dir", type=str, default="pixel_manipulation_results",
                        help="Directory to save results")
@@ -94,7 +103,9 @@ def parse_args():
     parser.add_argument("--stylegan2_local_path", type=str,
                        default="ffhq70k-paper256-ada.pkl",
                        help="Local path to store/load the StyleGAN2 model")
-    
+    parser.add_argument("--stylegan2_cache_dir", type=str, default="",
+                       help="Directory to cache converted StyleGAN2 networks in as safetensors (empty disables it)")
+
     # Stable Diffusion specific args
     parser.add_argument("--sd_model_name", type=str,
                        default="stabilityai/stable-diffusion-xl-base-1.0",
@@ -164,7 +175,8 @@ class PixelManipulationExperiment:
                     model_url=self.args.stylegan2_url,
                     model_path=self.args.stylegan2_local_path,
                     device=self.device,
-                    img_size=self.args.img_size
+                    img_size=self.args.img_size,
+                    cache_dir=self.args.stylegan2_cache_dir
                 )
                 
                 # Initialize StyleGAN2 decoder
@@ -317,7 +329,8 @@ class PixelManipulationExperiment:
             'cosine_similarity': [],
             'std_l2': [],
             'std_l1': [],
-            'std_cos': []
+            'std_cos': [],
+            'per_sample': []  # Per-level dict of per-sample metric values
         }
         
         if self.rank == 0:
@@ -397,6 +410,7 @@ class PixelManipulationExperiment:
                 results['std_l2'].append(np.std(level_metrics['l2_distance']))
                 results['std_l1'].append(np.std(level_metrics['l1_distance']))
                 results['std_cos'].append(np.std(level_metrics['cosine_similarity']))
+                results['per_sample'].append({name: np.asarray(values) for name, values in level_metrics.items()})
                 
                 if self.rank == 0:
                     logging.info(f"Level {level} pixels - "
@@ -450,6 +464,15 @@ def main():
     local_rank, rank, world_size, device = setup_distributed()
     args.rank = rank  # Add rank to args for validation
     
+    # Per-stage memory instrumentation
+    memory_tracker = MemoryTracker(
+        device=device,
+        rank=rank,
+        enabled=not args.disable_memory_tracking,
+        host_sample_interval=args.host_memory_interval,
+        snapshot_dir=args.memory_snapshot_dir
+    )
+    
     # Create output directory and setup logging
     if rank == 0:
         os.makedirs(args.output_dir, exist_ok=True)
@@ -458,27 +481,35 @@ def main():
     
     try:
         # Initialize and run experiment
-        experiment = PixelManipulationExperiment(args, device, rank)
-        results = experiment.run_experiment()
+        with memory_tracker.stage("setup_models"):
+            experiment = PixelManipulationExperiment(args, device, rank)
+        with memory_tracker.stage("run_experiment"):
+            results = experiment.run_experiment()
         
         if rank == 0:
-            # Save results
-            results_path = os.path.join(args.output_dir, 'results.json')
-            with open(results_path, 'w') as f:
-                json.dump({
-                    'manipulation_levels': experiment.manipulation_levels,
-                    'metrics': results
-                }, f, indent=2)
+            # Save results, one case per manipulation level
+            cases = {}
+            for i, level in enumerate(experiment.manipulation_levels):
+                cases[f"level_{level}"] = {
+                    'manipulation_level': level,
+                    **{name: values[i] for name, values in results.items() if name != 'per_sample'},
+                    'samples': results['per_sample'][i]
+                }
+            save_results(args.output_dir, "pixel_manipulation", cases, config=args)
             
             # Print results in table format
             experiment.print_results(results)
             logging.info(f"Experiment completed. Results saved to {args.output_dir}")
+            memory_tracker.log_summary()
+        memory_tracker.save_summary(args.output_dir)
         
     except Exception as e:
         if rank == 0:
             logging.error(f"Error in experiment: {str(e)}", exc_info=True)
         raise
     finally:
+        memory_tracker.close()
+        
         # Clean up distributed environment
         cleanup_distributed()
 
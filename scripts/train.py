@@ -7,10 +7,6 @@ import logging
 import sys
 import os
 
-# Add torch dynamo configuration
-import torch._dynamo
-torch._dynamo.config.suppress_errors = True  # Disable dynamo compilation
-
 # Add the parent directory (project root) to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -41,6 +37,8 @@ def parse_args():
     parser.add_argument("--stylegan2_local_path", type=str,
                         default="ffhq70k-paper256-ada.pkl",
                         help="Local path to store/load the StyleGAN2 model")
+    parser.add_argument("--stylegan2_cache_dir", type=str, default="",
+                        help="Directory to cache converted StyleGAN2 networks in as safetensors (empty disables it)")
     
     # Stable Diffusion configuration
     parser.add_argument("--sd_model_name", type=str,
@@ -93,6 +91,37 @@ def parse_args():
     parser.add_argument("--log_interval", type=int, default=1, help="Interval for logging training progress")
     parser.add_argument("--checkpoint_interval", type=int, default=10000, help="Interval for saving checkpoints")
     
+    # Learning rate schedule and early stopping
+    parser.add_argument("--lr_scheduler", type=str, default="constant", choices=["constant", "cosine", "plateau"],
+                        help="Learning rate schedule applied after warmup")
+    parser.add_argument("--warmup_iterations", type=int, default=0, help="Number of linear LR warmup iterations")
+    parser.add_argument("--min_lr", type=float, default=0.0, help="Minimum LR for cosine decay and plateau reductions")
+    parser.add_argument("--plateau_patience", type=int, default=5,
+                        help="Convergence checks without improvement before the plateau scheduler reduces the LR")
+    parser.add_argument("--plateau_factor", type=float, default=0.5, help="LR reduction factor on a plateau")
+    parser.add_argument("--convergence_check_interval", type=int, default=100,
+                        help="Iterations between convergence checks (scheduler, early stopping, best checkpoint)")
+    parser.add_argument("--early_stopping", action="store_true",
+                        help="Stop training once the monitored MSE stops improving")
+    parser.add_argument("--early_stopping_patience", type=int, default=5000,
+                        help="Iterations without improvement before stopping")
+    parser.add_argument("--early_stopping_min_delta", type=float, default=0.0,
+                        help="Minimum MSE decrease counted as an improvement")
+    parser.add_argument("--ema_alpha", type=float, default=0.01, help="Smoothing factor for the train MSE moving average")
+    parser.add_argument("--val_interval", type=int, default=0,
+                        help="Iterations between held-out MSE evaluations (0 monitors the smoothed train MSE)")
+    parser.add_argument("--val_batches", type=int, default=4, help="Number of held-out batches per rank")
+    parser.add_argument("--no_best_checkpoint", action="store_true",
+                        help="Do not write checkpoint_best.pth when the monitored MSE improves")
+    
+    # Memory instrumentation
+    parser.add_argument("--disable_memory_tracking", action="store_true",
+                        help="Disable per-stage peak memory tracking")
+    parser.add_argument("--host_memory_interval", type=float, default=5.0,
+                        help="Seconds between background host RSS samples (0 disables host sampling)")
+    parser.add_argument("--memory_snapshot_dir", type=str, default=None,
+                        help="Directory to write CUDA memory snapshots to on out-of-memory errors")
+    
     # Output configuration
     parser.add_argument("--output_dir", type=str, default="results", help="Directory to save logs and checkpoints")
     
@@ -106,6 +135,10 @@ def main():
     """Main entry point for training."""
     args = parse_args()
     
+    # Add torch dynamo configuration (imported here as torch._dynamo is slow to load)
+    import torch._dynamo
+    torch._dynamo.config.suppress_errors = True  # Disable dynamo compilation
+    
     try:
         # Setup distributed training first
         local_rank, rank, world_size, device = setup_distributed()
@@ -22,8 +22,10 @@ from PIL import Image, ImageDraw
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from config.default_config import get_default_config
+from models.base_model import make_sample_generators
 from models.model_utils import load_stylegan2_model
 from utils.logging_utils import setup_logging
+from utils.pixel_indices import get_pixel_index_set
 
 
 def parse_args():
@@ -37,6 +39,8 @@ def parse_args():
     parser.add_argument("--stylegan2_local_path", type=str,
                         default="ffhq70k-paper256-ada.pkl",
                         help="Local path to store/load the StyleGAN2 model")
+    parser.add_argument("--stylegan2_cache_dir", type=str, default="",
+                        help="Directory to cache converted StyleGAN2 networks in as safetensors (empty disables it)")
     parser.add_argument("--output_dir", type=str, default="pipeline_visualization",
                         help="Directory to save visualization results")
     parser.add_argument("--num_samples", type=int, default=5,
@@ -50,30 +54,6 @@ def parse_args():
     return args
 
 
-def generate_pixel_indices(img_size: int, num_pixels: int, seed: int) -> torch.Tensor:
-    """
-    Generate random pixel indices for visualization.
-    
-    Args:
-        img_size (int): Size of the image (assuming square)
-        num_pixels (int): Number of pixels to select
-        seed (int): Random seed for reproducibility
-        
-    Returns:
-        torch.Tensor: Selected pixel indices
-    """
-    torch.manual_seed(seed)
-    
-    # Calculate total number of pixels
-    channels = 3  # RGB image
-    total_pixels = channels * img_size * img_size
-    
-    # Generate random indices (without replacement)
-    indices = torch.randperm(total_pixels)[:num_pixels]
-    
-    return indices
-
-
 def visualize_latent_vector(z: torch.Tensor, output_path: str):
     """
     Visualize a latent vector as a heatmap.
@@ -147,23 +127,6 @@ def visualize_selected_pixels(pixel_values: torch.Tensor, output_path: str):
     plt.close()
 
 
-def extract_pixels(image: torch.Tensor, pixel_indices: torch.Tensor) -> torch.Tensor:
-    """
-    Extract pixel values at selected indices.
-    
-    Args:
-        image (torch.Tensor): Input image [1, C, H, W]
-        pixel_indices (torch.Tensor): Selected pixel indices
-        
-    Returns:
-        torch.Tensor: Selected pixel values
-    """
-    batch_size = image.shape[0]
-    flattened = image.view(batch_size, -1)
-    pixel_values = flattened.index_select(1, pixel_indices)
-    return pixel_values[0]  # Return first batch element
-
-
 def main():
     """Main entry point for visualization."""
     args = parse_args()
@@ -187,22 +150,24 @@ def main():
     model = load_stylegan2_model(
         args.stylegan2_url,
         args.stylegan2_local_path,
-        device
+        device,
+        cache_dir=args.stylegan2_cache_dir
     ).eval()
     
     # Generate pixel indices
     img_size = 256  # Assuming 256x256 images
-    pixel_indices = generate_pixel_indices(img_size, args.num_pixels, args.seed)
-    pixel_indices = pixel_indices.to(device)
+    pixel_set = get_pixel_index_set(img_size, args.num_pixels, args.seed, device=device)
     
-    # Generate and visualize samples
+    # Generate and visualize samples, each latent from its own seed (as StyleGAN2Model.generate_images
+    # does with seeds=)
+    generators = make_sample_generators([args.seed + i for i in range(args.num_samples)])
     for sample_idx in range(args.num_samples):
         # Create sample directory
         sample_dir = output_dir / f"sample_{sample_idx:02d}"
         sample_dir.mkdir(exist_ok=True)
         
         # Generate latent vector
-        z = torch.randn(1, model.z_dim, device=device)
+        z = torch.randn(1, model.z_dim, generator=generators[sample_idx]).to(device)
         
         # Generate image
         with torch.no_grad():
@@ -214,7 +179,7 @@ def main():
                 x = model.synthesis(w, noise_mode="const")
         
         # Extract selected pixels
-        pixel_values = extract_pixels(x, pixel_indices)
+        pixel_values = pixel_set.extract(x)[0]
         
         # Save visualizations
         visualize_latent_vector(z[0], str(sample_dir / "z.png"))
@@ -22,6 +22,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from config.default_config import get_default_config
 from models.stable_diffusion_model import StableDiffusionModel
 from utils.model_loading import load_pretrained_models
+from utils.image_corpus import create_image_corpus, generate_with_corpus
 from utils.image_transforms import (
     downsample_and_upsample,
     apply_jpeg_compression
@@ -70,6 +71,14 @@ def create_grid_with_borders(images, nrow):
     return grid_img
 
 
+def generate_in_batches(model, seeds, batch_size, corpus=None, **gen_kwargs):
+    """Generate one image per seed, batch_size images per diffusion call."""
+    images = []
+    for start in range(0, len(seeds), batch_size):
+        images.append(generate_with_corpus(model, seeds[start:start + batch_size], corpus=corpus, **gen_kwargs))
+    return torch.cat(images, dim=0)
+
+
 def parse_args():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description="Visualize comparisons between original SD model and negative cases")
@@ -95,6 +104,10 @@ def parse_args():
                         help="Number of denoising steps")
     parser.add_argument("--guidance_scale", type=float, default=7.5,
                         help="Classifier-free guidance scale")
+    parser.add_argument("--image_corpus_dir", type=str, default=None,
+                        help="Directory of the generated-image corpus to reuse images across runs")
+    parser.add_argument("--batch_size", type=int, default=1,
+                        help="Number of images generated per diffusion call")
     
     args = parser.parse_args()
     
@@ -152,38 +165,29 @@ def main():
         'jpeg_compressed': []
     }
     
-    # First, generate all original images with fixed seeds
-    original_images = []
-    for i, prompt in enumerate(prompts):
-        # Set a specific seed for each image
-        torch.manual_seed(args.seed + i)
-        np.random.seed(args.seed + i)
-        
-        original_img = original_model.generate_images(
-            batch_size=1,
-            prompt=prompt,
-            num_inference_steps=args.num_inference_steps,
-            guidance_scale=args.guidance_scale
-        )[0]
-        original_images.append(original_img)
-        case_images['original'].append(original_img)
+    # Images of previous runs are read back from the corpus when available
+    corpus = create_image_corpus(args.image_corpus_dir)
+    seeds = [args.seed + i for i in range(args.num_samples)]
+    gen_kwargs = {
+        "prompt": prompts,
+        "num_inference_steps": args.num_inference_steps,
+        "guidance_scale": args.guidance_scale
+    }
+    
+    # First, generate all original images with a fixed seed per image
+    original_images = list(generate_in_batches(original_model, seeds, args.batch_size, corpus=corpus, **gen_kwargs))
+    case_images['original'].extend(original_images)
+    
+    # Pretrained models (using the same seeds)
+    for model_name, model in pretrained_models.items():
+        images = generate_in_batches(model, seeds, args.batch_size, corpus=corpus, **gen_kwargs)
+        case_images[f'pretrained_{model_name}'].extend(images)
+    
+    if corpus is not None:
+        corpus.close()
     
     # Now process each original image through the different cases
     for i, original_img in enumerate(original_images):
-        # Set the same seed as used for the original image
-        torch.manual_seed(args.seed + i)
-        np.random.seed(args.seed + i)
-        
-        # Pretrained models (using the same seed)
-        for model_name, model in pretrained_models.items():
-            img = model.generate_images(
-                batch_size=1,
-                prompt=prompts[i],
-                num_inference_steps=args.num_inference_steps,
-                guidance_scale=args.guidance_scale
-            )[0]
-            case_images[f'pretrained_{model_name}'].append(img)
-        
         # Downsampled images (using the same original image)
         for size in [16, 224]:
             downsampled_img = downsample_and_upsample(original_img.unsqueeze(0), downsample_size=size)[0]
@@ -105,6 +105,7 @@ def main():
     logging.info("Generating images...")
     images = model.generate_images(
         batch_size=16,  # 4x4 grid
+        seeds=[args.seed + i for i in range(16)],
         prompt=args.prompt,
         num_inference_steps=args.num_inference_steps,
         guidance_scale=args.guidance_scale
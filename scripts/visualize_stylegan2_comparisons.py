@@ -20,6 +20,7 @@ from PIL import Image, ImageDraw
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from config.default_config import get_default_config
+from models.base_model import make_sample_generators
 from models.model_utils import load_stylegan2_model
 from utils.model_loading import load_pretrained_models
 from utils.image_transforms import (
@@ -83,6 +84,8 @@ def parse_args():
     parser.add_argument("--stylegan2_local_path", type=str,
                         default="ffhq70k-paper256-ada.pkl",
                         help="Local path to store/load the StyleGAN2 model")
+    parser.add_argument("--stylegan2_cache_dir", type=str, default="",
+                        help="Directory to cache converted StyleGAN2 networks in as safetensors (empty disables it)")
     parser.add_argument("--img_size", type=int, default=256,
                         help="Image resolution")
     parser.add_argument("--seed", type=int, default=42,
@@ -135,11 +138,12 @@ def main():
     original_model = load_stylegan2_model(
         args.stylegan2_url,
         args.stylegan2_local_path,
-        device
+        device,
+        cache_dir=args.stylegan2_cache_dir
     ).eval()
     
     # Load pretrained models
-    pretrained_models = load_pretrained_models(device, 0)
+    pretrained_models = load_pretrained_models(device, 0, stylegan2_cache_dir=args.stylegan2_cache_dir)
     
     # Create quantized models
     quantized_models = {}
@@ -155,8 +159,12 @@ def main():
     except Exception as e:
         logging.error(f"Failed to create int4 model: {str(e)}")
     
-    # Generate latent vectors for all samples
-    z_vectors = [torch.randn(1, original_model.z_dim, device=device) for _ in range(args.num_samples)]
+    # Generate latent vectors for all samples, each from its own seed (as StyleGAN2Model.generate_images
+    # does with seeds=), so a sample does not depend on the number of samples or models
+    z_vectors = [
+        torch.randn(1, original_model.z_dim, generator=generator).to(device)
+        for generator in make_sample_generators([args.seed + i for i in range(args.num_samples)])
+    ]
     grid_size = int(math.sqrt(args.num_samples))
     
     # Dictionary to store images for each case
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Add the project root to the Python path, as the scripts do
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
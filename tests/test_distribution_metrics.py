@@ -0,0 +1,235 @@
+"""
+Invariants of the streaming moments and the tiled distribution metrics, checked against
+dense reference computations on random features.
+"""
+import os
+import socket
+
+import numpy as np
+import pytest
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from scipy.spatial.distance import cdist
+from scipy.stats import wasserstein_distance
+
+from utils.distribution_metrics import (
+    calculate_kid,
+    calculate_mmd,
+    calculate_prdc,
+    calculate_wasserstein,
+    get_projection_bank
+)
+from utils.metrics import StreamingMoments
+
+
+def _features(seed, num_samples, dims, scale=1.0, shift=0.0):
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal((num_samples, dims)) * scale + shift).astype(np.float32)
+
+
+# Streaming moments
+
+def test_moments_match_numpy():
+    features = _features(0, 1000, 32, shift=100.0)
+    moments = StreamingMoments(dims=32)
+    for start in range(0, len(features), 37):
+        moments.update(features[start:start + 37])
+    mu, sigma = moments.statistics()
+    np.testing.assert_allclose(mu, features.astype(np.float64).mean(axis=0), rtol=1e-10, atol=1e-10)
+    np.testing.assert_allclose(sigma, np.cov(features.astype(np.float64), rowvar=False), rtol=1e-9, atol=1e-10)
+
+
+def test_merged_shards_match_numpy():
+    features = _features(1, 900, 16)
+    shards = np.array_split(features, [100, 101, 550])  # Includes a single-row shard
+    merged = StreamingMoments(dims=16)
+    for shard in shards:
+        merged.merge(StreamingMoments.from_features(shard, batch_size=64))
+    merged.merge(StreamingMoments(dims=16))  # Empty accumulators are ignored
+    mu, sigma = merged.statistics()
+    assert merged.count == len(features)
+    np.testing.assert_allclose(mu, features.astype(np.float64).mean(axis=0), rtol=1e-10, atol=1e-10)
+    np.testing.assert_allclose(sigma, np.cov(features.astype(np.float64), rowvar=False), rtol=1e-9, atol=1e-10)
+
+
+def test_moments_state_dict_roundtrip():
+    moments = StreamingMoments.from_features(_features(2, 200, 8))
+    restored = StreamingMoments(dims=8)
+    restored.load_state_dict(moments.state_dict())
+    assert restored.count == moments.count
+    for expected, actual in zip(moments.statistics(), restored.statistics()):
+        np.testing.assert_allclose(actual, expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize("num_samples", [0, 1])
+def test_moments_need_two_rows(num_samples):
+    moments = StreamingMoments(dims=8)
+    moments.update(_features(3, num_samples, 8))
+    with pytest.raises(ValueError):
+        moments.statistics()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _gathered_worker(rank, world_size, port, features, output_path):
+    os.environ['MASTER_ADDR'] = '127.0.0.1'
+    os.environ['MASTER_PORT'] = str(port)
+    dist.init_process_group('gloo', rank=rank, world_size=world_size)
+    try:
+        # Contiguous, unequal shards, as with shard_range
+        shard = np.array_split(features, world_size)[rank]
+        gathered = StreamingMoments.from_features(shard).gathered(torch.device('cpu'), world_size)
+        if rank == 0:
+            mu, sigma = gathered.statistics()
+            np.savez(output_path, count=gathered.count, mu=mu, sigma=sigma)
+    finally:
+        dist.destroy_process_group()
+
+
+@pytest.mark.skipif(not dist.is_available(), reason="torch.distributed is unavailable")
+def test_gathered_moments_match_numpy(tmp_path):
+    features = _features(3, 301, 8)
+    output_path = str(tmp_path / "gathered.npz")
+    mp.spawn(_gathered_worker, args=(2, _free_port(), features, output_path), nprocs=2)
+    result = np.load(output_path)
+    assert int(result['count']) == len(features)
+    np.testing.assert_allclose(result['mu'], features.astype(np.float64).mean(axis=0), rtol=1e-10, atol=1e-10)
+    np.testing.assert_allclose(result['sigma'], np.cov(features.astype(np.float64), rowvar=False), rtol=1e-9, atol=1e-10)
+
+
+# MMD
+
+def _dense_mmd(x, y, sigma, unbiased):
+    x, y = x.astype(np.float64), y.astype(np.float64)
+
+    def kernel(a, b):
+        return np.exp(-cdist(a, b, 'sqeuclidean') / (2 * sigma ** 2))
+
+    k_xx, k_yy, k_xy = kernel(x, x), kernel(y, y), kernel(x, y)
+    if not unbiased:
+        return k_xx.mean() + k_yy.mean() - 2 * k_xy.mean()
+    n, m = len(x), len(y)
+    return ((k_xx.sum() - np.trace(k_xx)) / (n * (n - 1)) + (k_yy.sum() - np.trace(k_yy)) / (m * (m - 1))
+            - 2 * k_xy.mean())
+
+
+@pytest.mark.parametrize("estimator", ['biased', 'unbiased'])
+def test_tiled_mmd_matches_dense(estimator):
+    x = _features(4, 300, 64, shift=3.0)
+    y = _features(5, 250, 64, scale=1.1, shift=3.2)
+    sigmas = [4.0, 8.0, 12.0]
+    # A block size that divides neither set size exercises the ragged edge tiles
+    actual = calculate_mmd(x, y, sigma=sigmas, estimator=estimator, block_size=64, device='cpu')
+    expected = [_dense_mmd(x, y, sigma, estimator == 'unbiased') for sigma in sigmas]
+    np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-8)
+
+    single = calculate_mmd(x, y, sigma=8.0, estimator=estimator, block_size=64, device='cpu')
+    assert isinstance(single, float)
+    np.testing.assert_allclose(single, expected[1], rtol=1e-5, atol=1e-8)
+
+
+# KID
+
+def _naive_kid(x, y, num_subsets, subset_size, seed, bags_per_batch):
+    """Per-bag loops over sample pairs, drawing the bags in the same order as calculate_kid."""
+    x, y = x.astype(np.float64), y.astype(np.float64)
+    dim = x.shape[1]
+    generator = torch.Generator()
+    generator.manual_seed(seed)
+
+    def kernel(a, b):
+        return (a @ b / dim + 1) ** 3
+
+    scores = []
+    for start in range(0, num_subsets, bags_per_batch):
+        bags = min(bags_per_batch, num_subsets - start)
+        idx1 = [torch.randperm(len(x), generator=generator)[:subset_size].numpy() for _ in range(bags)]
+        idx2 = [torch.randperm(len(y), generator=generator)[:subset_size].numpy() for _ in range(bags)]
+        for i1, i2 in zip(idx1, idx2):
+            xs, ys = x[i1], y[i2]
+            sum_xx = sum(kernel(xs[i], xs[j]) for i in range(subset_size) for j in range(subset_size) if i != j)
+            sum_yy = sum(kernel(ys[i], ys[j]) for i in range(subset_size) for j in range(subset_size) if i != j)
+            sum_xy = sum(kernel(xs[i], ys[j]) for i in range(subset_size) for j in range(subset_size))
+            pairs = subset_size * (subset_size - 1)
+            scores.append(sum_xx / pairs + sum_yy / pairs - 2 * sum_xy / subset_size ** 2)
+    return np.mean(scores), np.std(scores)
+
+
+def test_batched_kid_matches_naive_loops():
+    x = _features(10, 40, 16)
+    y = _features(11, 50, 16, scale=1.2, shift=0.3)
+    # Bags hold half of the smaller set; 7 bags in batches of 3 leave a ragged last batch
+    actual = calculate_kid(x, y, num_subsets=7, subset_size=1000, seed=4, bags_per_batch=3, device='cpu')
+    expected = _naive_kid(x, y, num_subsets=7, subset_size=20, seed=4, bags_per_batch=3)
+    np.testing.assert_allclose(actual, expected, rtol=1e-5)
+    assert actual[1] > 0
+
+
+# Sliced Wasserstein
+
+@pytest.mark.parametrize("num_samples2", [300, 220])
+def test_wasserstein_matches_exact_1d(num_samples2):
+    x = _features(6, 300, 16)
+    y = _features(7, num_samples2, 16, scale=1.3, shift=0.4)
+    projections = get_projection_bank(16, 50, seed=3, device='cpu').numpy()
+    expected = np.mean([wasserstein_distance(x @ projections[:, i], y @ projections[:, i]) for i in range(50)])
+    actual = calculate_wasserstein(x, y, num_projections=50, seed=3, chunk_size=7, device='cpu')
+    np.testing.assert_allclose(actual, expected, rtol=1e-5)
+
+
+def test_projection_bank_is_shared():
+    assert get_projection_bank(16, 50, seed=3, device='cpu') is get_projection_bank(16, 50, seed=3, device='cpu')
+
+
+# Precision, recall, density and coverage
+
+def _brute_force_radii(features, k):
+    return np.sort(cdist(features, features), axis=1)[:, k]
+
+
+def _brute_force_prdc(real, fake, k):
+    """Precision, recall, density and coverage from full distance matrices, with open balls."""
+    real_radii = _brute_force_radii(real, k)
+    fake_radii = _brute_force_radii(fake, k)
+    distances = cdist(fake, real)
+    return {
+        'precision': np.mean((distances < real_radii[None]).any(axis=1)),
+        'recall': np.mean((distances.T < fake_radii[None]).any(axis=1)),
+        'density': (distances < real_radii[None]).sum() / (k * len(fake)),
+        'coverage': np.mean(distances.min(axis=0) < real_radii),
+    }
+
+
+def test_prdc_matches_brute_force():
+    real = _features(8, 700, 64)
+    fake = _features(9, 600, 64, scale=1.2, shift=0.2)
+    k = 5
+    expected = _brute_force_prdc(real, fake, k)
+    actual = calculate_prdc(real, fake, k=k, block_size=128, device='cpu')
+    for name, value in expected.items():
+        np.testing.assert_allclose(actual[name], value, atol=1e-12, err_msg=name)
+
+
+def test_prdc_excludes_duplicates_from_zero_radius_balls():
+    # Small integers with zero mean keep every distance exact, also after centering
+    rng = np.random.default_rng(10)
+    k = 3
+    outlier = np.full((1, 8), 20.0)
+    real = np.concatenate([rng.integers(-3, 4, (40, 8)), np.repeat(outlier, k + 1, axis=0)]).astype(np.float32)
+    fake = np.concatenate([rng.integers(-3, 4, (40, 8)), outlier]).astype(np.float32)
+    real, fake = np.concatenate([real, -real]), np.concatenate([fake, -fake])
+
+    # The k + 1 copies of the outlier have k-NN radius 0, so its fake duplicates lie on the
+    # boundary of their balls, and in no other ball
+    expected = _brute_force_prdc(real, fake, k)
+    inclusive = np.mean((cdist(fake, real) <= _brute_force_radii(real, k)[None]).any(axis=1))
+    assert expected['precision'] < inclusive
+
+    actual = calculate_prdc(real, fake, k=k, block_size=32, device='cpu')
+    for name, value in expected.items():
+        np.testing.assert_allclose(actual[name], value, atol=1e-12, err_msg=name)
@@ -0,0 +1,49 @@
+"""
+Agreement of the eigendecomposition-based Frechet distance with scipy.linalg.sqrtm.
+"""
+import numpy as np
+import pytest
+
+from utils.metrics import compute_fid_from_statistics
+
+
+DIMS = 2048
+RTOL = 1e-6
+
+
+def _statistics(rng, num_samples, dims=DIMS, scale=1.0, shift=0.0):
+    features = rng.standard_normal((num_samples, dims)) * scale + shift
+    return features.mean(axis=0), np.cov(features, rowvar=False)
+
+
+@pytest.mark.parametrize("num_samples", [
+    5000,  # Full-rank covariances
+    1000,  # Rank-deficient covariances (fewer samples than dimensions)
+])
+def test_eigh_matches_scipy(num_samples):
+    rng = np.random.default_rng(0)
+    mu1, sigma1 = _statistics(rng, num_samples)
+    mu2, sigma2 = _statistics(rng, num_samples, scale=1.3, shift=0.1)
+    
+    expected = compute_fid_from_statistics(mu1, sigma1, mu2, sigma2, method='scipy')
+    actual = compute_fid_from_statistics(mu1, sigma1, mu2, sigma2, method='eigh', device='cpu')
+    np.testing.assert_allclose(actual, expected, rtol=RTOL)
+
+
+def test_near_singular_covariance():
+    # A covariance with eigenvalues down to 1e-12, where rounding makes some slightly negative
+    rng = np.random.default_rng(1)
+    basis, _ = np.linalg.qr(rng.standard_normal((DIMS, DIMS)))
+    sigma1 = (basis * np.logspace(0, -12, DIMS)) @ basis.T
+    mu1 = rng.standard_normal(DIMS)
+    mu2, sigma2 = _statistics(rng, 5000)
+    
+    expected = compute_fid_from_statistics(mu1, sigma1, mu2, sigma2, method='scipy')
+    actual = compute_fid_from_statistics(mu1, sigma1, mu2, sigma2, method='eigh', device='cpu')
+    np.testing.assert_allclose(actual, expected, rtol=RTOL)
+
+
+def test_identical_statistics():
+    rng = np.random.default_rng(2)
+    mu, sigma = _statistics(rng, 1000)
+    assert abs(compute_fid_from_statistics(mu, sigma, mu, sigma, device='cpu')) < 1e-6 * np.trace(sigma)
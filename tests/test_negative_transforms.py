@@ -0,0 +1,62 @@
+"""
+Negative transformations on images in each model's value range.
+"""
+import pytest
+import torch
+import torch.nn.functional as F
+
+from utils.negative_transforms import TransformBatch, TransformSetup, build_negative_transforms, image_value_range
+
+
+def _images(seed, num_images=4, size=64):
+    """Smooth random images in [0, 1], so JPEG coding changes them only slightly."""
+    generator = torch.Generator().manual_seed(seed)
+    coarse = torch.rand(num_images, 3, size // 8, size // 8, generator=generator)
+    return F.interpolate(coarse, size=size, mode='bilinear', align_corners=False)
+
+
+def _transform(spec, model_type):
+    setup = TransformSetup(seed=3, value_range=image_value_range(model_type))
+    return build_negative_transforms([spec], setup)[spec]
+
+
+@pytest.mark.parametrize("spec", ["jpeg_75", "noise_0.05"])
+def test_stable_diffusion_range_matches_stylegan2_range(spec):
+    images = _images(0)
+    sd_output = _transform(spec, "stable-diffusion")(images, TransformBatch(images, start_idx=5))
+    stylegan2_images = images * 2 - 1
+    stylegan2_output = _transform(spec, "stylegan2")(stylegan2_images, TransformBatch(stylegan2_images, start_idx=5))
+
+    # The same perturbation, expressed in each model's value range
+    assert sd_output.min() >= 0 and sd_output.max() <= 1
+    torch.testing.assert_close(sd_output, (stylegan2_output + 1) / 2, rtol=0, atol=1.5 / 255)
+
+
+def test_jpeg_keeps_stable_diffusion_images_in_range():
+    images = _images(1)
+    output = _transform("jpeg_75", "stable-diffusion")(images)
+    assert output.min() >= 0 and output.max() <= 1
+    # The coding error is a few grey levels, with no shift or rescaling of the values
+    assert (output - images).abs().mean() < 8 / 255
+    assert abs(output.mean() - images.mean()) < 1 / 255
+
+
+def test_noise_std_and_clamping_for_stable_diffusion():
+    images = torch.full((2, 3, 64, 64), 0.5)
+    output = _transform("noise_0.05", "stable-diffusion")(images)
+    # 0.05 on the [-1, 1] scale is 0.025 on [0, 1]
+    assert abs((output - images).std().item() - 0.025) < 0.002
+
+    saturated = torch.ones(2, 3, 64, 64)
+    output = _transform("noise_0.05", "stable-diffusion")(saturated)
+    assert output.max() <= 1 and output.min() < 1
+
+
+def test_area_levels_match_direct_area_resampling():
+    images = _images(2, num_images=2, size=216)
+    batch = TransformBatch(images)
+    # 72 and 24 are pooled from cached levels (ratios of 3); 160 does not divide 216
+    for size in [72, 24, 8, 160, 54]:
+        expected = F.interpolate(images, size=size, mode='area')
+        torch.testing.assert_close(batch.area_downsample(size), expected, rtol=0, atol=1e-6)
+    assert batch.area_downsample(24) is batch.area_downsample(24)
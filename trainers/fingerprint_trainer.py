@@ -11,12 +11,13 @@ from typing import Dict, List, Optional, Tuple
 import torch
 import torch.optim as optim
 from torch.nn.parallel import DistributedDataParallel as DDP
-from datasets import load_dataset
 
 from config.default_config import Config
 from models.decoder import DecoderSD_L, DecoderSD_M, DecoderSD_S, StyleGAN2Decoder
-from models.stable_diffusion_model import StableDiffusionModel
 from utils.checkpoint import save_checkpoint, load_checkpoint
+from utils.memory import create_memory_tracker
+from utils.pixel_indices import PixelIndexSet, get_pixel_index_set
+from utils.training_control import LRScheduler, EarlyStopping, all_reduce_mean
 
 
 def clean_prompt(prompt: str) -> str:
@@ -83,14 +84,21 @@ class FingerprintTrainer:
         self.generative_model = None
         self.decoder = None
         
-        # Initialize optimizer
+        # Initialize optimizer, LR schedule and convergence control
         self.optimizer = None
+        self.lr_scheduler: Optional[LRScheduler] = None
+        self.early_stopping: Optional[EarlyStopping] = None
+        self.val_images: Optional[List[torch.Tensor]] = None
         
         # Track training progress
         self.global_step = 0
         self.start_iteration = 1  # Track starting iteration for resuming
         
+        # Per-stage memory instrumentation
+        self.memory_tracker = create_memory_tracker(self.config.memory, self.device, self.rank)
+        
         # Image pixel selection parameters
+        self.pixel_set: Optional[PixelIndexSet] = None
         self.image_pixel_indices = None
         self.image_pixel_count = self.config.model.image_pixel_count
         self.image_pixel_set_seed = self.config.model.image_pixel_set_seed
@@ -143,6 +151,8 @@ class FingerprintTrainer:
             logging.info("Loading prompts from DiffusionDB dataset")
         
         try:
+            from datasets import load_dataset
+            
             # Load the metadata table from DiffusionDB
             subset_mapping = {
                 "2m_random_10k": "2m_random_10k",  # Using random 10k subset instead of full dataset
@@ -198,6 +208,8 @@ class FingerprintTrainer:
             logging.info(f"Loading prompts from Parti-Prompts dataset for category: {self.config.model.parti_prompts_category}")
         
         try:
+            from datasets import load_dataset
+            
             # Load the Parti-Prompts dataset
             dataset = load_dataset("nateraw/parti-prompts", split="train", trust_remote_code=True)
             
@@ -308,6 +320,20 @@ class FingerprintTrainer:
             if self.rank == 0:
                 logging.info("Optimizer initialized with decoder parameters")
             
+            # Initialize LR schedule and convergence controller
+            self.lr_scheduler = LRScheduler(self.optimizer, self.config.training)
+            self.early_stopping = EarlyStopping(
+                patience=self.config.training.early_stopping_patience,
+                min_delta=self.config.training.early_stopping_min_delta,
+                ema_alpha=self.config.training.ema_alpha
+            )
+            if self.rank == 0:
+                logging.info(
+                    f"LR schedule: {self.config.training.lr_scheduler} "
+                    f"(warmup {self.config.training.warmup_iterations} iterations), "
+                    f"early stopping {'enabled' if self.config.training.early_stopping else 'disabled'}"
+                )
+            
             # Ensure models are initialized before DDP wrapping
             torch.cuda.synchronize()
             if self.world_size > 1:
@@ -334,16 +360,15 @@ class FingerprintTrainer:
     
     def _generate_pixel_indices(self) -> None:
         """
-        Generate indices for selecting pixels from the image.
+        Select the fingerprinted pixel set from the image.
         """
-        # Set random seed for reproducibility
-        torch.manual_seed(self.image_pixel_set_seed)
-        
-        # Calculate total number of pixels
-        total_pixels = self.config.model.img_size * self.config.model.img_size * 3  # RGB images
-        
-        # Generate random indices
-        self.image_pixel_indices = torch.randperm(total_pixels)[:self.image_pixel_count]
+        self.pixel_set = get_pixel_index_set(
+            self.config.model.img_size,
+            self.image_pixel_count,
+            self.image_pixel_set_seed,
+            device=self.device
+        )
+        self.image_pixel_indices = self.pixel_set.indices
         
         if self.rank == 0:
             logging.info(f"Generated {self.image_pixel_count} pixel indices with seed {self.image_pixel_set_seed}")
@@ -369,10 +394,7 @@ class FingerprintTrainer:
         # Ensure indices are generated
         self.validate_indices()
         
-        # Flatten images and extract selected pixels
-        batch_size = images.size(0)
-        flattened = images.view(batch_size, -1)
-        return flattened[:, self.image_pixel_indices]
+        return self.pixel_set.extract(images)
     
     def train_iteration(self) -> Dict[str, float]:
         """
@@ -395,11 +417,12 @@ class FingerprintTrainer:
                     logging.info(f"  {i+1}. {prompt}")
         
         # Generate images
-        x = self.generative_model.generate_images(
-            batch_size=self.config.training.batch_size,
-            device=self.device,
-            **gen_kwargs
-        )
+        with self.memory_tracker.stage("generation"):
+            x = self.generative_model.generate_images(
+                batch_size=self.config.training.batch_size,
+                device=self.device,
+                **gen_kwargs
+            )
             
         # Extract features (real pixel values)
         features = self.extract_image_partial(x)
@@ -408,14 +431,15 @@ class FingerprintTrainer:
         # Get decoder (handle DDP wrapping)
         decoder = self.decoder.module if hasattr(self.decoder, 'module') else self.decoder
         
-        # Get predictions
-        pred_values = self.decoder(x)
-        train_loss = torch.mean(torch.pow(pred_values - true_values, 2))
-        
-        # Optimize
-        self.optimizer.zero_grad()
-        train_loss.backward()
-        self.optimizer.step()
+        with self.memory_tracker.stage("decoder_step"):
+            # Get predictions
+            pred_values = self.decoder(x)
+            train_loss = torch.mean(torch.pow(pred_values - true_values, 2))
+            
+            # Optimize
+            self.optimizer.zero_grad()
+            train_loss.backward()
+            self.optimizer.step()
         
         # Now compute metrics in eval mode
         decoder.eval()  # Temporarily set to eval mode
@@ -488,6 +512,12 @@ class FingerprintTrainer:
                     if self.rank == 0:
                         logging.warning(f"Failed to load optimizer state: {str(e)}")
             
+            # Restore LR schedule and convergence state if available
+            if self.lr_scheduler is not None and 'lr_scheduler_state' in checkpoint:
+                self.lr_scheduler.load_state_dict(checkpoint['lr_scheduler_state'])
+            if self.early_stopping is not None and 'early_stopping_state' in checkpoint:
+                self.early_stopping.load_state_dict(checkpoint['early_stopping_state'])
+            
             # Update training progress
             self.start_iteration = checkpoint.get('iteration', 1)
             self.global_step = checkpoint.get('global_step', self.start_iteration - 1)
@@ -506,13 +536,73 @@ class FingerprintTrainer:
                 logging.error(f"Error loading checkpoint: {str(e)}")
             raise
     
+    def _prepare_validation_set(self) -> None:
+        """
+        Generate the held-out images used for validation MSE and cache them on the CPU.
+        
+        The images are generated under a forked RNG seeded per rank, so they are
+        reproducible and do not perturb the training sample stream.
+        """
+        if self.rank == 0:
+            logging.info(f"Generating {self.config.training.val_batches} held-out batches per rank for validation")
+        
+        base_seed = self.config.seed if self.config.seed is not None else 0
+        python_state = random.getstate()
+        devices = [self.device] if self.device.type == 'cuda' else []
+        self.val_images = []
+        with torch.random.fork_rng(devices=devices), torch.no_grad():
+            torch.manual_seed(base_seed + 1000003 * (self.rank + 1))
+            random.seed(base_seed + self.rank)
+            for _ in range(self.config.training.val_batches):
+                gen_kwargs = self.config.model.get_generation_kwargs()
+                if self.config.model.model_type == "stable-diffusion":
+                    gen_kwargs["prompt"] = self._sample_prompts(self.config.training.batch_size)
+                x = self.generative_model.generate_images(
+                    batch_size=self.config.training.batch_size,
+                    device=self.device,
+                    **gen_kwargs
+                )
+                self.val_images.append(x.float().cpu())
+        random.setstate(python_state)
+    
+    def _validation_mse(self) -> float:
+        """
+        Compute the decoder MSE on the cached held-out images, averaged over ranks.
+        
+        Returns:
+            float: Held-out MSE.
+        """
+        if self.val_images is None:
+            self._prepare_validation_set()
+        
+        decoder = self.decoder.module if hasattr(self.decoder, 'module') else self.decoder
+        decoder.eval()
+        total, count = 0.0, 0
+        with torch.no_grad():
+            for images in self.val_images:
+                x = images.to(self.device, non_blocking=True)
+                pred_values = decoder(x)
+                mse = torch.mean(torch.pow(pred_values - self.extract_image_partial(x), 2), dim=1)
+                total += mse.sum().item()
+                count += mse.numel()
+        decoder.train()
+        return all_reduce_mean(total / count, self.device, self.world_size)
+    
+    def _convergence_state(self) -> Dict:
+        """State of the LR schedule and convergence controller stored in checkpoints."""
+        return {
+            'lr_scheduler_state': self.lr_scheduler.state_dict(),
+            'early_stopping_state': self.early_stopping.state_dict()
+        }
+    
     def train(self) -> None:
         """
         Main training loop.
         """
         try:
             # Set up models first
-            self.setup_models()
+            with self.memory_tracker.stage("setup_models"):
+                self.setup_models()
             
             # Synchronize before loading checkpoint
             if self.world_size > 1:
@@ -522,7 +612,8 @@ class FingerprintTrainer:
             if self.config.checkpoint_path:
                 if self.rank == 0:
                     logging.info(f"Loading checkpoint from {self.config.checkpoint_path}")
-                self.load_checkpoint(self.config.checkpoint_path)
+                with self.memory_tracker.stage("load_checkpoint"):
+                    self.load_checkpoint(self.config.checkpoint_path)
             
             # Synchronize after loading checkpoint
             if self.world_size > 1:
@@ -533,13 +624,59 @@ class FingerprintTrainer:
                 logging.info("Starting training...")
                 start_time = time.time()
             
-            for iteration in range(self.start_iteration, self.config.training.total_iterations + 1):
+            training_config = self.config.training
+            use_validation = training_config.val_interval > 0
+            check_interval = training_config.val_interval if use_validation else training_config.convergence_check_interval
+            
+            for iteration in range(self.start_iteration, training_config.total_iterations + 1):
+                # Apply the learning rate for this iteration
+                lr = self.lr_scheduler.step(iteration)
+                
                 # Run training iteration
                 metrics = self.train_iteration()
+                metrics['lr'] = lr
                 
                 # Update global step
                 self.global_step = iteration
                 
+                # Track the smoothed train MSE
+                metrics['mse_ema'] = self.early_stopping.update_train(metrics['mse_distance_mean'])
+                
+                # Convergence check: every rank sees the same all-reduced metric, so the
+                # scheduler, best-checkpoint and stop decisions agree across ranks
+                stop_training = False
+                if iteration % check_interval == 0:
+                    if use_validation:
+                        monitored = self._validation_mse()
+                        metrics['val_mse'] = monitored
+                    else:
+                        monitored = all_reduce_mean(metrics['mse_ema'], self.device, self.world_size)
+                    
+                    self.lr_scheduler.step_metric(iteration, monitored)
+                    improved = self.early_stopping.check(iteration, monitored)
+                    
+                    if self.rank == 0:
+                        logging.info(
+                            f"Convergence check at iteration {iteration}: "
+                            f"{'val' if use_validation else 'smoothed train'} MSE {monitored:.6f} "
+                            f"(best {self.early_stopping.best:.6f} at iteration {self.early_stopping.best_iteration})"
+                        )
+                    
+                    if improved and training_config.save_best_checkpoint:
+                        save_checkpoint(
+                            iteration=iteration,
+                            decoder=self.decoder,
+                            output_dir=self.config.output_dir,
+                            rank=self.rank,
+                            optimizer=self.optimizer,
+                            metrics=metrics,
+                            global_step=self.global_step,
+                            extra_state=self._convergence_state(),
+                            filename="checkpoint_best.pth"
+                        )
+                    
+                    stop_training = training_config.early_stopping and self.early_stopping.should_stop(iteration)
+                
                 # Log progress
                 if self.rank == 0 and iteration % self.config.training.log_interval == 0:
                     elapsed = time.time() - start_time
@@ -547,7 +684,8 @@ class FingerprintTrainer:
                         f"Iteration {iteration}/{self.config.training.total_iterations} "
                         f"[{elapsed:.2f}s] "
                         f"Train Loss: {metrics['train_loss']:.6f} "
-                        f"MSE: {metrics['mse_distance_mean']:.6f} ± {metrics['mse_distance_std']:.6f}"
+                        f"MSE: {metrics['mse_distance_mean']:.6f} ± {metrics['mse_distance_std']:.6f} "
+                        f"LR: {lr:.2e}"
                     )
                 
                 # Save checkpoint
@@ -559,12 +697,38 @@ class FingerprintTrainer:
                         rank=self.rank,
                         optimizer=self.optimizer,
                         metrics=metrics,
-                        global_step=self.global_step
+                        global_step=self.global_step,
+                        extra_state=self._convergence_state()
                     )
+                    self.memory_tracker.log_summary()
+                
+                if stop_training:
+                    if self.rank == 0:
+                        logging.info(
+                            f"Early stopping at iteration {iteration}: no improvement for "
+                            f"{iteration - self.early_stopping.best_iteration} iterations "
+                            f"(best MSE {self.early_stopping.best:.6f} at iteration {self.early_stopping.best_iteration})"
+                        )
+                    if iteration % training_config.checkpoint_interval != 0:
+                        save_checkpoint(
+                            iteration=iteration,
+                            decoder=self.decoder,
+                            output_dir=self.config.output_dir,
+                            rank=self.rank,
+                            optimizer=self.optimizer,
+                            metrics=metrics,
+                            global_step=self.global_step,
+                            extra_state=self._convergence_state()
+                        )
+                    break
             
             if self.rank == 0:
                 logging.info("Training completed")
+                self.memory_tracker.log_summary()
+            self.memory_tracker.save_summary(self.config.output_dir)
         
         except Exception as e:
             logging.error(f"Error in training: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+        finally:
+            self.memory_tracker.close() 
\ No newline at end of file
@@ -1,9 +1,29 @@
 """
 Utilities module for StyleGAN Fingerprinting.
+
+Submodules are imported lazily on first attribute access, so importing one utility
+does not load the dependencies of the others.
 """
+import importlib
+
+_LAZY_ATTRIBUTES = {
+    "save_checkpoint": ".checkpoint",
+    "setup_distributed": ".distributed",
+    "cleanup_distributed": ".distributed",
+    "setup_logging": ".logging_utils",
+}
+
+__all__ = ["save_checkpoint", "setup_distributed", "cleanup_distributed", "setup_logging"]
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-from .checkpoint import save_checkpoint
-from .distributed import setup_distributed, cleanup_distributed
-from .logging_utils import setup_logging
 
-__all__ = ["save_checkpoint", "setup_distributed", "cleanup_distributed", "setup_logging"] 
\ No newline at end of file
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
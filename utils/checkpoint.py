@@ -17,7 +17,9 @@ def save_checkpoint(
     rank: int,
     optimizer: Optional[torch.optim.Optimizer] = None,
     metrics: Optional[Dict] = None,
-    global_step: Optional[int] = None
+    global_step: Optional[int] = None,
+    extra_state: Optional[Dict] = None,
+    filename: Optional[str] = None
 ) -> None:
     """
     Save a checkpoint of the decoder model and training state.
@@ -30,12 +32,14 @@ def save_checkpoint(
         optimizer (torch.optim.Optimizer, optional): Optimizer to save.
         metrics (Dict, optional): Current training metrics.
         global_step (int, optional): Global step counter for training progress.
+        extra_state (Dict, optional): Additional entries stored in the checkpoint (e.g. scheduler state).
+        filename (str, optional): Checkpoint file name. Defaults to checkpoint_iter{iteration}.pth.
     """
     if rank != 0:
         return  # Only save from the master process
     
     os.makedirs(output_dir, exist_ok=True)
-    ckpt_path = os.path.join(output_dir, f"checkpoint_iter{iteration}.pth")
+    ckpt_path = os.path.join(output_dir, filename or f"checkpoint_iter{iteration}.pth")
     
     # Handle DDP-wrapped model by accessing .module if needed
     dec = decoder.module if hasattr(decoder, 'module') else decoder
@@ -50,6 +54,9 @@ def save_checkpoint(
     if optimizer is not None:
         checkpoint['optimizer_state'] = optimizer.state_dict()
     
+    if extra_state:
+        checkpoint.update(extra_state)
+    
     torch.save(checkpoint, ckpt_path)
     logging.info(f"Saved checkpoint at iteration {iteration} to {ckpt_path}")
 
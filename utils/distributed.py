@@ -3,8 +3,9 @@ Utilities for distributed training setup.
 """
 import logging
 import os
-from typing import Tuple
+from typing import Any, Optional, Tuple
 
+import numpy as np
 import torch
 import torch.distributed as dist
 
@@ -53,4 +54,103 @@ def cleanup_distributed():
     """
     if dist.is_initialized():
         dist.destroy_process_group()
-        logging.info("Destroyed distributed process group") 
\ No newline at end of file
+        logging.info("Destroyed distributed process group") 
+
+
+def shard_range(num_items: int, rank: int, world_size: int) -> Tuple[int, int]:
+    """
+    Contiguous block of work items (e.g. batches) owned by a rank.
+    
+    The first num_items % world_size ranks get one extra item, so concatenating the
+    blocks in rank order gives back range(num_items).
+    
+    Args:
+        num_items (int): Total number of items.
+        rank (int): Global process rank.
+        world_size (int): Total number of processes.
+        
+    Returns:
+        tuple: (start, end) - first and end (exclusive) item index of the rank.
+    """
+    base, remainder = divmod(num_items, world_size)
+    start = rank * base + min(rank, remainder)
+    end = start + base + (1 if rank < remainder else 0)
+    return start, end
+
+
+def broadcast_object(obj: Any, world_size: int, src: int = 0) -> Any:
+    """
+    Share a picklable object from one rank with all ranks.
+    
+    Args:
+        obj (Any): Object to share (only used on the source rank).
+        world_size (int): Total number of processes.
+        src (int): Source rank.
+        
+    Returns:
+        Any: The source rank's object.
+    """
+    if world_size <= 1:
+        return obj
+    shared = [obj]
+    dist.broadcast_object_list(shared, src=src)
+    return shared[0]
+
+
+def all_gather_rows(array: Optional[np.ndarray], device: torch.device, world_size: int) -> np.ndarray:
+    """
+    Concatenate per-rank arrays along the first axis, in rank order, on every rank.
+    
+    Ranks may hold different numbers of rows (or None if they have none); arrays are
+    padded to the largest count for the collective and trimmed afterwards.
+    
+    Args:
+        array (Optional[np.ndarray]): Local rows [N_rank, ...], or None.
+        device (torch.device): Device used for the collective.
+        world_size (int): Total number of processes.
+        
+    Returns:
+        np.ndarray: Rows of all ranks [sum(N_rank), ...].
+    """
+    if world_size <= 1:
+        return array
+    
+    # Exchange row counts, row shapes and dtypes so every rank can size the padded buffers
+    meta = None if array is None else (array.shape[0], array.shape[1:], array.dtype.str)
+    metas = [None] * world_size
+    dist.all_gather_object(metas, meta)
+    present = [m for m in metas if m is not None]
+    if not present:
+        raise ValueError("all_gather_rows called with no rows on any rank")
+    _, row_shape, dtype = present[0]
+    counts = [0 if m is None else m[0] for m in metas]
+    
+    if array is None:
+        array = np.zeros((0,) + tuple(row_shape), dtype=np.dtype(dtype))
+    tensor = torch.from_numpy(np.ascontiguousarray(array)).to(device)
+    
+    padded = tensor.new_zeros((max(counts),) + tuple(row_shape))
+    padded[:tensor.shape[0]] = tensor
+    gathered = [torch.zeros_like(padded) for _ in range(world_size)]
+    dist.all_gather(gathered, padded)
+    
+    return np.concatenate([g[:c].cpu().numpy() for g, c in zip(gathered, counts)], axis=0)
+
+
+def all_reduce_sum_array(array: np.ndarray, device: torch.device, world_size: int) -> np.ndarray:
+    """
+    Element-wise sum of an array over all ranks.
+    
+    Args:
+        array (np.ndarray): Local array.
+        device (torch.device): Device used for the collective.
+        world_size (int): Total number of processes.
+        
+    Returns:
+        np.ndarray: Summed array, identical on every rank.
+    """
+    if world_size <= 1:
+        return array
+    tensor = torch.from_numpy(np.ascontiguousarray(array)).to(device)
+    dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+    return tensor.cpu().numpy()
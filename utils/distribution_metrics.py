@@ -3,46 +3,76 @@ Distribution-level metrics for comparing image distributions.
 """
 import torch
 import torch.nn as nn
-import torch.nn.functional as F
 import numpy as np
-from torchvision import models
-from scipy.stats import entropy
-from scipy.spatial.distance import cdist
+
+from utils.metrics import extract_inception_outputs, get_inception_model
+
+
+def _metric_device(device):
+    if device is None:
+        return torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    return torch.device(device)
+
+
+def _as_tensor(features, device, dtype=torch.float32):
+    if isinstance(features, torch.Tensor):
+        return features.to(device=device, dtype=dtype)
+    return torch.as_tensor(np.asarray(features), dtype=dtype, device=device)
+
+
+def _squared_distances(x, y, x_sq, y_sq):
+    # ||x||^2 + ||y||^2 - 2 x.y, without materializing the N x M x D differences
+    return (x_sq.unsqueeze(1) + y_sq.unsqueeze(0) - 2 * (x @ y.T)).clamp_(min=0)
 
 
 class InceptionScore(nn.Module):
     """Inception Score calculator using pretrained InceptionV3."""
     def __init__(self, device='cpu'):
         super().__init__()
-        self.model = models.inception_v3(pretrained=True, transform_input=False).to(device)
-        self.model.fc = nn.Identity()  # Remove final FC layer
-        self.model.eval()
+        self.device = device
+        # Shared with the FID feature extractors
+        self.model = get_inception_model(device=device)
+    
+    @staticmethod
+    def predictions_from_logits(logits):
+        """Class probabilities from Inception logits.
         
+        Args:
+            logits: Logits of shape (N, num_classes), e.g. from extract_inception_outputs
+            
+        Returns:
+            np.ndarray: Predictions of shape (N, num_classes)
+        """
+        logits = np.asarray(logits, dtype=np.float64)
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+    
     @torch.no_grad()
-    def calculate_score(self, images, batch_size=50, splits=10):
-        """Calculate Inception Score.
+    def get_predictions(self, images, batch_size=50):
+        """Get class probabilities used by the Inception Score.
         
         Args:
             images: Tensor of images in range [0, 1]
             batch_size: Batch size for processing
+            
+        Returns:
+            np.ndarray: Predictions of shape (N, num_classes)
+        """
+        _, logits = extract_inception_outputs(images, batch_size=batch_size, device=self.device)
+        return self.predictions_from_logits(logits)
+    
+    @staticmethod
+    def score_from_predictions(preds, splits=10):
+        """Calculate Inception Score from predictions returned by get_predictions.
+        
+        Args:
+            preds: Predictions of shape (N, num_classes)
             splits: Number of splits for computing mean/std
             
         Returns:
             tuple: (mean_score, std_score)
         """
-        self.model.eval()
-        preds = []
-        
-        # Get predictions
-        for i in range(0, images.size(0), batch_size):
-            batch = images[i:i+batch_size]
-            if batch.size(-1) != 299:
-                batch = F.interpolate(batch, size=(299, 299), mode='bilinear', align_corners=False)
-            pred = F.softmax(self.model(batch), dim=1)
-            preds.append(pred.cpu().numpy())
-        
-        preds = np.concatenate(preds, axis=0)
-        
         # Split predictions and calculate scores
         scores = []
         for k in range(splits):
@@ -52,36 +82,216 @@ class InceptionScore(nn.Module):
             scores.append(np.exp(kl))
         
         return np.mean(scores), np.std(scores)
+    
+    @classmethod
+    def score_from_logits(cls, logits, splits=10):
+        """Calculate Inception Score from Inception logits.
+        
+        Args:
+            logits: Logits of shape (N, num_classes), e.g. from extract_inception_outputs
+            splits: Number of splits for computing mean/std
+            
+        Returns:
+            tuple: (mean_score, std_score)
+        """
+        return cls.score_from_predictions(cls.predictions_from_logits(logits), splits=splits)
+    
+    @torch.no_grad()
+    def calculate_score(self, images, batch_size=50, splits=10):
+        """Calculate Inception Score.
+        
+        Args:
+            images: Tensor of images in range [0, 1]
+            batch_size: Batch size for processing
+            splits: Number of splits for computing mean/std
+            
+        Returns:
+            tuple: (mean_score, std_score)
+        """
+        preds = self.get_predictions(images, batch_size=batch_size)
+        return self.score_from_predictions(preds, splits=splits)
 
 
-def calculate_kid(features1, features2, subset_size=1000):
+@torch.no_grad()
+def calculate_kid(features1, features2, num_subsets=100, subset_size=1000, seed=0, bags_per_batch=10, device=None):
     """Calculate Kernel Inception Distance.
     
+    Unbiased MMD^2 with the cubic polynomial kernel k(x, y) = (x.y / d + 1)^3, averaged over
+    random subsets (bags) drawn without replacement. Bags hold at most half of the smaller
+    set, so they differ from each other even when subset_size exceeds the number of samples
+    and the std reflects the variation between subsets. The kernel matrices of several bags
+    are computed as one batched matmul on the device.
+    
+    Args:
+        features1: Features from first distribution (numpy array or tensor)
+        features2: Features from second distribution (numpy array or tensor)
+        num_subsets: Number of subsets
+        subset_size: Size of each subset (capped at half the smaller number of samples)
+        seed: Seed of the subset selection
+        bags_per_batch: Subsets whose kernel matrices are computed together
+        device: Device of the computation; defaults to CUDA if available
+        
+    Returns:
+        tuple: (mean_score, std_score)
+    """
+    device = _metric_device(device)
+    x = _as_tensor(features1, device)
+    y = _as_tensor(features2, device)
+    dim = x.shape[1]
+    m = min(len(x) // 2, len(y) // 2, subset_size)
+    if m < 2:
+        raise ValueError("KID needs at least 4 samples per distribution")
+    
+    generator = torch.Generator()
+    generator.manual_seed(seed)
+    
+    def kernel(a, b):
+        return (torch.bmm(a, b.transpose(1, 2)) / dim + 1) ** 3
+    
+    scores = []
+    for start in range(0, num_subsets, bags_per_batch):
+        bags = min(bags_per_batch, num_subsets - start)
+        idx1 = torch.stack([torch.randperm(len(x), generator=generator)[:m] for _ in range(bags)]).to(device)
+        idx2 = torch.stack([torch.randperm(len(y), generator=generator)[:m] for _ in range(bags)]).to(device)
+        xs, ys = x[idx1], y[idx2]
+        
+        k_xx = kernel(xs, xs).double()
+        k_yy = kernel(ys, ys).double()
+        k_xy = kernel(xs, ys).double()
+        
+        sum_xx = k_xx.sum(dim=(1, 2)) - k_xx.diagonal(dim1=1, dim2=2).sum(dim=1)
+        sum_yy = k_yy.sum(dim=(1, 2)) - k_yy.diagonal(dim1=1, dim2=2).sum(dim=1)
+        mmd = (sum_xx + sum_yy) / (m * (m - 1)) - 2 * k_xy.mean(dim=(1, 2))
+        scores.append(mmd.cpu())
+    
+    scores = torch.cat(scores).numpy()
+    return float(np.mean(scores)), float(np.std(scores))
+
+
+def _kth_neighbor_distances(features, k, block_size):
+    """Squared distance of each sample to its k-th nearest neighbor in the same set.
+    
+    Rows are processed in blocks against column tiles, keeping a running top-(k+1) of the
+    smallest distances (the sample itself is the first), so no row is ever fully sorted.
+    """
+    sq = (features * features).sum(dim=1)
+    radii = torch.empty(len(features), device=features.device)
+    for i in range(0, len(features), block_size):
+        best = None
+        for j in range(0, len(features), block_size):
+            dist = _squared_distances(features[i:i + block_size], features[j:j + block_size],
+                                      sq[i:i + block_size], sq[j:j + block_size])
+            if best is not None:
+                dist = torch.cat([best, dist], dim=1)
+            best = torch.topk(dist, min(k + 1, dist.shape[1]), dim=1, largest=False).values
+        radii[i:i + block_size] = best[:, k]
+    return radii
+
+
+def _neighbor_balls(queries, references, radii, block_size):
+    """Test queries against the k-NN balls of the reference samples.
+    
+    A ball is open, as in the reference implementation: a query at exactly the radius, or a
+    duplicate of a reference sample whose radius is 0, is outside.
+    
+    Returns:
+        tuple: (counts, nearest) - number of reference balls containing each query, and the
+            squared distance of each reference sample to its nearest query
+    """
+    query_sq = (queries * queries).sum(dim=1)
+    reference_sq = (references * references).sum(dim=1)
+    counts = torch.zeros(len(queries), dtype=torch.long, device=queries.device)
+    nearest = torch.full((len(references),), float('inf'), device=queries.device)
+    for i in range(0, len(queries), block_size):
+        for j in range(0, len(references), block_size):
+            dist = _squared_distances(queries[i:i + block_size], references[j:j + block_size],
+                                      query_sq[i:i + block_size], reference_sq[j:j + block_size])
+            counts[i:i + block_size] += (dist < radii[j:j + block_size].unsqueeze(0)).sum(dim=1)
+            nearest[j:j + block_size] = torch.minimum(nearest[j:j + block_size], dist.min(dim=0).values)
+    return counts, nearest
+
+
+def _subsample(features, num_samples, generator):
+    if len(features) <= num_samples:
+        return features
+    return features[torch.randperm(len(features), generator=generator)[:num_samples]]
+
+
+@torch.no_grad()
+def calculate_prdc(
+    real_features,
+    fake_features,
+    k=3,
+    num_samples=10000,
+    seed=0,
+    block_size=2048,
+    approximate=False,
+    projection_dim=256,
+    device=None
+):
+    """Calculate precision, recall, density and coverage of a fake distribution.
+    
+    All four metrics come from the same k-NN structure: the radius of each sample's ball is
+    the distance to its k-th nearest neighbor within its own set. Precision is the fraction
+    of fake samples inside some real ball, recall the fraction of real samples inside some
+    fake ball, density the average number of real balls containing a fake sample divided by
+    k, and coverage the fraction of real balls containing at least one fake sample.
+    Distances are computed in tiles on the device and neighbors found with torch.topk.
+    
+    With approximate=True, features are first mapped to projection_dim dimensions by a
+    seeded Gaussian random projection, which approximately preserves distances and makes
+    the k-NN search several times cheaper for 50k+ samples.
+    
     Args:
-        features1: Features from first distribution
-        features2: Features from second distribution
-        subset_size: Size of subset to use for estimation
+        real_features: Features from real distribution (numpy array or tensor)
+        fake_features: Features from fake distribution (numpy array or tensor)
+        k: Number of nearest neighbors
+        num_samples: Number of samples to use from each set
+        seed: Seed of the subsampling and the random projection
+        block_size: Rows and columns of the distance tiles
+        approximate: Use a random projection of the features
+        projection_dim: Dimension of the random projection
+        device: Device of the computation; defaults to CUDA if available
         
     Returns:
-        float: KID score
+        dict: precision, recall, density and coverage
     """
-    # Select random subsets
-    m = min(features1.shape[0], features2.shape[0], subset_size)
-    idx1 = np.random.choice(features1.shape[0], m, replace=False)
-    idx2 = np.random.choice(features2.shape[0], m, replace=False)
+    device = _metric_device(device)
+    generator = torch.Generator()
+    generator.manual_seed(seed)
     
-    x = features1[idx1]
-    y = features2[idx2]
+    real = _subsample(_as_tensor(real_features, 'cpu'), num_samples, generator)
+    fake = _subsample(_as_tensor(fake_features, 'cpu'), num_samples, generator)
+    if min(len(real), len(fake)) <= k:
+        raise ValueError(f"Precision/recall with k={k} needs more than {k} samples per distribution")
     
-    # Kernel MMD
-    xx = np.dot(x, x.T)
-    yy = np.dot(y, y.T)
-    xy = np.dot(x, y.T)
+    real = real.to(device=device, dtype=torch.float64)
+    fake = fake.to(device=device, dtype=torch.float64)
+    # Distances are translation invariant; centering reduces cancellation in float32
+    center = torch.cat([real, fake]).mean(dim=0)
+    real = (real - center).float()
+    fake = (fake - center).float()
+    if approximate and projection_dim < real.shape[1]:
+        projection = torch.randn(real.shape[1], projection_dim, generator=generator) / projection_dim ** 0.5
+        projection = projection.to(device)
+        real = real @ projection
+        fake = fake @ projection
     
-    return np.mean(xx) + np.mean(yy) - 2 * np.mean(xy)
+    real_radii = _kth_neighbor_distances(real, k, block_size)
+    fake_radii = _kth_neighbor_distances(fake, k, block_size)
+    
+    fake_counts, real_nearest = _neighbor_balls(fake, real, real_radii, block_size)
+    real_counts, _ = _neighbor_balls(real, fake, fake_radii, block_size)
+    
+    return {
+        'precision': (fake_counts > 0).double().mean().item(),
+        'recall': (real_counts > 0).double().mean().item(),
+        'density': fake_counts.double().sum().item() / (k * len(fake)),
+        'coverage': (real_nearest < real_radii).double().mean().item(),
+    }
 
 
-def calculate_precision_recall(real_features, fake_features, k=3, num_samples=10000):
+def calculate_precision_recall(real_features, fake_features, k=3, num_samples=10000, **kwargs):
     """Calculate precision and recall scores for distributions.
     
     Args:
@@ -89,81 +299,185 @@ def calculate_precision_recall(real_features, fake_features, k=3, num_samples=10
         fake_features: Features from fake distribution
         k: Number of nearest neighbors
         num_samples: Number of samples to use
+        **kwargs: Further arguments of calculate_prdc
         
     Returns:
         tuple: (precision, recall)
     """
-    def manifold_estimate(features, neighbor_features, k):
-        # Compute pairwise distances
-        distances = cdist(features, neighbor_features, metric='euclidean')
-        radii = np.sort(distances, axis=1)[:, k]
-        return radii
-    
-    # Subsample if needed
-    if len(real_features) > num_samples:
-        real_idx = np.random.choice(len(real_features), num_samples, replace=False)
-        real_features = real_features[real_idx]
-    if len(fake_features) > num_samples:
-        fake_idx = np.random.choice(len(fake_features), num_samples, replace=False)
-        fake_features = fake_features[fake_idx]
-    
-    real_manifold = manifold_estimate(real_features, real_features, k)
-    fake_manifold = manifold_estimate(fake_features, fake_features, k)
-    
-    precision = np.mean(manifold_estimate(fake_features, real_features, k-1) <= real_manifold)
-    recall = np.mean(manifold_estimate(real_features, fake_features, k-1) <= fake_manifold)
+    metrics = calculate_prdc(real_features, fake_features, k=k, num_samples=num_samples, **kwargs)
+    return metrics['precision'], metrics['recall']
+
+
+_PROJECTION_BANKS = {}
+
+
+def get_projection_bank(dim, num_projections=1000, seed=0, device=None):
+    """Fixed bank of random unit projection directions, built once per process.
     
-    return precision, recall
+    Args:
+        dim: Feature dimension
+        num_projections: Number of directions
+        seed: Seed of the directions
+        device: Device to keep the bank on
+        
+    Returns:
+        torch.Tensor: Directions of shape (dim, num_projections)
+    """
+    device = _metric_device(device)
+    key = (dim, num_projections, seed, str(device))
+    if key not in _PROJECTION_BANKS:
+        generator = torch.Generator()
+        generator.manual_seed(seed)
+        projections = torch.randn(num_projections, dim, generator=generator, dtype=torch.float64)
+        projections = projections / projections.norm(dim=1, keepdim=True)
+        _PROJECTION_BANKS[key] = projections.T.float().contiguous().to(device)
+    return _PROJECTION_BANKS[key]
 
 
-def calculate_wasserstein(features1, features2, num_projections=1000):
-    """Calculate approximate Wasserstein distance using random projections.
+def _quantile_grid(n, m, device):
+    # The quantile functions of n and m samples are step functions; between consecutive
+    # breakpoints of either one both are constant, so W1 is exact on the merged grid
+    levels = torch.cat([torch.arange(1, n + 1, dtype=torch.float64) / n,
+                        torch.arange(1, m + 1, dtype=torch.float64) / m])
+    levels = torch.unique(levels)
+    widths = torch.diff(levels, prepend=levels.new_zeros(1))
+    midpoints = levels - widths / 2
+    idx1 = (midpoints * n).long().clamp_(max=n - 1)
+    idx2 = (midpoints * m).long().clamp_(max=m - 1)
+    return idx1.to(device), idx2.to(device), widths.to(device)
+
+
+@torch.no_grad()
+def calculate_wasserstein(features1, features2, num_projections=1000, seed=0, chunk_size=128, device=None):
+    """Calculate sliced Wasserstein-1 distance using random projections.
+    
+    Both feature sets are projected onto the directions of a fixed, seeded projection bank
+    (shared by all calls with the same settings, so scores of different cases are
+    comparable), a chunk of directions at a time, and sorted on the device. Different sample
+    counts are handled by integrating the difference of the two quantile functions.
     
     Args:
-        features1: Features from first distribution
-        features2: Features from second distribution
+        features1: Features from first distribution (numpy array or tensor)
+        features2: Features from second distribution (numpy array or tensor)
         num_projections: Number of random projections
+        seed: Seed of the projection bank
+        chunk_size: Projections processed at a time
+        device: Device of the computation; defaults to CUDA if available
         
     Returns:
         float: Approximate Wasserstein distance
     """
-    dim = features1.shape[1]
+    device = _metric_device(device)
+    x = _as_tensor(features1, device)
+    y = _as_tensor(features2, device)
+    n, m = len(x), len(y)
+    projections = get_projection_bank(x.shape[1], num_projections, seed=seed, device=device)
+    if n != m:
+        idx1, idx2, widths = _quantile_grid(n, m, device)
     
-    # Generate random projections
-    projections = np.random.normal(size=(num_projections, dim))
-    projections = projections / np.sqrt(np.sum(projections ** 2, axis=1, keepdims=True))
+    total = torch.zeros((), dtype=torch.float64, device=device)
+    for start in range(0, num_projections, chunk_size):
+        chunk = projections[:, start:start + chunk_size]
+        proj1 = torch.sort(x @ chunk, dim=0).values
+        proj2 = torch.sort(y @ chunk, dim=0).values
+        if n == m:
+            total += (proj1 - proj2).abs().sum(dtype=torch.float64) / n
+        else:
+            diff = (proj1[idx1] - proj2[idx2]).abs().double()
+            total += (diff * widths.unsqueeze(1)).sum()
     
-    # Project features
-    proj1 = np.dot(features1, projections.T)
-    proj2 = np.dot(features2, projections.T)
-    
-    # Sort projections
-    proj1 = np.sort(proj1, axis=0)
-    proj2 = np.sort(proj2, axis=0)
+    return float(total / num_projections)
+
+
+def _gaussian_kernel_sums(x, y, gammas, block_size, symmetric=False):
+    """Sums of exp(-gamma * ||x_i - y_j||^2) over all pairs, for each gamma, computed in tiles.
     
-    # Calculate Wasserstein-1
-    return np.mean(np.abs(proj1 - proj2))
+    Args:
+        x, y: Feature tensors of shape (N, D) and (M, D)
+        gammas: Tensor of kernel coefficients 1 / (2 * sigma^2)
+        block_size: Rows and columns per tile
+        symmetric: x and y are the same set; only tiles on and above the diagonal are
+            computed, and the diagonal distances are exactly 0
+        
+    Returns:
+        torch.Tensor: float64 kernel sums, one per gamma
+    """
+    x_sq = (x * x).sum(dim=1)
+    y_sq = (y * y).sum(dim=1)
+    sums = torch.zeros(len(gammas), dtype=torch.float64, device=x.device)
+    for i in range(0, len(x), block_size):
+        for j in range(i if symmetric else 0, len(y), block_size):
+            dist = _squared_distances(x[i:i + block_size], y[j:j + block_size],
+                                      x_sq[i:i + block_size], y_sq[j:j + block_size])
+            weight = 1
+            if symmetric:
+                if i == j:
+                    dist.fill_diagonal_(0)
+                else:
+                    weight = 2
+            kernel = torch.exp(-gammas.view(-1, 1, 1) * dist.unsqueeze(0))
+            sums += weight * kernel.sum(dim=(1, 2), dtype=torch.float64)
+    return sums
+
+
+def _gaussian_kernel_pairs(a, b, gammas):
+    dist = ((a - b) ** 2).sum(dim=1)
+    return torch.exp(-gammas.view(-1, 1) * dist.unsqueeze(0)).to(torch.float64)
 
 
-def calculate_mmd(features1, features2, sigma=1.0):
+@torch.no_grad()
+def calculate_mmd(features1, features2, sigma=1.0, estimator='biased', block_size=1024, device=None):
     """Calculate Maximum Mean Discrepancy with Gaussian kernel.
     
+    Kernel matrices are never materialized: squared distances are computed tile by tile
+    from inner products and the kernel sums are accumulated per tile, for all bandwidths
+    in the same pass. Estimators:
+    
+        biased     V-statistic over all pairs (including i == j)
+        unbiased   U-statistic excluding the i == j terms of the within-set sums
+        linear     linear-time estimate from disjoint sample pairs, for large N
+    
     Args:
-        features1: Features from first distribution (numpy array)
-        features2: Features from second distribution (numpy array)
-        sigma: Kernel bandwidth
+        features1: Features from first distribution (numpy array or tensor)
+        features2: Features from second distribution (numpy array or tensor)
+        sigma: Kernel bandwidth, or a sequence of bandwidths
+        estimator: 'biased', 'unbiased' or 'linear'
+        block_size: Rows and columns of the distance tiles
+        device: Device of the computation; defaults to CUDA if available
         
     Returns:
-        float: MMD score
+        float: MMD score, or np.ndarray of one score per bandwidth if sigma is a sequence
     """
-    def gaussian_kernel(x, y, sigma):
-        x = torch.from_numpy(x)
-        y = torch.from_numpy(y)
-        dist = torch.sum((x.unsqueeze(1) - y.unsqueeze(0)) ** 2, dim=-1)
-        return torch.exp(-dist / (2 * sigma ** 2))
+    if estimator not in ('biased', 'unbiased', 'linear'):
+        raise ValueError(f"Unknown MMD estimator: {estimator}")
+    device = _metric_device(device)
+    sigmas = np.atleast_1d(np.asarray(sigma, dtype=np.float64))
+    gammas = torch.as_tensor(1.0 / (2.0 * sigmas ** 2), dtype=torch.float32, device=device)
+    
+    x = _as_tensor(features1, device, dtype=torch.float64)
+    y = _as_tensor(features2, device, dtype=torch.float64)
+    # Distances are translation invariant; centering reduces cancellation in float32
+    center = torch.cat([x, y]).mean(dim=0)
+    x = (x - center).float()
+    y = (y - center).float()
+    n, m = len(x), len(y)
     
-    xx = gaussian_kernel(features1, features1, sigma)
-    yy = gaussian_kernel(features2, features2, sigma)
-    xy = gaussian_kernel(features1, features2, sigma)
+    if estimator == 'linear':
+        pairs = min(n, m) // 2
+        x1, x2 = x[0:2 * pairs:2], x[1:2 * pairs:2]
+        y1, y2 = y[0:2 * pairs:2], y[1:2 * pairs:2]
+        h = (_gaussian_kernel_pairs(x1, x2, gammas) + _gaussian_kernel_pairs(y1, y2, gammas)
+             - _gaussian_kernel_pairs(x1, y2, gammas) - _gaussian_kernel_pairs(x2, y1, gammas))
+        mmd = h.mean(dim=1)
+    else:
+        xx = _gaussian_kernel_sums(x, x, gammas, block_size, symmetric=True)
+        yy = _gaussian_kernel_sums(y, y, gammas, block_size, symmetric=True)
+        xy = _gaussian_kernel_sums(x, y, gammas, block_size)
+        if estimator == 'biased':
+            mmd = xx / (n * n) + yy / (m * m) - 2 * xy / (n * m)
+        else:
+            # The diagonal kernel values are exactly 1
+            mmd = (xx - n) / (n * (n - 1)) + (yy - m) / (m * (m - 1)) - 2 * xy / (n * m)
     
-    return float(torch.mean(xx) + torch.mean(yy) - 2 * torch.mean(xy)) 
\ No newline at end of file
+    mmd = mmd.cpu().numpy()
+    return float(mmd[0]) if np.ndim(sigma) == 0 else mmd
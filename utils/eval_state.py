@@ -0,0 +1,245 @@
+"""
+Persistent state of an evaluation run, so that a preempted evaluation can be resumed.
+
+The state of a run lives in a subdirectory named after a fingerprint of the settings that
+determine its results, so changing those settings never resumes from stale state:
+
+    <root>/<fingerprint>/
+        settings.json                 the fingerprinted settings, for reference
+        original.npz                  gathered original-model results (written by rank 0)
+        cases/<case>.npz              metrics of each completed negative case (written by rank 0)
+        partial/<group>.rank<r>.npz   per-rank results of a case interrupted between batches
+
+All files are written atomically, so an interrupted write leaves the previous state intact.
+"""
+import hashlib
+import json
+import logging
+import os
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+ORIGINAL_FILENAME = "original.npz"
+SETTINGS_FILENAME = "settings.json"
+CASES_DIRNAME = "cases"
+PARTIAL_DIRNAME = "partial"
+
+# Bumped when the recorded quantities change meaning, so older state is never resumed
+STATE_FORMAT_VERSION = 9
+
+
+def evaluation_fingerprint(config) -> Tuple[str, Dict[str, Any]]:
+    """
+    Fingerprint of the settings that determine evaluation results.
+
+    Args:
+        config (Config): Configuration object.
+
+    Returns:
+        tuple: (fingerprint, settings) - hex digest and the fingerprinted settings.
+    """
+    checkpoint_path = config.checkpoint_path
+    checkpoint_stat = None
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        stat = os.stat(checkpoint_path)
+        checkpoint_stat = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    settings = {
+        'state_format_version': STATE_FORMAT_VERSION,
+        'model': asdict(config.model),
+        'checkpoint_path': os.path.abspath(checkpoint_path) if checkpoint_path else None,
+        'checkpoint_stat': checkpoint_stat,
+        'num_samples': config.evaluate.num_samples,
+        'batch_size': config.evaluate.batch_size,
+        'seed': config.evaluate.seed,
+        'fast_inception': config.evaluate.fast_inception,
+    }
+    settings = json.loads(json.dumps(settings, sort_keys=True, default=str))
+    fingerprint = hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    return fingerprint, settings
+
+
+def _save_npz_atomic(path: str, arrays: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}.npz"
+    np.savez(tmp_path, **{name: np.asarray(value) for name, value in arrays.items()})
+    os.replace(tmp_path, path)
+
+
+def _load_npz(path: str) -> Optional[Dict[str, np.ndarray]]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable evaluation state file {path}: {str(e)}")
+        return None
+
+
+class EvaluationState:
+    """
+    Evaluation state directory of one run.
+
+    Results shared by all ranks (the original-model record and completed cases) are
+    written by rank 0 only; each rank writes its own partial results, since every rank
+    generates a different block of batches.
+    """
+    def __init__(
+        self,
+        root: str,
+        fingerprint: str,
+        settings: Dict[str, Any],
+        rank: int = 0,
+        world_size: int = 1,
+        save_every: int = 0
+    ):
+        """
+        Open (or create) the state directory of a run.
+
+        Args:
+            root (str): Evaluation state root directory.
+            fingerprint (str): Fingerprint of the evaluation settings.
+            settings (Dict[str, Any]): Fingerprinted settings.
+            rank (int): Global process rank.
+            world_size (int): Total number of processes.
+            save_every (int): Save partial results every this many batches (0 only saves completed cases).
+        """
+        self.path = os.path.join(root, fingerprint)
+        self.rank = rank
+        self.world_size = world_size
+        self.save_every = save_every
+
+        if self.rank == 0:
+            os.makedirs(self.path, exist_ok=True)
+            settings_path = os.path.join(self.path, SETTINGS_FILENAME)
+            if not os.path.exists(settings_path):
+                tmp_path = f"{settings_path}.tmp{os.getpid()}"
+                with open(tmp_path, 'w') as f:
+                    json.dump(settings, f, indent=2)
+                os.replace(tmp_path, settings_path)
+
+    def _case_path(self, key: str) -> str:
+        return os.path.join(self.path, CASES_DIRNAME, f"{key}.npz")
+
+    def _partial_path(self, group: str) -> str:
+        return os.path.join(self.path, PARTIAL_DIRNAME, f"{group}.rank{self.rank}.npz")
+
+    def has_original(self) -> bool:
+        """Whether the original-model record has been completed."""
+        return os.path.exists(os.path.join(self.path, ORIGINAL_FILENAME))
+
+    def load_original(self) -> Optional[Dict[str, np.ndarray]]:
+        """Load the saved original-model record, or None if it has not been completed."""
+        return _load_npz(os.path.join(self.path, ORIGINAL_FILENAME))
+
+    def save_original(self, arrays: Dict[str, np.ndarray]) -> None:
+        """Save the gathered original-model record."""
+        if self.rank == 0:
+            _save_npz_atomic(os.path.join(self.path, ORIGINAL_FILENAME), arrays)
+
+    def completed_cases(self) -> List[str]:
+        """Names of all completed negative cases."""
+        cases_dir = os.path.join(self.path, CASES_DIRNAME)
+        if not os.path.isdir(cases_dir):
+            return []
+        return sorted(name[:-len(".npz")] for name in os.listdir(cases_dir) if name.endswith(".npz"))
+
+    def load_case(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Load the metrics of a completed negative case.
+
+        Args:
+            key (str): Name of the negative case.
+
+        Returns:
+            Optional[Dict[str, Any]]: Metrics with scalars as Python numbers, or None if not completed.
+        """
+        arrays = _load_npz(self._case_path(key))
+        if arrays is None:
+            return None
+        return {name: value.item() if value.ndim == 0 else value for name, value in arrays.items()}
+
+    def save_case(self, key: str, result: Dict[str, Any]) -> None:
+        """Save the metrics of a completed negative case."""
+        if self.rank == 0:
+            _save_npz_atomic(self._case_path(key), result)
+
+    def should_save_partial(self, batches_done: int) -> bool:
+        """Whether partial results are due after this rank has generated batches_done batches."""
+        return self.save_every > 0 and batches_done % self.save_every == 0
+
+    def load_partial(self, group: str, batch_range: Tuple[int, int]) -> Optional[Tuple[int, Dict[str, np.ndarray]]]:
+        """
+        Load this rank's partial results of an interrupted case.
+
+        Partial results are only reused when the rank owns the same block of batches as
+        in the interrupted run.
+
+        Args:
+            group (str): Name of the case (or group of cases sharing generations).
+            batch_range (Tuple[int, int]): Batches owned by this rank.
+
+        Returns:
+            Optional[tuple]: (next_batch, arrays) - first batch still to generate and the saved
+                results, or None.
+        """
+        arrays = _load_npz(self._partial_path(group))
+        if arrays is None:
+            return None
+        saved_range = tuple(int(i) for i in arrays.pop('batch_range'))
+        next_batch = int(arrays.pop('next_batch'))
+        if saved_range != tuple(batch_range) or int(arrays.pop('world_size')) != self.world_size:
+            return None
+        return next_batch, arrays
+
+    def save_partial(self, group: str, batch_range: Tuple[int, int], next_batch: int, arrays: Dict[str, np.ndarray]) -> None:
+        """
+        Save this rank's partial results of a case.
+
+        Args:
+            group (str): Name of the case (or group of cases sharing generations).
+            batch_range (Tuple[int, int]): Batches owned by this rank.
+            next_batch (int): First batch still to generate.
+            arrays (Dict[str, np.ndarray]): Results so far.
+        """
+        state = dict(arrays)
+        state['batch_range'] = np.asarray(batch_range, dtype=np.int64)
+        state['next_batch'] = next_batch
+        state['world_size'] = self.world_size
+        _save_npz_atomic(self._partial_path(group), state)
+
+    def clear_partial(self, group: str) -> None:
+        """Remove this rank's partial results of a case once it is complete."""
+        path = self._partial_path(group)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def create_eval_state(
+    root: Optional[str],
+    config,
+    rank: int = 0,
+    world_size: int = 1,
+    save_every: int = 0
+) -> Optional[EvaluationState]:
+    """
+    Open the evaluation state of a run, or return None if no directory is configured.
+
+    Args:
+        root (Optional[str]): Evaluation state root directory; None or "" disables resuming.
+        config (Config): Configuration object, used to fingerprint the run.
+        rank (int): Global process rank.
+        world_size (int): Total number of processes.
+        save_every (int): Save partial results every this many batches (0 only saves completed cases).
+
+    Returns:
+        Optional[EvaluationState]: The evaluation state, or None.
+    """
+    if not root:
+        return None
+    fingerprint, settings = evaluation_fingerprint(config)
+    return EvaluationState(root, fingerprint, settings, rank=rank, world_size=world_size, save_every=save_every)
@@ -0,0 +1,306 @@
+"""
+Content-addressed on-disk corpus of generated images.
+
+Every image is keyed by a hash of what determines it - model id, prompt, seed, number of
+inference steps, guidance scale and image size - so evaluation, FID computation and the
+visualization scripts can share generations instead of sampling the same images again.
+
+Images are stored as uint8 in npz shards, one archive member per image so that a lookup
+only reads the images it needs. Each shard has a JSON index listing its keys, and the corpus
+index is the union of the shard indexes, so several processes (e.g. DDP ranks) can add
+shards to the same directory without coordinating.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import uuid
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+
+SHARD_PREFIX = "shard_"
+
+
+def make_key(
+    model_id: str,
+    prompt: Optional[str],
+    seed: int,
+    num_inference_steps: Optional[int] = None,
+    guidance_scale: Optional[float] = None,
+    img_size: Optional[int] = None
+) -> str:
+    """
+    Build the content key of one generated image.
+
+    Args:
+        model_id (str): Identifier of the generating model (including any quantization/pruning).
+        prompt (Optional[str]): Text prompt, None for unconditional models.
+        seed (int): Per-sample seed.
+        num_inference_steps (Optional[int]): Number of denoising steps.
+        guidance_scale (Optional[float]): Classifier-free guidance scale.
+        img_size (Optional[int]): Output image size.
+
+    Returns:
+        str: Hex digest identifying the image.
+    """
+    fields = {
+        'model_id': model_id,
+        'prompt': prompt,
+        'seed': int(seed),
+        'num_inference_steps': num_inference_steps,
+        'guidance_scale': guidance_scale,
+        'img_size': img_size,
+    }
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ImageCorpus:
+    """
+    On-disk store of generated images keyed by make_key().
+
+    Images are written as uint8, mapping value_range linearly onto [0, 255]. This is lossless
+    for Stable Diffusion output, which is decoded from 8-bit images in [0, 1].
+    """
+    def __init__(
+        self,
+        root: str,
+        shard_size: int = 64,
+        value_range: Tuple[float, float] = (0.0, 1.0)
+    ):
+        """
+        Open (or create) a corpus directory.
+
+        Args:
+            root (str): Corpus directory.
+            shard_size (int): Number of images buffered before a shard is written.
+            value_range (Tuple[float, float]): Range of the float images passed to put() and
+                returned by get().
+        """
+        self.root = root
+        self.shard_size = shard_size
+        self.value_range = value_range
+        os.makedirs(root, exist_ok=True)
+
+        # key -> shard file name
+        self.index: Dict[str, str] = {}
+        self.refresh()
+
+        # Images added since the last flush, key -> [H, W, C] uint8
+        self._pending: Dict[str, np.ndarray] = {}
+
+        # Open shard archives; members are only read on access
+        self._open_shards: Dict[str, np.lib.npyio.NpzFile] = {}
+
+    def refresh(self) -> None:
+        """Re-read the shard indexes, picking up shards written by other processes."""
+        for index_path in sorted(glob.glob(os.path.join(self.root, f"{SHARD_PREFIX}*.json"))):
+            try:
+                with open(index_path, 'r') as f:
+                    shard_index = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Skipping unreadable image corpus index {index_path}: {str(e)}")
+                continue
+            for key in shard_index['keys']:
+                self.index.setdefault(key, shard_index['shard'])
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index or key in self._pending
+
+    def __len__(self) -> int:
+        return len(self.index) + len(self._pending)
+
+    def _to_uint8(self, images: torch.Tensor) -> np.ndarray:
+        low, high = self.value_range
+        images = (images.detach().float().cpu() - low) / (high - low)
+        images = (images.clamp(0, 1) * 255).round().to(torch.uint8)
+        return images.permute(0, 2, 3, 1).numpy()  # [B, H, W, C]
+
+    def _from_uint8(self, images: np.ndarray, device: Optional[torch.device]) -> torch.Tensor:
+        low, high = self.value_range
+        images = torch.from_numpy(np.ascontiguousarray(images)).to(device).permute(0, 3, 1, 2)
+        return images.float() / 255.0 * (high - low) + low
+
+    def _read(self, key: str) -> np.ndarray:
+        if key in self._pending:
+            return self._pending[key]
+
+        shard = self.index[key]
+        if shard not in self._open_shards:
+            self._open_shards[shard] = np.load(os.path.join(self.root, shard))
+        return self._open_shards[shard][key]
+
+    def get(self, keys: Sequence[str], device: Optional[torch.device] = None) -> Optional[torch.Tensor]:
+        """
+        Read images from the corpus.
+
+        Args:
+            keys (Sequence[str]): Image keys.
+            device (Optional[torch.device]): Device of the returned tensor.
+
+        Returns:
+            Optional[torch.Tensor]: Images [B, C, H, W] in value_range, or None unless all keys are present.
+        """
+        if not all(key in self for key in keys):
+            return None
+        images = [self._read(key) for key in keys]
+        return self._from_uint8(np.stack(images, axis=0), device)
+
+    def put(self, keys: Sequence[str], images: torch.Tensor) -> None:
+        """
+        Add images to the corpus. Keys that are already present are skipped.
+
+        Args:
+            keys (Sequence[str]): Image keys.
+            images (torch.Tensor): Images [B, C, H, W] in value_range.
+        """
+        images = self._to_uint8(images)
+        for key, image in zip(keys, images):
+            if key not in self:
+                self._pending[key] = image
+        if len(self._pending) >= self.shard_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered images as a new shard."""
+        if not self._pending:
+            return
+
+        shard = f"{SHARD_PREFIX}{uuid.uuid4().hex}.npz"
+        shard_path = os.path.join(self.root, shard)
+        tmp_path = f"{shard_path}.tmp{os.getpid()}.npz"
+        np.savez(tmp_path, **self._pending)
+        os.replace(tmp_path, shard_path)
+
+        # The index is written last; its presence marks a complete shard
+        index_path = os.path.join(self.root, shard.replace('.npz', '.json'))
+        tmp_index_path = f"{index_path}.tmp{os.getpid()}"
+        with open(tmp_index_path, 'w') as f:
+            json.dump({'shard': shard, 'keys': list(self._pending.keys())}, f)
+        os.replace(tmp_index_path, index_path)
+
+        for key in self._pending:
+            self.index[key] = shard
+        self._pending = {}
+
+    def close(self) -> None:
+        """Flush buffered images and close open shards."""
+        self.flush()
+        for data in self._open_shards.values():
+            data.close()
+        self._open_shards = {}
+
+
+def create_image_corpus(root: Optional[str], **kwargs) -> Optional[ImageCorpus]:
+    """
+    Open an image corpus, or return None if no directory is configured.
+
+    Args:
+        root (Optional[str]): Corpus directory; None or "" disables the corpus.
+        **kwargs: Additional ImageCorpus arguments.
+
+    Returns:
+        Optional[ImageCorpus]: The corpus, or None.
+    """
+    if not root:
+        return None
+    return ImageCorpus(root, **kwargs)
+
+
+def corpus_model_id(model) -> str:
+    """
+    Default corpus identifier of a generative model: its name plus, for diffusion
+    pipelines, the dtype it runs in (outputs differ between dtypes).
+
+    Args:
+        model (BaseGenerativeModel): Generative model.
+
+    Returns:
+        str: Model identifier.
+    """
+    model_id = model.get_model_name()
+    pipe = getattr(model, 'pipe', None)
+    if pipe is not None:
+        model_id += f":{str(pipe.dtype).replace('torch.', '')}"
+    return model_id
+
+
+def generate_with_corpus(
+    model,
+    seeds: Sequence[int],
+    corpus: Optional[ImageCorpus] = None,
+    device: Optional[torch.device] = None,
+    model_id: Optional[str] = None,
+    **gen_kwargs
+) -> torch.Tensor:
+    """
+    Generate one image per seed, reading images from the corpus when present and writing
+    newly generated ones to it.
+
+    Missing images are generated in one batch with per-sample seeds, so an image only
+    depends on its own key and not on which other images were missing.
+
+    Args:
+        model (BaseGenerativeModel): Model to generate with.
+        seeds (Sequence[int]): Per-sample seeds.
+        corpus (Optional[ImageCorpus]): Corpus to read from and write to.
+        device (Optional[torch.device]): Device of the returned images.
+        model_id (Optional[str]): Corpus identifier of the model; defaults to corpus_model_id(model).
+            Models whose weights were modified (quantized, pruned) need their own identifier.
+        **gen_kwargs: Generation kwargs (prompt, num_inference_steps, guidance_scale, ...).
+
+    Returns:
+        torch.Tensor: Generated images [B, C, H, W].
+    """
+    batch_size = len(seeds)
+    model_id = model_id or corpus_model_id(model)
+    prompts = gen_kwargs.get('prompt')
+    if prompts is None or isinstance(prompts, str):
+        prompts = [prompts] * batch_size
+    else:
+        prompts = (list(prompts) + [prompts[-1]] * (batch_size - len(prompts)))[:batch_size]
+
+    keys = [
+        make_key(
+            model_id,
+            prompt,
+            seed,
+            num_inference_steps=gen_kwargs.get('num_inference_steps'),
+            guidance_scale=gen_kwargs.get('guidance_scale'),
+            img_size=model.image_size
+        )
+        for prompt, seed in zip(prompts, seeds)
+    ]
+
+    if corpus is not None:
+        images = corpus.get(keys, device=device)
+        if images is not None:
+            return images
+
+    device = device or getattr(model, '_device', None)
+    missing = [i for i, key in enumerate(keys) if corpus is None or key not in corpus]
+
+    # Generate all missing images in one seeded batch
+    generated = None
+    if missing:
+        sample_kwargs = dict(gen_kwargs)
+        if prompts[0] is not None:
+            sample_kwargs['prompt'] = [prompts[i] for i in missing]
+        generated = model.generate_images(
+            batch_size=len(missing),
+            device=device,
+            seeds=[seeds[i] for i in missing],
+            **sample_kwargs
+        )
+        if corpus is not None:
+            corpus.put([keys[i] for i in missing], generated)
+        if len(missing) == batch_size:
+            return generated
+
+    # Merge corpus hits and new generations in sample order
+    rows = {i: generated[j:j + 1] for j, i in enumerate(missing)}
+    images = [rows[i] if i in rows else corpus.get([keys[i]], device=device) for i in range(batch_size)]
+    return torch.cat([image.to(device) for image in images], dim=0)
@@ -6,8 +6,6 @@ import copy
 import logging
 import torch
 import torch.nn.functional as F
-from PIL import Image
-from torchvision import transforms
 
 
 def apply_truncation(model, z, truncation_psi=2.0, return_w=False):
@@ -197,6 +195,9 @@ def apply_jpeg_compression(images, quality=55):
     Returns:
         Compressed images tensor
     """
+    from PIL import Image
+    from torchvision import transforms
+    
     try:
         device = images.device
         compressed_batch = []
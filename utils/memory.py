@@ -0,0 +1,340 @@
+"""
+Memory instrumentation utilities shared by training, evaluation and attack entry points.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import torch
+
+try:
+    import psutil
+except ImportError:  # psutil is optional; host RSS sampling is skipped without it
+    psutil = None
+
+
+_MB = 1024 * 1024
+
+
+class HostMemorySampler:
+    """
+    Samples the resident set size of the current process on a background thread,
+    so that callers can read host memory figures without polling inline.
+    """
+    def __init__(self, interval: float = 5.0):
+        """
+        Initialize the sampler.
+
+        Args:
+            interval (float): Seconds between samples.
+        """
+        self.interval = interval
+        self._process = psutil.Process() if psutil is not None else None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._current_mb = 0.0
+        self._peak_mb = 0.0
+
+    @property
+    def available(self) -> bool:
+        """Whether host sampling is supported in this environment."""
+        return self._process is not None and self.interval > 0
+
+    def _sample(self) -> None:
+        rss_mb = self._process.memory_info().rss / _MB
+        with self._lock:
+            self._current_mb = rss_mb
+            self._peak_mb = max(self._peak_mb, rss_mb)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                self._sample()
+            except Exception as e:
+                logging.debug(f"Host memory sampling failed: {str(e)}")
+
+    def start(self) -> None:
+        """Start the background sampling thread."""
+        if not self.available or self._thread is not None:
+            return
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name="host-memory-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background sampling thread."""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=self.interval + 1.0)
+        self._thread = None
+
+    def current_mb(self) -> float:
+        """Most recently sampled RSS in MB."""
+        with self._lock:
+            return self._current_mb
+
+    def reset_peak(self) -> float:
+        """
+        Reset the peak RSS to the latest sample.
+
+        Returns:
+            float: The peak RSS in MB before the reset.
+        """
+        with self._lock:
+            peak = self._peak_mb
+            self._peak_mb = self._current_mb
+            return peak
+
+    def peak_mb(self) -> float:
+        """Peak sampled RSS in MB since the last reset."""
+        with self._lock:
+            return self._peak_mb
+
+
+class MemoryTracker:
+    """
+    Tracks per-stage peak GPU memory (allocated and reserved) and sampled host RSS.
+
+    Peak allocator statistics are reset when a stage is entered, so every stage reports
+    its own high-water mark. Stages may be nested and may be entered repeatedly (e.g. once
+    per iteration); repeated entries are aggregated into a single record holding the maximum.
+    If a CUDA out-of-memory error escapes a stage and a snapshot directory is configured,
+    a CUDA memory snapshot pickle is written before the error is re-raised.
+    """
+    def __init__(
+        self,
+        device: torch.device,
+        rank: int = 0,
+        enabled: bool = True,
+        host_sample_interval: float = 5.0,
+        snapshot_dir: Optional[str] = None,
+        snapshot_max_entries: int = 100000
+    ):
+        """
+        Initialize the tracker.
+
+        Args:
+            device (torch.device): Device whose allocator statistics are tracked.
+            rank (int): Process rank, used to name snapshot and summary files.
+            enabled (bool): If False, stages are no-ops.
+            host_sample_interval (float): Seconds between host RSS samples (0 disables sampling).
+            snapshot_dir (str, optional): Directory for CUDA memory snapshots dumped on OOM.
+            snapshot_max_entries (int): Number of allocator events kept in the snapshot history.
+        """
+        self.device = torch.device(device)
+        self.rank = rank
+        self.enabled = enabled
+        self.snapshot_dir = snapshot_dir
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self._stack: List[Dict[str, float]] = []
+        self._cuda = enabled and self.device.type == 'cuda' and torch.cuda.is_available()
+        self._recording_history = False
+
+        self.host_sampler = HostMemorySampler(host_sample_interval)
+        if self.enabled:
+            self.host_sampler.start()
+
+        if self._cuda and self.snapshot_dir:
+            try:
+                torch.cuda.memory._record_memory_history(max_entries=snapshot_max_entries)
+                self._recording_history = True
+            except Exception as e:
+                logging.warning(f"Could not enable CUDA memory history recording: {str(e)}")
+
+    def _device_peaks(self) -> Dict[str, float]:
+        if not self._cuda:
+            return {'allocated': 0.0, 'reserved': 0.0}
+        return {
+            'allocated': torch.cuda.max_memory_allocated(self.device) / _MB,
+            'reserved': torch.cuda.max_memory_reserved(self.device) / _MB
+        }
+
+    def _reset_device_peaks(self) -> None:
+        if self._cuda:
+            torch.cuda.reset_peak_memory_stats(self.device)
+
+    def _fold_into_parent(self, frame: Dict[str, float]) -> None:
+        if self._stack:
+            parent = self._stack[-1]
+            parent['allocated'] = max(parent['allocated'], frame['allocated'])
+            parent['reserved'] = max(parent['reserved'], frame['reserved'])
+            parent['host'] = max(parent['host'], frame['host'])
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Context manager measuring the peak memory of a pipeline stage.
+
+        Args:
+            name (str): Stage name. Repeated stages are aggregated.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        # Preserve the enclosing stage's peak before resetting the allocator counters
+        if self._stack:
+            peaks = self._device_peaks()
+            parent = self._stack[-1]
+            parent['allocated'] = max(parent['allocated'], peaks['allocated'])
+            parent['reserved'] = max(parent['reserved'], peaks['reserved'])
+            parent['host'] = max(parent['host'], self.host_sampler.peak_mb())
+
+        self._reset_device_peaks()
+        self.host_sampler.reset_peak()
+        frame = {'allocated': 0.0, 'reserved': 0.0, 'host': 0.0, 'start': time.time()}
+        self._stack.append(frame)
+
+        try:
+            yield
+        except torch.cuda.OutOfMemoryError as e:
+            # Only the innermost stage dumps a snapshot for a given error
+            if not getattr(e, '_memory_snapshot_dumped', False):
+                self.dump_snapshot(name)
+                e._memory_snapshot_dumped = True
+            raise
+        finally:
+            self._stack.pop()
+            peaks = self._device_peaks()
+            frame['allocated'] = max(frame['allocated'], peaks['allocated'])
+            frame['reserved'] = max(frame['reserved'], peaks['reserved'])
+            frame['host'] = max(frame['host'], self.host_sampler.peak_mb(), self.host_sampler.current_mb())
+            self._record(name, frame)
+            self._fold_into_parent(frame)
+
+    def _record(self, name: str, frame: Dict[str, float]) -> None:
+        record = self.stats.setdefault(name, {
+            'calls': 0,
+            'peak_allocated_mb': 0.0,
+            'peak_reserved_mb': 0.0,
+            'peak_host_rss_mb': 0.0,
+            'total_time_s': 0.0
+        })
+        record['calls'] += 1
+        record['peak_allocated_mb'] = max(record['peak_allocated_mb'], frame['allocated'])
+        record['peak_reserved_mb'] = max(record['peak_reserved_mb'], frame['reserved'])
+        record['peak_host_rss_mb'] = max(record['peak_host_rss_mb'], frame['host'])
+        record['total_time_s'] += time.time() - frame['start']
+
+    def dump_snapshot(self, tag: str) -> Optional[str]:
+        """
+        Write a CUDA memory snapshot pickle (viewable at pytorch.org/memory_viz).
+
+        Args:
+            tag (str): Tag included in the snapshot file name.
+
+        Returns:
+            Optional[str]: Path of the written snapshot, or None if snapshots are disabled.
+        """
+        if not self._recording_history:
+            return None
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            safe_tag = "".join(c if c.isalnum() or c in "-_" else "_" for c in tag)
+            path = os.path.join(
+                self.snapshot_dir,
+                f"oom_snapshot_rank{self.rank}_{safe_tag}_{time.strftime('%Y%m%d-%H%M%S')}.pickle"
+            )
+            torch.cuda.memory._dump_snapshot(path)
+            logging.error(f"CUDA out of memory in stage '{tag}'. Memory snapshot written to {path}")
+            return path
+        except Exception as e:
+            logging.error(f"Failed to dump CUDA memory snapshot: {str(e)}")
+            return None
+
+    def format_current(self) -> str:
+        """Cheap one-line description of current memory usage (no device-wide polling)."""
+        parts = []
+        if self.host_sampler.available:
+            parts.append(f"Host RSS: {self.host_sampler.current_mb():.0f}MB")
+        if self._cuda:
+            allocated = torch.cuda.memory_allocated(self.device) / _MB
+            reserved = torch.cuda.memory_reserved(self.device) / _MB
+            parts.append(f"{self.device}: {allocated:.0f}MB allocated/{reserved:.0f}MB reserved")
+        return ", ".join(parts) if parts else "memory tracking unavailable"
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get per-stage memory statistics.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Mapping of stage name to its aggregated statistics.
+        """
+        return {name: dict(record) for name, record in self.stats.items()}
+
+    def log_summary(self) -> None:
+        """Log a per-stage memory table."""
+        if not self.enabled or not self.stats:
+            return
+        lines = [
+            f"Memory usage by stage ({self.device}):",
+            f"{'Stage':<40}{'Calls':>8}{'Peak Alloc MB':>16}{'Peak Rsrv MB':>16}{'Peak RSS MB':>14}{'Time s':>12}"
+        ]
+        for name, record in self.stats.items():
+            lines.append(
+                f"{name:<40}{record['calls']:>8d}"
+                f"{record['peak_allocated_mb']:>16.1f}{record['peak_reserved_mb']:>16.1f}"
+                f"{record['peak_host_rss_mb']:>14.1f}{record['total_time_s']:>12.1f}"
+            )
+        logging.info("\n".join(lines))
+
+    def save_summary(self, output_dir: str) -> Optional[str]:
+        """
+        Save the per-stage statistics together with device information as JSON.
+
+        Args:
+            output_dir (str): Directory to write memory_summary_rank{rank}.json to.
+
+        Returns:
+            Optional[str]: Path of the written file.
+        """
+        if not self.enabled:
+            return None
+        device_info = {'device': str(self.device)}
+        if self._cuda:
+            props = torch.cuda.get_device_properties(self.device)
+            device_info['name'] = props.name
+            device_info['total_memory_mb'] = props.total_memory / _MB
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, f"memory_summary_rank{self.rank}.json")
+        with open(path, 'w') as f:
+            json.dump({'device': device_info, 'stages': self.summary()}, f, indent=2)
+        return path
+
+    def close(self) -> None:
+        """Stop background sampling and allocator history recording."""
+        self.host_sampler.stop()
+        if self._recording_history:
+            try:
+                torch.cuda.memory._record_memory_history(enabled=None)
+            except Exception:
+                pass
+            self._recording_history = False
+
+
+def create_memory_tracker(memory_config, device: torch.device, rank: int = 0) -> MemoryTracker:
+    """
+    Build a MemoryTracker from a MemoryConfig.
+
+    Args:
+        memory_config (MemoryConfig): Memory instrumentation configuration.
+        device (torch.device): Device whose allocator statistics are tracked.
+        rank (int): Process rank.
+
+    Returns:
+        MemoryTracker: Configured tracker.
+    """
+    return MemoryTracker(
+        device=device,
+        rank=rank,
+        enabled=memory_config.enable_tracking,
+        host_sample_interval=memory_config.host_sample_interval,
+        snapshot_dir=memory_config.snapshot_dir,
+        snapshot_max_entries=memory_config.snapshot_max_entries
+    )
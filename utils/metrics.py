@@ -1,27 +1,12 @@
 """
 Metrics utilities for StyleGAN fingerprinting evaluation.
 """
-import os
+import logging
+from typing import Dict, Sequence, Tuple
+
 import numpy as np
 import torch
 import torch.nn as nn
-from torchvision import models
-from scipy import linalg
-
-
-
-def save_metrics_text(metrics, output_dir):
-    """
-    Save metrics to a text file.
-    
-    Args:
-        metrics (dict): Dictionary of metrics
-        output_dir (str): Output directory
-    """
-    metrics_path = os.path.join(output_dir, "evaluation_metrics.txt")
-    with open(metrics_path, 'w') as f:
-        for key, value in metrics.items():
-            f.write(f"{key}: {value}\n")
 
 
 class InceptionV3(nn.Module):
@@ -43,7 +28,8 @@ class InceptionV3(nn.Module):
                  output_blocks=(DEFAULT_BLOCK_IDX,),
                  resize_input=True,
                  normalize_input=True,
-                 requires_grad=False):
+                 requires_grad=False,
+                 inception=None):
         """Build pretrained InceptionV3
 
         Parameters
@@ -65,6 +51,9 @@ class InceptionV3(nn.Module):
         requires_grad : bool
             If true, parameters of the model require gradients. Possibly useful
             for finetuning the network
+        inception : torchvision Inception3, optional
+            Pretrained network to take the blocks from (e.g. from
+            get_inception_backbone()). If None, the pretrained weights are loaded
         """
         super(InceptionV3, self).__init__()
 
@@ -77,9 +66,9 @@ class InceptionV3(nn.Module):
             'Last possible output block index is 3'
 
         # Load pretrained model
-        self.inception = models.inception_v3(pretrained=True)
-        self.inception.aux_logits = False
-        self.inception.fc = nn.Identity()
+        if inception is None:
+            inception = _load_pretrained_inception()
+        self.inception = inception
 
         # Block definitions
         self.blocks = nn.ModuleList()
@@ -166,6 +155,91 @@ class InceptionV3(nn.Module):
         return outp
 
 
+def _load_pretrained_inception():
+    from torchvision import models
+    inception = models.inception_v3(pretrained=True, transform_input=False)
+    inception.aux_logits = False
+    inception.AuxLogits = None
+    return inception
+
+
+# Identifies what extract_inception_outputs computes; cached features are only reused
+# when it matches
+INCEPTION_FEATURE_VERSION = "torchvision-inception_v3/pool3+logits/images-0-1/v2"
+
+# Models shared by all metrics in the process, built on first use
+_INCEPTION_BACKBONES: Dict[Tuple[str, torch.dtype, bool], nn.Module] = {}
+_INCEPTION_MODELS: Dict[Tuple[Tuple[int, ...], str, torch.dtype, bool, bool], "InceptionV3"] = {}
+
+
+def inception_feature_version(fast=False):
+    """Version string of the features computed by extract_inception_outputs(fast=fast)."""
+    return f"{INCEPTION_FEATURE_VERSION}/fast-fp16-autocast" if fast else INCEPTION_FEATURE_VERSION
+
+
+def get_inception_backbone(device='cpu', dtype=torch.float32, channels_last=False):
+    """Get the shared pretrained torchvision InceptionV3 for a device and dtype.
+    
+    The pretrained weights are loaded once per (device, dtype, memory format) and the
+    network is kept in eval mode without gradients. Its fc layer is the pretrained
+    1000-way ImageNet classifier.
+    
+    Args:
+        device: Device of the network
+        dtype: Parameter dtype of the network
+        channels_last: Keep the convolution weights in channels_last memory format
+        
+    Returns:
+        nn.Module: The shared network
+    """
+    key = (str(torch.device(device)), dtype, channels_last)
+    if key not in _INCEPTION_BACKBONES:
+        inception = _load_pretrained_inception().to(device=device, dtype=dtype).eval()
+        if channels_last:
+            inception = inception.to(memory_format=torch.channels_last)
+        for param in inception.parameters():
+            param.requires_grad = False
+        _INCEPTION_BACKBONES[key] = inception
+    return _INCEPTION_BACKBONES[key]
+
+
+def get_inception_model(
+    output_blocks: Sequence[int] = (InceptionV3.DEFAULT_BLOCK_IDX,),
+    device='cpu',
+    dtype=torch.float32,
+    preprocess=True,
+    channels_last=False
+):
+    """Get the shared InceptionV3 feature extractor for a block set, device and dtype.
+    
+    Extractors for different block sets share the weights of get_inception_backbone().
+    
+    Args:
+        output_blocks: Indices of the blocks to return features of
+        device: Device of the model
+        dtype: Parameter dtype of the model; inputs are cast to it
+        preprocess: Resize and normalize the inputs in the model; without it, inputs must
+            already be 299x299 in [-1, 1] (see prepare_inception_input)
+        channels_last: Use channels_last convolution weights
+        
+    Returns:
+        InceptionV3: The shared feature extractor, in eval mode
+    """
+    key = (tuple(sorted(set(output_blocks))), str(torch.device(device)), dtype, preprocess, channels_last)
+    if key not in _INCEPTION_MODELS:
+        inception = get_inception_backbone(device, dtype, channels_last=channels_last)
+        _INCEPTION_MODELS[key] = InceptionV3(
+            list(key[0]), resize_input=preprocess, normalize_input=preprocess, inception=inception
+        ).eval()
+    return _INCEPTION_MODELS[key]
+
+
+def clear_inception_models():
+    """Drop the shared Inception models, e.g. to release their device memory."""
+    _INCEPTION_MODELS.clear()
+    _INCEPTION_BACKBONES.clear()
+
+
 def calculate_activation_statistics(images, model, batch_size=50, dims=2048, device='cpu'):
     """Calculation of the statistics used by the FID.
     Params:
@@ -185,89 +259,205 @@ def calculate_activation_statistics(images, model, batch_size=50, dims=2048, dev
     """
     model.eval()
     
-    n_batches = (images.size(0) + batch_size - 1) // batch_size
-    n_used_imgs = n_batches * batch_size
-    
-    pred_arr = np.empty((n_used_imgs, dims))
-    
-    for i in range(n_batches):
-        start = i * batch_size
-        end = min((i + 1) * batch_size, images.size(0))
-        
-        batch = images[start:end].to(device)
+    # Batches are folded into the moments on the device as they are computed
+    moments = StreamingMoments(dims=dims, device=device)
+    for start in range(0, images.size(0), batch_size):
+        batch = images[start:start + batch_size].to(device)
         with torch.no_grad():
             pred = model(batch)[0]
-        
-        pred_arr[start:end] = pred.cpu().numpy().reshape(pred.size(0), -1)
-    
-    mu = np.mean(pred_arr[:images.size(0)], axis=0)
-    sigma = np.cov(pred_arr[:images.size(0)], rowvar=False)
+        moments.update(pred.reshape(pred.size(0), -1))
     
-    return mu, sigma
+    return moments.statistics()
 
 
-def calculate_fid(images1, images2, batch_size=50, device='cpu'):
+def calculate_fid(images1=None, images2=None, batch_size=50, device='cpu', features1=None, features2=None):
     """Calculate FID between two sets of images.
     
+    Either set can be given as pre-extracted features instead, so images whose
+    features are already known are not run through Inception again.
+    
     Args:
         images1: First set of images, tensor of shape (N,C,H,W) in range [0,1]
         images2: Second set of images, tensor of shape (N,C,H,W) in range [0,1]
         batch_size: Batch size for processing
         device: Device to run calculations on
+        features1: Features of the first set, array of shape (N, 2048), used instead of images1
+        features2: Features of the second set, array of shape (N, 2048), used instead of images2
         
     Returns:
         FID score
     """
-    block_idx = InceptionV3.BLOCK_INDEX_BY_DIM[2048]
-    model = InceptionV3([block_idx]).to(device)
+    if features1 is None:
+        features1 = extract_inception_features(images1, batch_size=batch_size, device=device)
+    if features2 is None:
+        features2 = extract_inception_features(images2, batch_size=batch_size, device=device)
     
-    mu1, sigma1 = calculate_activation_statistics(images1, model, batch_size, device=device)
-    mu2, sigma2 = calculate_activation_statistics(images2, model, batch_size, device=device)
+    return compute_fid_from_features(features1, features2)
+
+
+def extract_inception_outputs(images, batch_size=50, device='cpu', dtype=torch.float32, return_logits=True, fast=False,
+                              as_tensor=False):
+    """Extract pool features and class logits with one Inception pass per image.
     
-    # Calculate FID
-    ssdiff = np.sum((mu1 - mu2) ** 2.0)
-    covmean = linalg.sqrtm(sigma1.dot(sigma2))
+    The pool features feed FID, KID, precision/recall and the other feature-space
+    metrics; the logits of the pretrained classifier head feed the Inception Score.
     
-    # Numerical error might give slight imaginary component
-    if np.iscomplexobj(covmean):
-        covmean = covmean.real
+    Args:
+        images: Images tensor of shape (N,C,H,W) in range [0,1]
+        batch_size: Batch size for processing
+        device: Device to run calculations on
+        dtype: Dtype to run the shared model in
+        return_logits: Also compute the class logits
+        fast: Use extract_inception_outputs_fast (dtype is then ignored)
+        as_tensor: Return float32 tensors on the device instead of arrays
+        
+    Returns:
+        tuple: (features, logits) - float32 arrays of shape (N, 2048) and (N, 1000);
+            logits is None if return_logits is False
+    """
+    if fast:
+        return extract_inception_outputs_fast(
+            images, batch_size=batch_size, device=device, return_logits=return_logits, as_tensor=as_tensor
+        )
     
-    fid = ssdiff + np.trace(sigma1 + sigma2 - 2.0 * covmean)
+    block_idx = InceptionV3.BLOCK_INDEX_BY_DIM[2048]
+    model = get_inception_model([block_idx], device=device, dtype=dtype)
     
-    return float(fid) 
+    features, logits = [], []
+    for start in range(0, images.size(0), batch_size):
+        batch = images[start:start + batch_size].to(device=device, dtype=dtype)
+        with torch.no_grad():
+            pool = model(batch)[0].flatten(1)
+            batch_features = pool.float()
+            features.append(batch_features if as_tensor else batch_features.cpu().numpy())
+            if return_logits:
+                batch_logits = model.inception.fc(pool).float()
+                logits.append(batch_logits if as_tensor else batch_logits.cpu().numpy())
+    
+    if as_tensor:
+        features = torch.cat(features) if features else torch.empty((0, 2048), device=device)
+        logits = (torch.cat(logits) if logits else torch.empty((0, 1000), device=device)) if return_logits else None
+        return features, logits
+    
+    features = np.concatenate(features, axis=0) if features else np.empty((0, 2048), dtype=np.float32)
+    if not return_logits:
+        return features, None
+    logits = np.concatenate(logits, axis=0) if logits else np.empty((0, 1000), dtype=np.float32)
+    return features, logits
 
 
-def extract_inception_features(images, batch_size=50, device='cpu'):
-    """Extract features from the InceptionV3 model for FID calculation.
+def prepare_inception_input(images, channels_last=False):
+    """Resize and normalize images for the Inception network in one pass.
     
     Args:
-        images: Images tensor of shape (N,C,H,W) in range [0,1]
+        images: Images tensor of shape (N,C,H,W), uint8 in [0, 255] or floating point in [0, 1]
+        channels_last: Return the batch in channels_last memory format
+        
+    Returns:
+        torch.Tensor: float32 images of shape (N,C,299,299) in [-1, 1]
+    """
+    scale = 2.0 / 255.0 if images.dtype == torch.uint8 else 2.0
+    x = images.float()
+    if x.shape[-2:] != (299, 299):
+        x = nn.functional.interpolate(x, size=(299, 299), mode='bilinear', align_corners=False)
+    elif x.data_ptr() == images.data_ptr():
+        x = x.clone()
+    # Bilinear weights sum to one, so normalizing after resizing is equivalent
+    x = x.mul_(scale).sub_(1.0)
+    return x.contiguous(memory_format=torch.channels_last) if channels_last else x
+
+
+def _to_host(tensor):
+    if tensor.device.type != 'cuda':
+        return tensor.numpy()
+    host = torch.empty(tensor.shape, dtype=tensor.dtype, pin_memory=True)
+    host.copy_(tensor, non_blocking=True)
+    torch.cuda.synchronize(tensor.device)
+    return host.numpy()
+
+
+def extract_inception_outputs_fast(images, batch_size=64, device='cpu', return_logits=True, autocast=True, channels_last=True,
+                                   as_tensor=False):
+    """Fast variant of extract_inception_outputs.
+    
+    Accepts uint8 images in [0, 255] as well as floating-point (e.g. fp16) images in [0, 1];
+    host images are copied to the device as is (uint8 stays 4x smaller than fp32) through
+    double-buffered pinned memory with non-blocking transfers. Resizing and normalization
+    run in one pass on the device, the network runs in channels_last under fp16 autocast
+    (CUDA only), and features and logits stay on the device until a single pinned copy to
+    the host at the end. fp16 rounding makes the features differ slightly from the fp32
+    path, so they are versioned separately (inception_feature_version(fast=True)).
+    
+    Args:
+        images: Images tensor of shape (N,C,H,W), uint8 in [0, 255] or floating point in [0, 1]
         batch_size: Batch size for processing
         device: Device to run calculations on
+        return_logits: Also compute the class logits
+        autocast: Run the network under fp16 autocast on CUDA
+        channels_last: Run the network in channels_last memory format
+        as_tensor: Return float32 tensors on the device instead of arrays (no host copy)
         
     Returns:
-        Features array of shape (N, 2048)
+        tuple: (features, logits) - float32 arrays of shape (N, 2048) and (N, 1000);
+            logits is None if return_logits is False
     """
+    device = torch.device(device)
     block_idx = InceptionV3.BLOCK_INDEX_BY_DIM[2048]
-    model = InceptionV3([block_idx]).to(device)
-    model.eval()
+    model = get_inception_model([block_idx], device=device, preprocess=False, channels_last=channels_last)
+    use_autocast = autocast and device.type == 'cuda'
     
-    n_batches = (images.size(0) + batch_size - 1) // batch_size
-    n_used_imgs = n_batches * batch_size
+    num_images = images.size(0)
+    features = torch.empty((num_images, 2048), device=device)
+    logits = torch.empty((num_images, 1000), device=device) if return_logits else None
     
-    pred_arr = np.empty((n_used_imgs, 2048))
+    # Two pinned staging buffers: one is filled while the copy from the other is in flight
+    pinned = images.device.type == 'cpu' and device.type == 'cuda'
+    if pinned:
+        buffer_shape = (min(batch_size, num_images),) + tuple(images.shape[1:])
+        staging = [torch.empty(buffer_shape, dtype=images.dtype, pin_memory=True) for _ in range(2)]
+        copied = [None, None]
     
-    for i in range(n_batches):
-        start = i * batch_size
-        end = min((i + 1) * batch_size, images.size(0))
+    for i, start in enumerate(range(0, num_images, batch_size)):
+        batch = images[start:start + batch_size]
+        end = start + len(batch)
+        if pinned:
+            slot = i % 2
+            if copied[slot] is not None:
+                copied[slot].synchronize()
+            buffer = staging[slot][:len(batch)]
+            buffer.copy_(batch)
+            batch = buffer.to(device, non_blocking=True)
+            copied[slot] = torch.cuda.Event()
+            copied[slot].record()
+        else:
+            batch = batch.to(device)
         
-        batch = images[start:end].to(device)
-        with torch.no_grad():
-            pred = model(batch)[0]
-        
-        pred_arr[start:end] = pred.cpu().numpy().reshape(pred.size(0), -1)
+        x = prepare_inception_input(batch, channels_last=channels_last)
+        with torch.no_grad(), torch.autocast('cuda', dtype=torch.float16, enabled=use_autocast):
+            pool = model(x)[0].flatten(1)
+            features[start:end] = pool.float()
+            if return_logits:
+                logits[start:end] = model.inception.fc(pool).float()
+    
+    if as_tensor:
+        return features, logits
+    return _to_host(features), _to_host(logits) if return_logits else None
+
+
+def extract_inception_features(images, batch_size=50, device='cpu', dtype=torch.float32):
+    """Extract features from the InceptionV3 model for FID calculation.
     
-    return pred_arr[:images.size(0)]
+    Args:
+        images: Images tensor of shape (N,C,H,W) in range [0,1]
+        batch_size: Batch size for processing
+        device: Device to run calculations on
+        dtype: Dtype to run the shared model in
+        
+    Returns:
+        Features array of shape (N, 2048)
+    """
+    features, _ = extract_inception_outputs(images, batch_size=batch_size, device=device, dtype=dtype, return_logits=False)
+    return features
 
 
 def compute_fid_from_features(features1, features2):
@@ -280,20 +470,209 @@ def compute_fid_from_features(features1, features2):
     Returns:
         FID score
     """
-    mu1 = np.mean(features1, axis=0)
-    sigma1 = np.cov(features1, rowvar=False)
+    mu1, sigma1 = StreamingMoments.from_features(features1).statistics()
+    mu2, sigma2 = StreamingMoments.from_features(features2).statistics()
     
-    mu2 = np.mean(features2, axis=0)
-    sigma2 = np.cov(features2, rowvar=False)
+    return compute_fid_from_statistics(mu1, sigma1, mu2, sigma2)
+
+
+class StreamingMoments:
+    """Streaming mean and covariance of feature rows.
     
-    # Calculate FID
-    ssdiff = np.sum((mu1 - mu2) ** 2.0)
+    Each batch is folded in with Chan's parallel update of the count, mean and centered
+    scatter matrix (float64), so FID statistics are exact at any number of rows with
+    O(dims^2) memory and without the cancellation of raw sums. Accumulators of different
+    batches, ranks or resumed runs merge the same way.
+    
+    The accumulators live on the device given, or on the device of the first batch, so
+    batches of GPU features are folded in on the GPU.
+    """
+    def __init__(self, dims=2048, device=None):
+        self.dims = dims
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+        self.device = device
+    
+    def _allocate(self, device=None):
+        if self.mean is None:
+            self.device = self.device if self.device is not None else (device or 'cpu')
+            self.mean = torch.zeros(self.dims, dtype=torch.float64, device=self.device)
+            self.m2 = torch.zeros(self.dims, self.dims, dtype=torch.float64, device=self.device)
+    
+    def _merge(self, count, mean, m2):
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self.m2 = self.m2 + m2 + torch.outer(delta, delta) * (self.count * count / total)
+        self.count = total
+    
+    def update(self, features):
+        """Add a batch of feature rows of shape (N, dims), as an array or tensor."""
+        features = torch.as_tensor(features)
+        self._allocate(features.device)
+        features = features.to(device=self.mean.device, dtype=torch.float64).reshape(features.shape[0], self.dims)
+        if features.shape[0] == 0:
+            return
+        batch_mean = features.mean(dim=0)
+        centered = features - batch_mean
+        self._merge(features.shape[0], batch_mean, centered.T @ centered)
+    
+    def merge(self, other):
+        """Fold in the rows of another accumulator."""
+        if other.count == 0:
+            return
+        self._allocate(other.mean.device)
+        self._merge(other.count, other.mean.to(self.mean.device), other.m2.to(self.mean.device))
+    
+    def gathered(self, device, world_size):
+        """Merge the accumulators of all ranks; every rank gets the merged result.
+        
+        Args:
+            device: Device used for the collectives
+            world_size: Total number of processes
+            
+        Returns:
+            StreamingMoments: Moments of the rows of all ranks
+        """
+        if world_size <= 1:
+            return self
+        import torch.distributed as dist
+        
+        self._allocate(device)
+        count = torch.tensor([self.count], dtype=torch.float64, device=device)
+        mean = self.mean.to(device)
+        m2 = self.m2.to(device)
+        counts = [torch.zeros_like(count) for _ in range(world_size)]
+        means = [torch.zeros_like(mean) for _ in range(world_size)]
+        m2s = [torch.zeros_like(m2) for _ in range(world_size)]
+        dist.all_gather(counts, count)
+        dist.all_gather(means, mean)
+        dist.all_gather(m2s, m2)
+        
+        merged = StreamingMoments(dims=self.dims, device=self.mean.device)
+        merged._allocate()
+        for rank_count, rank_mean, rank_m2 in zip(counts, means, m2s):
+            merged._merge(int(rank_count.item()), rank_mean.to(merged.device), rank_m2.to(merged.device))
+        return merged
+    
+    @classmethod
+    def from_statistics(cls, count, mu, sigma, device=None):
+        """Rebuild the accumulator of count rows from their mean and (unbiased) covariance."""
+        moments = cls(dims=len(mu), device=device)
+        moments._allocate()
+        moments.count = int(count)
+        moments.mean = torch.as_tensor(np.asarray(mu), dtype=torch.float64, device=moments.device)
+        moments.m2 = torch.as_tensor(np.asarray(sigma), dtype=torch.float64, device=moments.device) * (count - 1)
+        return moments
+    
+    @classmethod
+    def from_features(cls, features, batch_size=4096, device=None):
+        """Accumulate a feature matrix in row blocks, without a centered copy of the whole matrix."""
+        moments = cls(dims=np.shape(features)[1], device=device)
+        for start in range(0, len(features), batch_size):
+            moments.update(features[start:start + batch_size])
+        return moments
+    
+    def state_dict(self):
+        """Compact state, e.g. for saving partial evaluation results; only the upper triangle of
+        the symmetric scatter matrix is kept."""
+        self._allocate()
+        rows, cols = np.triu_indices(self.dims)
+        return {
+            'count': np.asarray(self.count, dtype=np.int64),
+            'mean': self.mean.cpu().numpy(),
+            'm2_triu': self.m2.cpu().numpy()[rows, cols],
+        }
+    
+    def load_state_dict(self, state):
+        """Restore the accumulator from state_dict()."""
+        mean = np.asarray(state['mean'], dtype=np.float64)
+        self.dims = len(mean)
+        rows, cols = np.triu_indices(self.dims)
+        m2 = np.zeros((self.dims, self.dims), dtype=np.float64)
+        m2[rows, cols] = state['m2_triu']
+        m2[cols, rows] = state['m2_triu']
+        self.count = int(state['count'])
+        self.mean = torch.from_numpy(mean).to(self.device or 'cpu')
+        self.m2 = torch.from_numpy(m2).to(self.device or 'cpu')
+        self.device = self.mean.device
+    
+    def statistics(self):
+        """Return the mean and (unbiased) covariance of all rows added so far.
+        
+        Raises:
+            ValueError: If fewer than two rows were added, e.g. on a rank whose shard is empty
+                or a single row; gather the accumulators of all ranks first
+        """
+        if self.count < 2:
+            raise ValueError(f"The covariance needs at least two feature rows, got {self.count}")
+        mu = self.mean.cpu().numpy()
+        sigma = (self.m2 / (self.count - 1)).cpu().numpy()
+        return mu, sigma
+
+
+def _sqrtm_trace_eigh(sigma1, sigma2, device):
+    # tr(sqrtm(sigma1 @ sigma2)) = sum of the square roots of the eigenvalues of the
+    # symmetric PSD matrix sqrt(sigma1) @ sigma2 @ sqrt(sigma1)
+    sigma1 = torch.as_tensor(sigma1, dtype=torch.float64, device=device)
+    sigma2 = torch.as_tensor(sigma2, dtype=torch.float64, device=device)
+    eigvals, eigvecs = torch.linalg.eigh(sigma1)
+    sqrt_sigma1 = (eigvecs * eigvals.clamp(min=0).sqrt()) @ eigvecs.T
+    product = sqrt_sigma1 @ sigma2 @ sqrt_sigma1
+    product = (product + product.T) / 2
+    return torch.linalg.eigvalsh(product).clamp(min=0).sqrt().sum().item()
+
+
+def _sqrtm_trace_scipy(sigma1, sigma2):
+    from scipy import linalg
     covmean = linalg.sqrtm(sigma1.dot(sigma2))
     
     # Numerical error might give slight imaginary component
     if np.iscomplexobj(covmean):
         covmean = covmean.real
+    return np.trace(covmean)
+
+
+def compute_fid_from_statistics(mu1, sigma1, mu2, sigma2, method='eigh', device=None):
+    """Compute FID score from feature means and covariances.
+    
+    The trace of the matrix square root is computed from symmetric eigendecompositions in
+    float64 torch, on the GPU when one is available and on the CPU otherwise. This matches
+    scipy.linalg.sqrtm to within ~1e-6 relative on 2048-d Inception statistics, at a fraction
+    of the cost; method='scipy' selects the scipy computation.
+    
+    Args:
+        mu1, sigma1: Mean and covariance of the first set of features
+        mu2, sigma2: Mean and covariance of the second set of features
+        method: 'eigh' (torch) or 'scipy'
+        device: Device of the eigendecompositions; defaults to CUDA if available
+        
+    Returns:
+        FID score
+    """
+    mu1, mu2 = np.asarray(mu1, dtype=np.float64), np.asarray(mu2, dtype=np.float64)
+    sigma1, sigma2 = np.asarray(sigma1, dtype=np.float64), np.asarray(sigma2, dtype=np.float64)
+    ssdiff = np.sum((mu1 - mu2) ** 2.0)
+    
+    if method == 'scipy':
+        trace_covmean = _sqrtm_trace_scipy(sigma1, sigma2)
+    elif method == 'eigh':
+        if device is None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        try:
+            trace_covmean = _sqrtm_trace_eigh(sigma1, sigma2, device)
+        except RuntimeError as e:
+            if torch.device(device).type == 'cpu':
+                raise
+            # e.g. out of memory or no float64 eigensolver on the device
+            logging.warning(f"FID eigendecomposition on {device} failed, using the CPU: {str(e)}")
+            trace_covmean = _sqrtm_trace_eigh(sigma1, sigma2, 'cpu')
+    else:
+        raise ValueError(f"Unknown FID method: {method}")
     
-    fid = ssdiff + np.trace(sigma1 + sigma2 - 2.0 * covmean)
+    fid = ssdiff + np.trace(sigma1) + np.trace(sigma2) - 2.0 * trace_covmean
     
-    return float(fid) 
\ No newline at end of file
+    return float(fid)
@@ -56,7 +56,8 @@ def load_pretrained_models(
     selected_models: Optional[Dict[str, Any]] = None,
     img_size: int = 768,
     enable_cpu_offload: bool = False,
-    dtype: torch.dtype = torch.float16
+    dtype: torch.dtype = torch.float16,
+    stylegan2_cache_dir: Optional[str] = None
 ) -> Dict[str, BaseGenerativeModel]:
     """
     Load pretrained models.
@@ -71,6 +72,7 @@ def load_pretrained_models(
         img_size: Output image size
         enable_cpu_offload: Whether to enable CPU offloading (SD only)
         dtype: Model dtype (SD only)
+        stylegan2_cache_dir: Converted safetensors cache directory (StyleGAN2 only, "" disables it)
         
     Returns:
         Dictionary mapping model names to loaded models
@@ -98,7 +100,8 @@ def load_pretrained_models(
                     model_url=url,
                     model_path=local_path,
                     device=device,
-                    img_size=img_size
+                    img_size=img_size,
+                    cache_dir=stylegan2_cache_dir
                 )
             else:  # stable-diffusion
                 model_path = model_config if isinstance(model_config, str) else model_config["model_name"]
@@ -0,0 +1,307 @@
+"""
+Registry of image-space negative-case transformations for evaluation.
+
+A transformation is named by a spec string, and the spec is also the case name in the
+results. Stages can be composed with "+", applied left to right:
+
+    downsample_16                    bilinear down/upsampling to 16x16 and back
+    downsample_area_64               area (anti-aliased) down/upsampling; shares levels with other area sizes
+    jpeg_75                          JPEG compression at quality 75
+    blur_1.5                         Gaussian blur with sigma 1.5
+    noise_0.05                       additive Gaussian noise with std 0.05 on the [-1, 1] scale
+    crop_80                          center crop keeping 80% of each side, resized back
+    set_pixels_minus_one             fingerprinted pixels set to -1
+    set_random_pixels_minus_one      random pixels set to -1
+    set_mixed_50_50_pixels_minus_one 50% fingerprinted / 50% random pixels set to -1
+    jpeg_75+downsample_128           JPEG compression, then down/upsampling
+
+Images are in the value range of the generative model (TransformSetup.value_range: StyleGAN2
+in [-1, 1], Stable Diffusion in [0, 1]); stages that quantize or clamp pixels use that range.
+All stages are batched tensor operations on the images' device. New transformations are
+added with register_transform().
+"""
+import logging
+import math
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import torch
+import torch.nn.functional as F
+
+from utils.image_transforms import apply_jpeg_compression
+from utils.pixel_indices import PixelIndexSet
+
+
+class TransformBatch:
+    """
+    One batch of generated images shared by all transformations of a fan-out.
+
+    Holds the batch's sample offset (for per-sample randomness that does not depend on how
+    samples are batched or sharded) and the area-downsampled levels of the batch, so that
+    resampling to several sizes reuses the levels already computed.
+    """
+    def __init__(self, images: torch.Tensor, start_idx: int = 0):
+        """
+        Args:
+            images (torch.Tensor): Images [B, C, H, W].
+            start_idx (int): Sample index of the first image.
+        """
+        self.images = images
+        self.start_idx = start_idx
+        self._levels: Dict[int, torch.Tensor] = {images.shape[-1]: images}
+
+    def area_downsample(self, size: int) -> torch.Tensor:
+        """
+        Area-downsample the batch to size x size.
+
+        A size that divides a cached level, which itself divides the full image size, is
+        computed by average pooling the smallest such level; with integer ratios this equals
+        area resampling from the full image. Other sizes (e.g. 224 from 256 or 768) are
+        resampled from the full image. Only downsample_area stages use these levels; the
+        bilinear downsample stages (the default downsample_sizes cases) do not.
+
+        Args:
+            size (int): Target size.
+
+        Returns:
+            torch.Tensor: Downsampled images [B, C, size, size].
+        """
+        if size in self._levels:
+            return self._levels[size]
+
+        full_size = self.images.shape[-1]
+        candidates = [
+            level for level in self._levels
+            if level > size and level % size == 0 and full_size % level == 0
+        ]
+        if candidates:
+            level = min(candidates)
+            self._levels[size] = F.avg_pool2d(self._levels[level], level // size)
+        else:
+            self._levels[size] = F.interpolate(self.images, size=size, mode='area')
+        return self._levels[size]
+
+
+# Signature of a transformation stage: (images, batch) -> transformed images. batch is the
+# TransformBatch of the source images, or None for stages after the first one of a chain
+TransformFn = Callable[[torch.Tensor, Optional[TransformBatch]], torch.Tensor]
+
+
+@dataclass
+class TransformSetup:
+    """
+    Context needed to build transformations.
+
+    Attributes:
+        pixel_set: Fingerprinted pixel set; also provides the derived random and mixed sets.
+        seed: Base seed of random transformations (e.g. noise).
+        value_range: (low, high) pixel values of the images, e.g. from image_value_range().
+    """
+    pixel_set: Optional[PixelIndexSet] = None
+    seed: int = 0
+    value_range: Tuple[float, float] = (-1.0, 1.0)
+
+
+def image_value_range(model_type: str) -> Tuple[float, float]:
+    """Pixel value range of a generative model's images: StyleGAN2 [-1, 1], Stable Diffusion [0, 1]."""
+    return (-1.0, 1.0) if model_type == "stylegan2" else (0.0, 1.0)
+
+
+_REGISTRY: List[Tuple[re.Pattern, Callable[[re.Match, TransformSetup], TransformFn]]] = []
+
+
+def register_transform(pattern: str):
+    """
+    Register a builder for transformation stages whose spec matches a regular expression.
+
+    The builder is called with the match and a TransformSetup and returns a TransformFn.
+
+    Args:
+        pattern (str): Regular expression matched against the whole stage spec.
+    """
+    def decorator(builder: Callable[[re.Match, TransformSetup], TransformFn]):
+        _REGISTRY.append((re.compile(pattern), builder))
+        return builder
+    return decorator
+
+
+# Seed offsets of the pixel sets used before the registry existed, kept so results are unchanged
+_RANDOM_PIXELS_SEED_OFFSET = 1000
+_LEGACY_MIX_SEED_OFFSETS = {50: 2000, 75: 3000, 25: 4000, 10: 5000, 5: 6000, 1: 7000}
+
+
+def _set_pixels(images: torch.Tensor, pixel_indices: torch.Tensor, value: float) -> torch.Tensor:
+    flattened = images.reshape(images.shape[0], -1).clone()
+    flattened[:, pixel_indices] = value
+    return flattened.view_as(images)
+
+
+@register_transform(r"downsample_(\d+)")
+def _build_downsample(match: re.Match, setup: TransformSetup) -> TransformFn:
+    size = int(match.group(1))
+
+    def transform(images: torch.Tensor, batch: Optional[TransformBatch]) -> torch.Tensor:
+        downsampled = F.interpolate(images, size=size, mode='bilinear', align_corners=False)
+        return F.interpolate(downsampled, size=images.shape[-1], mode='bilinear', align_corners=False)
+    return transform
+
+
+@register_transform(r"downsample_area_(\d+)")
+def _build_area_downsample(match: re.Match, setup: TransformSetup) -> TransformFn:
+    size = int(match.group(1))
+
+    def transform(images: torch.Tensor, batch: Optional[TransformBatch]) -> torch.Tensor:
+        if batch is not None:
+            downsampled = batch.area_downsample(size)
+        else:
+            downsampled = F.interpolate(images, size=size, mode='area')
+        return F.interpolate(downsampled, size=images.shape[-1], mode='bilinear', align_corners=False)
+    return transform
+
+
+def _jpeg_batched(images: torch.Tensor, quality: int, value_range: Tuple[float, float]) -> torch.Tensor:
+    from torchvision.io import decode_jpeg, encode_jpeg
+
+    low, high = value_range
+    scale = 255 / (high - low)
+    pixels = ((images - low) * scale).clamp(0, 255).to(torch.uint8)
+    encoded = encode_jpeg(list(pixels), quality=quality)
+    decoded = decode_jpeg(encoded, device=images.device)
+    return torch.stack(decoded).to(images.dtype) / scale + low
+
+
+@register_transform(r"jpeg_(\d+)")
+def _build_jpeg(match: re.Match, setup: TransformSetup) -> TransformFn:
+    quality = int(match.group(1))
+    low, high = setup.value_range
+
+    def transform(images: torch.Tensor, batch: Optional[TransformBatch]) -> torch.Tensor:
+        # Batched (on CUDA, GPU) JPEG coding where torchvision supports it, PIL otherwise
+        try:
+            return _jpeg_batched(images, quality, setup.value_range)
+        except (ImportError, RuntimeError, TypeError) as e:
+            logging.debug(f"Batched JPEG coding unavailable, using PIL: {str(e)}")
+            # apply_jpeg_compression works on images in [-1, 1]
+            compressed = apply_jpeg_compression((images - low) / (high - low) * 2 - 1, quality=quality)
+            return (compressed + 1) / 2 * (high - low) + low
+    return transform
+
+
+@register_transform(r"blur_(\d+(?:\.\d+)?)")
+def _build_blur(match: re.Match, setup: TransformSetup) -> TransformFn:
+    sigma = float(match.group(1))
+    radius = max(1, int(math.ceil(3 * sigma)))
+    offsets = torch.arange(-radius, radius + 1, dtype=torch.float32)
+    kernel_1d = torch.exp(-offsets ** 2 / (2 * sigma ** 2))
+    kernel_1d = kernel_1d / kernel_1d.sum()
+
+    def transform(images: torch.Tensor, batch: Optional[TransformBatch]) -> torch.Tensor:
+        # Separable depthwise convolution with reflect padding
+        channels = images.shape[1]
+        kernel = kernel_1d.to(device=images.device, dtype=images.dtype)
+        x = F.pad(images, (radius, radius, radius, radius), mode='reflect')
+        x = F.conv2d(x, kernel.view(1, 1, 1, -1).expand(channels, 1, 1, -1), groups=channels)
+        return F.conv2d(x, kernel.view(1, 1, -1, 1).expand(channels, 1, -1, 1), groups=channels)
+    return transform
+
+
+@register_transform(r"noise_(\d+(?:\.\d+)?)")
+def _build_noise(match: re.Match, setup: TransformSetup) -> TransformFn:
+    low, high = setup.value_range
+    # The std is given on the [-1, 1] scale, so a spec perturbs every model's images equally
+    std = float(match.group(1)) * (high - low) / 2
+
+    def transform(images: torch.Tensor, batch: Optional[TransformBatch]) -> torch.Tensor:
+        # Seeded per sample, so the noise does not depend on batching or sharding
+        start_idx = batch.start_idx if batch is not None else 0
+        noise = torch.empty_like(images)
+        generator = torch.Generator(device=images.device)
+        for i in range(images.shape[0]):
+            generator.manual_seed(setup.seed * 1000003 + start_idx + i)
+            noise[i].normal_(generator=generator)
+        return (images + std * noise).clamp(low, high)
+    return transform
+
+
+@register_transform(r"crop_(\d+)")
+def _build_crop(match: re.Match, setup: TransformSetup) -> TransformFn:
+    fraction = int(match.group(1)) / 100
+
+    def transform(images: torch.Tensor, batch: Optional[TransformBatch]) -> torch.Tensor:
+        height, width = images.shape[-2:]
+        crop_h, crop_w = max(1, round(height * fraction)), max(1, round(width * fraction))
+        top, left = (height - crop_h) // 2, (width - crop_w) // 2
+        cropped = images[..., top:top + crop_h, left:left + crop_w]
+        return F.interpolate(cropped, size=(height, width), mode='bilinear', align_corners=False)
+    return transform
+
+
+@register_transform(r"set_pixels_minus_one")
+def _build_set_pixels(match: re.Match, setup: TransformSetup) -> TransformFn:
+    pixel_indices = setup.pixel_set.sorted_indices
+    return lambda images, batch: _set_pixels(images, pixel_indices, -1.0)
+
+
+@register_transform(r"set_random_pixels_minus_one")
+def _build_set_random_pixels(match: re.Match, setup: TransformSetup) -> TransformFn:
+    pixel_indices = setup.pixel_set.random(setup.pixel_set.seed + _RANDOM_PIXELS_SEED_OFFSET)
+    return lambda images, batch: _set_pixels(images, pixel_indices, -1.0)
+
+
+@register_transform(r"set_mixed_(\d+)_(\d+)_pixels_minus_one")
+def _build_set_mixed_pixels(match: re.Match, setup: TransformSetup) -> TransformFn:
+    original_percent, random_percent = int(match.group(1)), int(match.group(2))
+    if original_percent + random_percent != 100:
+        raise ValueError(f"Mixed pixel percentages must add up to 100: {match.group(0)}")
+    seed_offset = _LEGACY_MIX_SEED_OFFSETS.get(original_percent, 10000 + 100 * original_percent)
+    pixel_indices = setup.pixel_set.mixed(original_percent / 100, setup.pixel_set.seed + seed_offset)
+    return lambda images, batch: _set_pixels(images, pixel_indices, -1.0)
+
+
+class NegativeTransform:
+    """A composed chain of transformation stages, named by its spec."""
+    def __init__(self, spec: str, stages: Sequence[TransformFn]):
+        self.spec = spec
+        self.stages = list(stages)
+
+    def __call__(self, images: torch.Tensor, batch: Optional[TransformBatch] = None) -> torch.Tensor:
+        """
+        Apply the transformation.
+
+        Args:
+            images (torch.Tensor): Images [B, C, H, W] in the setup's value range.
+            batch (Optional[TransformBatch]): Shared batch of the source images, if any.
+
+        Returns:
+            torch.Tensor: Transformed images.
+        """
+        for i, stage in enumerate(self.stages):
+            # Only the first stage sees the source images the batch context describes
+            images = stage(images, batch if i == 0 else None)
+        return images
+
+
+def _build_stage(spec: str, setup: TransformSetup) -> TransformFn:
+    for pattern, builder in _REGISTRY:
+        match = pattern.fullmatch(spec)
+        if match is not None:
+            return builder(match, setup)
+    raise ValueError(f"Unknown negative transformation: {spec}")
+
+
+def build_negative_transforms(specs: Sequence[str], setup: TransformSetup) -> Dict[str, NegativeTransform]:
+    """
+    Build transformations from their specs.
+
+    Args:
+        specs (Sequence[str]): Transformation specs; stages are joined with "+".
+        setup (TransformSetup): Context needed by the transformations.
+
+    Returns:
+        Dict[str, NegativeTransform]: Mapping from spec (the case name) to transformation.
+    """
+    return {
+        spec: NegativeTransform(spec, [_build_stage(stage.strip(), setup) for stage in spec.split('+')])
+        for spec in specs
+    }
@@ -0,0 +1,160 @@
+"""
+Fingerprinted pixel index sets shared by training, evaluation, attacks and visualization.
+
+The fingerprinted pixels of an image are a seeded random subset of its flattened C*H*W
+values. PixelIndexSet draws them with a private torch.Generator, so building a set does not
+reseed the global RNG. The result is identical to the original torch.manual_seed(seed) +
+torch.randperm(...) selection, so existing checkpoints keep their pixel order.
+"""
+import logging
+from typing import Dict, Optional, Tuple
+
+import torch
+
+
+def _randperm(n: int, seed: int) -> torch.Tensor:
+    generator = torch.Generator()
+    generator.manual_seed(seed)
+    return torch.randperm(n, generator=generator)
+
+
+class PixelIndexSet:
+    """
+    A seeded set of pixel indices and the pixel sets derived from it.
+
+    Pixels are gathered through the sorted indices, which touches memory in order, and
+    then permuted back into selection order, which is the order the decoder predicts.
+    Derived random and mixed sets are cached per seed on the set's device.
+    """
+    def __init__(
+        self,
+        img_size: int,
+        count: int,
+        seed: int,
+        channels: int = 3,
+        device: Optional[torch.device] = None
+    ):
+        """
+        Draw the pixel set.
+
+        Args:
+            img_size (int): Image size (square images).
+            count (int): Number of pixels; capped at channels * img_size * img_size.
+            seed (int): Selection seed.
+            channels (int): Number of image channels.
+            device (Optional[torch.device]): Device to keep the indices on.
+        """
+        self.img_size = img_size
+        self.channels = channels
+        self.seed = seed
+        self.device = device
+        self.total_pixels = channels * img_size * img_size
+
+        if count > self.total_pixels:
+            logging.warning(f"Requested {count} pixels exceeds total pixels {self.total_pixels}. Using all pixels.")
+            indices = torch.arange(self.total_pixels)
+        else:
+            indices = _randperm(self.total_pixels, seed)[:count]
+
+        # Selection order, and the sorted gather plus the permutation restoring selection order
+        self.indices = indices.to(device)
+        self.sorted_indices, order = torch.sort(self.indices)
+        self._restore_order = torch.argsort(order)
+
+        self._random_sets: Dict[int, torch.Tensor] = {}
+        self._mixed_sets: Dict[Tuple[float, int], torch.Tensor] = {}
+
+    @property
+    def count(self) -> int:
+        """Number of pixels in the set."""
+        return len(self.indices)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def extract(self, images: torch.Tensor) -> torch.Tensor:
+        """
+        Gather the selected pixels of a batch of images.
+
+        Args:
+            images (torch.Tensor): Images [B, C, H, W].
+
+        Returns:
+            torch.Tensor: Pixel values [B, count] in selection order.
+        """
+        flattened = images.reshape(images.shape[0], -1)
+        return flattened.index_select(1, self.sorted_indices).index_select(1, self._restore_order)
+
+    def random(self, seed: int) -> torch.Tensor:
+        """
+        Random pixel set of the same size, drawn with another seed.
+
+        Args:
+            seed (int): Selection seed.
+
+        Returns:
+            torch.Tensor: Sorted pixel indices.
+        """
+        if seed not in self._random_sets:
+            if self.count >= self.total_pixels:
+                indices = torch.arange(self.total_pixels)
+            else:
+                indices = _randperm(self.total_pixels, seed)[:self.count]
+            self._random_sets[seed] = torch.sort(indices.to(self.device))[0]
+        return self._random_sets[seed]
+
+    def mixed(self, original_ratio: float, seed: int) -> torch.Tensor:
+        """
+        Pixel set of the same size keeping a ratio of the selected pixels (the first ones in
+        selection order) and filling up with random pixels outside the selection.
+
+        Args:
+            original_ratio (float): Ratio of selected pixels to keep (0.0 to 1.0).
+            seed (int): Seed of the random pixels.
+
+        Returns:
+            torch.Tensor: Sorted pixel indices.
+        """
+        key = (original_ratio, seed)
+        if key not in self._mixed_sets:
+            num_original = int(self.count * original_ratio)
+            num_random = self.count - num_original
+            indices = self.indices[:num_original].cpu()
+            if num_random > 0:
+                # Pixels outside the selection, in increasing order
+                available = torch.ones(self.total_pixels, dtype=torch.bool)
+                available[self.indices.cpu()] = False
+                available_indices = torch.nonzero(available).squeeze(1)
+                random_indices = available_indices[_randperm(len(available_indices), seed)[:num_random]]
+                indices = torch.cat([indices, random_indices])
+            self._mixed_sets[key] = torch.sort(indices.to(self.device))[0]
+        return self._mixed_sets[key]
+
+
+_PIXEL_INDEX_SETS: Dict[Tuple, PixelIndexSet] = {}
+
+
+def get_pixel_index_set(
+    img_size: int,
+    count: int,
+    seed: int,
+    channels: int = 3,
+    device: Optional[torch.device] = None
+) -> PixelIndexSet:
+    """
+    Shared PixelIndexSet for the given parameters, built on first use.
+
+    Args:
+        img_size (int): Image size (square images).
+        count (int): Number of pixels.
+        seed (int): Selection seed.
+        channels (int): Number of image channels.
+        device (Optional[torch.device]): Device to keep the indices on.
+
+    Returns:
+        PixelIndexSet: The pixel set.
+    """
+    key = (img_size, count, seed, channels, str(device))
+    if key not in _PIXEL_INDEX_SETS:
+        _PIXEL_INDEX_SETS[key] = PixelIndexSet(img_size, count, seed, channels=channels, device=device)
+    return _PIXEL_INDEX_SETS[key]
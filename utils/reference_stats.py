@@ -0,0 +1,171 @@
+"""
+On-disk cache of reference-distribution statistics for FID and related metrics.
+
+Generating reference images and running them through Inception dominates the cost of
+FID-type metrics, yet the reference distribution rarely changes between runs. An entry is
+keyed by a hash of what determines it - model id, generation parameters, seed range and
+feature extractor version:
+
+    <root>/<key>.npz     features, logits (if recorded), mu and sigma
+    <root>/<key>.json    the keyed settings, for reference
+
+Entries are written atomically by rank 0 and never modified, so concurrent runs can share a
+directory.
+"""
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.metrics import INCEPTION_FEATURE_VERSION, StreamingMoments
+
+
+def reference_stats_key(
+    model_id: str,
+    generation: Dict[str, Any],
+    seeds: Tuple[int, int],
+    extractor: str = INCEPTION_FEATURE_VERSION
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build the key of a reference-statistics entry.
+
+    Args:
+        model_id (str): Identifier of the reference model.
+        generation (Dict[str, Any]): Generation parameters (prompt, image size, steps, ...).
+        seeds (Tuple[int, int]): Seed range [start, end) of the reference samples.
+        extractor (str): Feature extractor version.
+
+    Returns:
+        tuple: (key, settings) - hex digest and the keyed settings.
+    """
+    settings = {
+        'model_id': model_id,
+        'generation': generation,
+        'seeds': list(seeds),
+        'extractor': extractor,
+    }
+    settings = json.loads(json.dumps(settings, sort_keys=True, default=str))
+    key = hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:24]
+    return key, settings
+
+
+@dataclass
+class ReferenceStats:
+    """Inception outputs of a reference sample set and their moments."""
+    features: Optional[np.ndarray]  # Pool features [N, 2048] (None if only the moments are kept)
+    mu: np.ndarray  # Mean of the features
+    sigma: np.ndarray  # Covariance of the features
+    logits: Optional[np.ndarray] = None  # Class logits [N, 1000], for the Inception Score
+
+    @classmethod
+    def from_features(cls, features: np.ndarray, logits: Optional[np.ndarray] = None) -> 'ReferenceStats':
+        """
+        Compute the moments of a feature set.
+
+        Args:
+            features (np.ndarray): Pool features [N, 2048].
+            logits (Optional[np.ndarray]): Class logits [N, 1000].
+
+        Returns:
+            ReferenceStats: The statistics.
+        """
+        mu, sigma = StreamingMoments.from_features(features).statistics()
+        return cls(features=features, mu=mu, sigma=sigma, logits=logits)
+
+    @property
+    def num_samples(self) -> int:
+        return len(self.features)
+
+
+class ReferenceStatsStore:
+    """Directory of reference-statistics entries."""
+    def __init__(self, root: str, rank: int = 0):
+        """
+        Open (or create) a reference-statistics directory.
+
+        Args:
+            root (str): Directory of the entries.
+            rank (int): Global process rank; only rank 0 writes.
+        """
+        self.root = root
+        self.rank = rank
+        if self.rank == 0:
+            os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.npz")
+
+    def contains(self, key: str) -> bool:
+        """Whether an entry exists."""
+        return os.path.exists(self._path(key))
+
+    def load(self, key: str) -> Optional[ReferenceStats]:
+        """
+        Load an entry.
+
+        Args:
+            key (str): Entry key from reference_stats_key().
+
+        Returns:
+            Optional[ReferenceStats]: The statistics, or None if there is no readable entry.
+        """
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return ReferenceStats(
+                    features=data['features'],
+                    mu=data['mu'],
+                    sigma=data['sigma'],
+                    logits=data['logits'] if 'logits' in data.files else None
+                )
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Ignoring unreadable reference statistics {path}: {str(e)}")
+            return None
+
+    def save(self, key: str, stats: ReferenceStats, settings: Dict[str, Any]) -> None:
+        """
+        Write an entry (rank 0 only).
+
+        Args:
+            key (str): Entry key from reference_stats_key().
+            stats (ReferenceStats): Statistics to store.
+            settings (Dict[str, Any]): Keyed settings, stored alongside for reference.
+        """
+        if self.rank != 0:
+            return
+        arrays = {'features': stats.features, 'mu': stats.mu, 'sigma': stats.sigma}
+        if stats.logits is not None:
+            arrays['logits'] = stats.logits
+
+        path = self._path(key)
+        tmp_path = f"{path}.tmp{os.getpid()}.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+        settings_path = os.path.join(self.root, f"{key}.json")
+        tmp_path = f"{settings_path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(settings, num_samples=stats.num_samples), f, indent=2)
+        os.replace(tmp_path, settings_path)
+
+
+def create_reference_stats_store(root: Optional[str], rank: int = 0) -> Optional[ReferenceStatsStore]:
+    """
+    Open a reference-statistics directory, or return None if no directory is configured.
+
+    Args:
+        root (Optional[str]): Directory of the entries; None or "" disables the cache.
+        rank (int): Global process rank.
+
+    Returns:
+        Optional[ReferenceStatsStore]: The store, or None.
+    """
+    if not root:
+        return None
+    return ReferenceStatsStore(root, rank=rank)
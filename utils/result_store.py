@@ -0,0 +1,238 @@
+"""
+Structured on-disk results of evaluation, attack (including PGD), FID and pixel-manipulation runs.
+
+A run directory holds:
+
+    manifest.json      run kind, creation time, config hash, the config itself and the array index
+    summary.json       scalar metrics, one row per case (model or transformation)
+    arrays/*.npy       per-sample arrays (e.g. MSE values), memory-mappable with np.load(mmap_mode='r')
+
+Metric dictionaries are flattened into columns: nested dicts become dotted names
+(avg_metrics.lpips) and lists of per-sample dicts become one array per field
+(results.metrics.lpips). scan_results() aggregates the summaries of many runs into
+columns without touching the arrays.
+"""
+import glob
+import hashlib
+import json
+import os
+import re
+from dataclasses import asdict, is_dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+RESULT_FORMAT_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+SUMMARY_FILENAME = "summary.json"
+ARRAYS_DIRNAME = "arrays"
+
+
+def _config_dict(config: Any) -> Dict[str, Any]:
+    if config is None:
+        return {}
+    if is_dataclass(config):
+        config = asdict(config)
+    elif not isinstance(config, dict):
+        config = vars(config)  # argparse.Namespace
+    return json.loads(json.dumps(config, sort_keys=True, default=str))
+
+
+def config_hash(config: Any) -> str:
+    """
+    Hash of a run configuration (dataclass config, argparse namespace or dict).
+
+    Args:
+        config (Any): Run configuration.
+
+    Returns:
+        str: Hex digest.
+    """
+    return hashlib.sha256(json.dumps(_config_dict(config), sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def _is_scalar(value: Any) -> bool:
+    return value is None or isinstance(value, (bool, int, float, str, np.generic))
+
+
+def _to_scalar(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def flatten_metrics(metrics: Dict[str, Any], prefix: str = "") -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Split a (nested) metrics dictionary into scalar columns and per-sample arrays.
+
+    Args:
+        metrics (Dict[str, Any]): Metrics of one case.
+        prefix (str): Prefix of the column names.
+
+    Returns:
+        tuple: (scalars, arrays) - dotted column name to scalar, and to array.
+    """
+    scalars, arrays = {}, {}
+    for key, value in metrics.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            sub_scalars, sub_arrays = flatten_metrics(value, prefix=f"{name}.")
+            scalars.update(sub_scalars)
+            arrays.update(sub_arrays)
+        elif isinstance(value, (list, tuple)) and value and all(isinstance(v, dict) for v in value):
+            # Per-sample records become one array per field
+            columns: Dict[str, List[Any]] = {}
+            for record in value:
+                record_scalars, _ = flatten_metrics(record, prefix=f"{name}.")
+                for column, column_value in record_scalars.items():
+                    columns.setdefault(column, []).append(column_value)
+            arrays.update({column: np.asarray(values) for column, values in columns.items()
+                           if len(values) == len(value)})
+        elif isinstance(value, (list, tuple, np.ndarray)):
+            array = np.asarray(value)
+            if array.ndim == 0:
+                scalars[name] = array.item()
+            else:
+                arrays[name] = array
+        elif _is_scalar(value):
+            scalars[name] = _to_scalar(value)
+    return scalars, arrays
+
+
+def _array_filename(case: str, name: str) -> str:
+    return re.sub(r'[^\w.\-]', '_', f"{case}__{name}") + ".npy"
+
+
+def _write_json_atomic(path: str, data: Any) -> None:
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def save_results(
+    output_dir: str,
+    kind: str,
+    cases: Dict[str, Dict[str, Any]],
+    config: Any = None
+) -> str:
+    """
+    Write the results of a run.
+
+    Args:
+        output_dir (str): Run output directory.
+        kind (str): Kind of run ("evaluation", "attack", "pgd_attack", "fid", "pixel_manipulation").
+        cases (Dict[str, Dict[str, Any]]): Metrics of each case (model or transformation).
+        config (Any): Run configuration, hashed and stored in the manifest.
+
+    Returns:
+        str: Path of the manifest.
+    """
+    arrays_dir = os.path.join(output_dir, ARRAYS_DIRNAME)
+    os.makedirs(arrays_dir, exist_ok=True)
+
+    summary = {}
+    array_index: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for case, metrics in cases.items():
+        scalars, arrays = flatten_metrics(metrics)
+        summary[case] = scalars
+        for name, array in arrays.items():
+            filename = _array_filename(case, name)
+            np.save(os.path.join(arrays_dir, filename), array)
+            array_index.setdefault(case, {})[name] = {
+                'file': os.path.join(ARRAYS_DIRNAME, filename),
+                'shape': list(array.shape),
+                'dtype': array.dtype.str,
+            }
+
+    _write_json_atomic(os.path.join(output_dir, SUMMARY_FILENAME), summary)
+
+    # The manifest is written last; its presence marks a complete run
+    manifest = {
+        'version': RESULT_FORMAT_VERSION,
+        'kind': kind,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'config_hash': config_hash(config),
+        'config': _config_dict(config),
+        'cases': list(cases.keys()),
+        'arrays': array_index,
+    }
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    _write_json_atomic(manifest_path, manifest)
+    return manifest_path
+
+
+def load_manifest(run_dir: str) -> Dict[str, Any]:
+    """Read the manifest of a run directory."""
+    with open(os.path.join(run_dir, MANIFEST_FILENAME), 'r') as f:
+        return json.load(f)
+
+
+def load_summary(run_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Read the scalar metrics of a run directory, keyed by case."""
+    with open(os.path.join(run_dir, SUMMARY_FILENAME), 'r') as f:
+        return json.load(f)
+
+
+def load_array(run_dir: str, case: str, name: str, mmap: bool = True) -> np.ndarray:
+    """
+    Read a per-sample array of a run.
+
+    Args:
+        run_dir (str): Run directory.
+        case (str): Case name.
+        name (str): Dotted array name (e.g. "mse_values").
+        mmap (bool): Memory-map the array instead of reading it.
+
+    Returns:
+        np.ndarray: The array.
+    """
+    entry = load_manifest(run_dir)['arrays'][case][name]
+    return np.load(os.path.join(run_dir, entry['file']), mmap_mode='r' if mmap else None)
+
+
+def scan_results(root: str, kind: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Aggregate the scalar metrics of all runs below a directory into columns.
+
+    Each row is one case of one run. Besides the metric columns (missing values are
+    NaN, or None for non-numeric columns) there are "run_dir", "kind", "config_hash",
+    "created_at" and "case" columns. pandas.DataFrame(columns) turns the result into a table.
+
+    Args:
+        root (str): Directory searched recursively for run manifests.
+        kind (Optional[str]): Only include runs of this kind.
+
+    Returns:
+        Dict[str, np.ndarray]: Column name to column values.
+    """
+    rows = []
+    for manifest_path in sorted(glob.glob(os.path.join(root, '**', MANIFEST_FILENAME), recursive=True)):
+        run_dir = os.path.dirname(manifest_path)
+        manifest = load_manifest(run_dir)
+        if kind is not None and manifest.get('kind') != kind:
+            continue
+        for case, scalars in load_summary(run_dir).items():
+            row = {
+                'run_dir': run_dir,
+                'kind': manifest.get('kind'),
+                'config_hash': manifest.get('config_hash'),
+                'created_at': manifest.get('created_at'),
+                'case': case,
+            }
+            row.update(scalars)
+            rows.append(row)
+
+    names: Dict[str, None] = {}  # Insertion-ordered union of the row keys
+    for row in rows:
+        names.update(dict.fromkeys(row))
+
+    columns = {}
+    for name in names:
+        values = [row.get(name) for row in rows]
+        present = [v for v in values if v is not None]
+        if present and all(isinstance(v, (bool, int, float)) for v in present):
+            columns[name] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        else:
+            columns[name] = np.array(values, dtype=object)
+    return columns
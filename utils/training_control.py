@@ -0,0 +1,206 @@
+"""
+Learning rate scheduling and convergence-based early stopping for decoder training.
+"""
+import logging
+import math
+from typing import Any, Dict, Optional
+
+import torch
+
+
+class LRScheduler:
+    """
+    Iteration-based learning rate schedule with linear warmup followed by a
+    constant, cosine or plateau phase.
+
+    The plateau phase reduces the learning rate by a constant factor when the monitored
+    metric has not improved for a number of convergence checks. All ranks must call
+    step() with the same (all-reduced) metric so that learning rates stay identical.
+    """
+    def __init__(self, optimizer: torch.optim.Optimizer, training_config):
+        """
+        Initialize the scheduler.
+
+        Args:
+            optimizer (torch.optim.Optimizer): Optimizer whose learning rate is controlled.
+            training_config (TrainingConfig): Training configuration.
+        """
+        self.optimizer = optimizer
+        self.mode = training_config.lr_scheduler
+        self.base_lr = training_config.lr
+        self.min_lr = training_config.min_lr
+        self.warmup_iterations = training_config.warmup_iterations
+        self.total_iterations = training_config.total_iterations
+        self.plateau_patience = training_config.plateau_patience
+        self.plateau_factor = training_config.plateau_factor
+        self.plateau_threshold = training_config.early_stopping_min_delta
+
+        self.plateau_lr = self.base_lr
+        self.plateau_best: Optional[float] = None
+        self.plateau_bad_checks = 0
+
+    def get_lr(self, iteration: int) -> float:
+        """
+        Learning rate for a given (1-based) iteration.
+
+        Args:
+            iteration (int): Training iteration.
+
+        Returns:
+            float: Learning rate.
+        """
+        if self.warmup_iterations > 0 and iteration <= self.warmup_iterations:
+            return self.base_lr * iteration / self.warmup_iterations
+
+        if self.mode == "cosine":
+            decay_iterations = max(1, self.total_iterations - self.warmup_iterations)
+            progress = min(1.0, (iteration - self.warmup_iterations) / decay_iterations)
+            return self.min_lr + (self.base_lr - self.min_lr) * 0.5 * (1.0 + math.cos(math.pi * progress))
+        if self.mode == "plateau":
+            return self.plateau_lr
+        return self.base_lr
+
+    def step(self, iteration: int) -> float:
+        """
+        Apply the learning rate for the given iteration to the optimizer.
+
+        Args:
+            iteration (int): Training iteration about to be run.
+
+        Returns:
+            float: The applied learning rate.
+        """
+        lr = self.get_lr(iteration)
+        for group in self.optimizer.param_groups:
+            group['lr'] = lr
+        return lr
+
+    def step_metric(self, iteration: int, metric: float) -> None:
+        """
+        Feed a convergence check to the plateau phase.
+
+        Args:
+            iteration (int): Current training iteration.
+            metric (float): Monitored metric (lower is better), identical on all ranks.
+        """
+        if self.mode != "plateau" or iteration <= self.warmup_iterations:
+            return
+        if self.plateau_best is None or metric < self.plateau_best - self.plateau_threshold:
+            self.plateau_best = metric
+            self.plateau_bad_checks = 0
+            return
+
+        self.plateau_bad_checks += 1
+        if self.plateau_bad_checks >= self.plateau_patience:
+            new_lr = max(self.plateau_lr * self.plateau_factor, self.min_lr)
+            if new_lr < self.plateau_lr:
+                logging.info(f"Metric plateaued at iteration {iteration}; reducing LR {self.plateau_lr:.2e} -> {new_lr:.2e}")
+            self.plateau_lr = new_lr
+            self.plateau_bad_checks = 0
+
+    def state_dict(self) -> Dict[str, Any]:
+        """State needed to resume the schedule."""
+        return {
+            'plateau_lr': self.plateau_lr,
+            'plateau_best': self.plateau_best,
+            'plateau_bad_checks': self.plateau_bad_checks
+        }
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        """Restore the schedule from state_dict()."""
+        self.plateau_lr = state.get('plateau_lr', self.plateau_lr)
+        self.plateau_best = state.get('plateau_best', self.plateau_best)
+        self.plateau_bad_checks = state.get('plateau_bad_checks', self.plateau_bad_checks)
+
+
+class EarlyStopping:
+    """
+    Convergence controller tracking an exponential moving average of the training MSE
+    and, optionally, a periodic held-out MSE.
+
+    The monitored metric is the held-out MSE when validation is enabled and the smoothed
+    training MSE otherwise. Training stops once the monitored metric has not improved by
+    more than min_delta for patience iterations.
+    """
+    def __init__(self, patience: int, min_delta: float = 0.0, ema_alpha: float = 0.01):
+        """
+        Initialize the controller.
+
+        Args:
+            patience (int): Iterations without improvement before stopping.
+            min_delta (float): Minimum decrease of the monitored metric counted as an improvement.
+            ema_alpha (float): Smoothing factor of the training MSE moving average.
+        """
+        self.patience = patience
+        self.min_delta = min_delta
+        self.ema_alpha = ema_alpha
+
+        self.ema: Optional[float] = None
+        self.best: Optional[float] = None
+        self.best_iteration = 0
+
+    def update_train(self, value: float) -> float:
+        """
+        Update the moving average with a new training MSE.
+
+        Args:
+            value (float): Training MSE of the latest iteration.
+
+        Returns:
+            float: Updated moving average.
+        """
+        if self.ema is None:
+            self.ema = value
+        else:
+            self.ema = self.ema_alpha * value + (1.0 - self.ema_alpha) * self.ema
+        return self.ema
+
+    def check(self, iteration: int, metric: float) -> bool:
+        """
+        Record a convergence check.
+
+        Args:
+            iteration (int): Current training iteration.
+            metric (float): Monitored metric (lower is better), identical on all ranks.
+
+        Returns:
+            bool: True if the metric improved on the best value seen so far.
+        """
+        if self.best is None or metric < self.best - self.min_delta:
+            self.best = metric
+            self.best_iteration = iteration
+            return True
+        return False
+
+    def should_stop(self, iteration: int) -> bool:
+        """Whether the patience budget has been exhausted."""
+        return self.best is not None and iteration - self.best_iteration >= self.patience
+
+    def state_dict(self) -> Dict[str, Any]:
+        """State needed to resume the controller."""
+        return {'ema': self.ema, 'best': self.best, 'best_iteration': self.best_iteration}
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        """Restore the controller from state_dict()."""
+        self.ema = state.get('ema', self.ema)
+        self.best = state.get('best', self.best)
+        self.best_iteration = state.get('best_iteration', self.best_iteration)
+
+
+def all_reduce_mean(value: float, device: torch.device, world_size: int) -> float:
+    """
+    Average a scalar across ranks so that convergence decisions agree everywhere.
+
+    Args:
+        value (float): Local value.
+        device (torch.device): Device used for the collective.
+        world_size (int): Total number of processes.
+
+    Returns:
+        float: Mean value over all ranks.
+    """
+    if world_size <= 1:
+        return value
+    tensor = torch.tensor([value], dtype=torch.float64, device=device)
+    torch.distributed.all_reduce(tensor, op=torch.distributed.ReduceOp.SUM)
+    return tensor.item() / world_size